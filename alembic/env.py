@@ -12,6 +12,10 @@ from app.models.inventory import ToolInventory # noqa
 from app.models.tool_requests import ToolUsageRequest, ToolAdditionRequest # noqa
 from app.models.issue import ToolIssueReport # noqa
 from app.models.notification import Notification # noqa
+from app.models.email_outbox import EmailOutbox # noqa
+from app.models.analytics import ToolUsageRollup, RollupWatermark # noqa
+from app.models.idempotency import IdempotencyKey # noqa
+from app.models.revocation import UserRevocation # noqa
 
 config = context.config
 config.set_main_option("sqlalchemy.url", settings.db_url())
@@ -0,0 +1,30 @@
+"""session log keyset indexes
+
+Revision ID: 0004_session_log_indexes
+Revises: 0003_seed_enums
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_session_log_indexes"
+down_revision = "0003_seed_enums"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # sessions is busy around the clock, build without blocking logins
+    with op.get_context().autocommit_block():
+        op.create_index("ix_sessions_login_at_id", "sessions", [sa.text("login_at DESC"), sa.text("id DESC")], postgresql_concurrently=True)
+        op.create_index("ix_sessions_role_login_at_id", "sessions", ["role", sa.text("login_at DESC"), sa.text("id DESC")], postgresql_concurrently=True)
+        op.create_index("ix_sessions_user_id_login_at_id", "sessions", ["user_id", sa.text("login_at DESC"), sa.text("id DESC")], postgresql_concurrently=True)
+        op.create_index(
+            "ix_sessions_open_expires_at", "sessions", ["expires_at"],
+            postgresql_where=sa.text("logout_at IS NULL"), postgresql_concurrently=True,
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_sessions_open_expires_at", table_name="sessions", postgresql_concurrently=True)
+        op.drop_index("ix_sessions_user_id_login_at_id", table_name="sessions", postgresql_concurrently=True)
+        op.drop_index("ix_sessions_role_login_at_id", table_name="sessions", postgresql_concurrently=True)
+        op.drop_index("ix_sessions_login_at_id", table_name="sessions", postgresql_concurrently=True)
@@ -0,0 +1,28 @@
+"""sequences for request and tool codes
+
+Revision ID: 0005_code_sequences
+Revises: 0004_session_log_indexes
+"""
+from alembic import op
+
+revision = "0005_code_sequences"
+down_revision = "0004_session_log_indexes"
+branch_labels = None
+depends_on = None
+
+# INCREMENT BY is the block size app.services.id_generator reserves per nextval()
+SEQUENCES = [
+    ("tool_usage_request_code_seq", "tool_usage_requests"),
+    ("tool_addition_request_code_seq", "tool_addition_requests"),
+    ("tool_code_seq", "tool_inventory"),
+]
+
+def upgrade():
+    for seq, table in SEQUENCES:
+        op.execute(f"CREATE SEQUENCE {seq} INCREMENT BY 50")
+        # Codes used to be max(id) + 1, continue past them
+        op.execute(f"SELECT setval('{seq}', COALESCE((SELECT max(id) FROM {table}), 0) + 1, false)")
+
+def downgrade():
+    for seq, _ in SEQUENCES:
+        op.execute(f"DROP SEQUENCE {seq}")
@@ -0,0 +1,32 @@
+"""role locks become leases
+
+Revision ID: 0006_role_lock_leases
+Revises: 0005_code_sequences
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_role_lock_leases"
+down_revision = "0005_code_sequences"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("role_locks", sa.Column("expires_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+    # Existing locks last as long as the session holding them
+    op.execute(
+        "UPDATE role_locks SET expires_at = s.expires_at FROM sessions s "
+        "WHERE CAST(s.id AS VARCHAR) = role_locks.session_id"
+    )
+    # The upsert in LeaseLockManager needs one row per role
+    op.execute(
+        "DELETE FROM role_locks a USING role_locks b "
+        "WHERE a.role = b.role AND a.id < b.id"
+    )
+    op.drop_index("ix_role_locks_role", table_name="role_locks")
+    op.create_index("ix_role_locks_role", "role_locks", ["role"], unique=True)
+
+def downgrade():
+    op.drop_index("ix_role_locks_role", table_name="role_locks")
+    op.create_index("ix_role_locks_role", "role_locks", ["role"])
+    op.drop_column("role_locks", "expires_at")
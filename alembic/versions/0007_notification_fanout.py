@@ -0,0 +1,42 @@
+"""per-user notification rows and unread counters
+
+Revision ID: 0007_notification_fanout
+Revises: 0006_role_lock_leases
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_notification_fanout"
+down_revision = "0006_role_lock_leases"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("notifications", sa.Column("role", sa.String(50), nullable=True))
+    op.add_column("notifications", sa.Column("title", sa.String(255), nullable=True))
+    op.add_column("notifications", sa.Column("description", sa.String(1000), nullable=True))
+    op.add_column("notifications", sa.Column("target_url", sa.String(255), nullable=True))
+    op.add_column("notifications", sa.Column("is_read", sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.execute("UPDATE notifications SET title = message")
+    op.alter_column("notifications", "title", nullable=False)
+    op.drop_column("notifications", "message")
+    op.create_index("ix_notifications_user_id_id", "notifications", ["user_id", "id"])
+
+    op.create_table(
+        "notification_counters",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("unread", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.execute(
+        "INSERT INTO notification_counters (user_id, unread) "
+        "SELECT user_id, count(*) FROM notifications WHERE NOT is_read GROUP BY user_id"
+    )
+
+def downgrade():
+    op.drop_table("notification_counters")
+    op.drop_index("ix_notifications_user_id_id", table_name="notifications")
+    op.add_column("notifications", sa.Column("message", sa.String(255), nullable=True))
+    op.execute("UPDATE notifications SET message = title")
+    op.alter_column("notifications", "message", nullable=False)
+    for column in ("is_read", "target_url", "description", "title", "role"):
+        op.drop_column("notifications", column)
@@ -0,0 +1,35 @@
+"""email outbox
+
+Revision ID: 0008_email_outbox
+Revises: 0007_notification_fanout
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_email_outbox"
+down_revision = "0007_notification_fanout"
+branch_labels = None
+depends_on = None
+
+email_status = sa.Enum("PENDING", "SENT", "FAILED", name="emailstatus")
+
+def upgrade():
+    op.create_table(
+        "email_outbox",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("to_email", sa.String(255), nullable=False),
+        sa.Column("subject", sa.String(255), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("status", email_status, nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("last_error", sa.String(500), nullable=True),
+        sa.Column("next_attempt_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_email_outbox_id", "email_outbox", ["id"])
+    op.create_index("ix_email_outbox_due", "email_outbox", ["next_attempt_at"], postgresql_where=sa.text("status = 'PENDING'"))
+
+def downgrade():
+    op.drop_table("email_outbox")
+    email_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,51 @@
+"""tool inventory columns used by the routes, trigram search index
+
+Revision ID: 0009_tool_inventory_search
+Revises: 0008_email_outbox
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_tool_inventory_search"
+down_revision = "0008_email_outbox"
+branch_labels = None
+depends_on = None
+
+SEARCH_TEXT = (
+    "lower(name || ' ' || coalesce(make, '') || ' ' || coalesce(range_mm, '') || ' ' || coalesce(location, ''))"
+)
+
+def upgrade():
+    op.alter_column("tool_inventory", "tool_name", new_column_name="name")
+    op.alter_column("tool_inventory", "quantity", new_column_name="quantity_available")
+    op.add_column("tool_inventory", sa.Column("quantity_total", sa.Integer(), nullable=True))
+    op.add_column("tool_inventory", sa.Column("tool_code", sa.String(20), nullable=True))
+    op.add_column("tool_inventory", sa.Column("make", sa.String(100), nullable=True))
+    op.add_column("tool_inventory", sa.Column("range_mm", sa.String(50), nullable=True))
+    op.add_column("tool_inventory", sa.Column("location", sa.String(100), nullable=True))
+    op.add_column("tool_inventory", sa.Column("status", sa.String(20), server_default="ACTIVE", nullable=False))
+    # Same T00001 format app.services.id_generator hands out; tool_code_seq starts past max(id)
+    op.execute("UPDATE tool_inventory SET quantity_total = quantity_available, tool_code = 'T' || lpad(id::text, 5, '0')")
+    op.alter_column("tool_inventory", "quantity_total", nullable=False)
+    op.alter_column("tool_inventory", "tool_code", nullable=False)
+    op.create_index("ix_tool_inventory_tool_code", "tool_inventory", ["tool_code"], unique=True)
+    op.create_index("ix_tool_inventory_name", "tool_inventory", ["name"])
+    op.add_column("tool_inventory", sa.Column("search_text", sa.String(400), sa.Computed(SEARCH_TEXT, persisted=True)))
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_tool_inventory_search_text_trgm", "tool_inventory", ["search_text"],
+            postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"}, postgresql_concurrently=True,
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_tool_inventory_search_text_trgm", table_name="tool_inventory", postgresql_concurrently=True)
+    op.drop_column("tool_inventory", "search_text")
+    op.drop_index("ix_tool_inventory_name", table_name="tool_inventory")
+    op.drop_index("ix_tool_inventory_tool_code", table_name="tool_inventory")
+    for column in ("status", "location", "range_mm", "make", "tool_code", "quantity_total"):
+        op.drop_column("tool_inventory", column)
+    op.alter_column("tool_inventory", "quantity_available", new_column_name="quantity")
+    op.alter_column("tool_inventory", "name", new_column_name="tool_name")
@@ -0,0 +1,47 @@
+"""inventory movement ledger and snapshots
+
+Revision ID: 0010_inventory_ledger
+Revises: 0009_tool_inventory_search
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_inventory_ledger"
+down_revision = "0009_tool_inventory_search"
+branch_labels = None
+depends_on = None
+
+movement_kind = sa.Enum("OPENING", "ISSUE", "RETURN", "RECEIPT", name="movementkind")
+
+def upgrade():
+    op.create_table(
+        "inventory_movements",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("tool_id", sa.Integer(), sa.ForeignKey("tool_inventory.id"), nullable=False),
+        sa.Column("delta", sa.Integer(), nullable=False),
+        sa.Column("kind", movement_kind, nullable=False),
+        sa.Column("ref", sa.String(50), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_inventory_movements_tool_id_id", "inventory_movements", ["tool_id", "id"])
+    op.create_index("ix_inventory_movements_tool_id_created_at_id", "inventory_movements", ["tool_id", "created_at", "id"])
+    op.create_table(
+        "inventory_snapshots",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tool_id", sa.Integer(), sa.ForeignKey("tool_inventory.id"), nullable=False),
+        sa.Column("last_movement_id", sa.BigInteger(), nullable=False),
+        sa.Column("quantity_available", sa.Integer(), nullable=False),
+        sa.Column("taken_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_inventory_snapshots_tool_id_taken_at", "inventory_snapshots", ["tool_id", "taken_at"])
+    op.create_index("ix_inventory_snapshots_tool_id_last_movement_id", "inventory_snapshots", ["tool_id", "last_movement_id"])
+    # Stock from before the ledger existed enters it as one opening movement per tool
+    op.execute(
+        "INSERT INTO inventory_movements (tool_id, delta, kind, ref, created_at) "
+        "SELECT id, quantity_available, 'OPENING', NULL, now() FROM tool_inventory"
+    )
+
+def downgrade():
+    op.drop_table("inventory_snapshots")
+    op.drop_table("inventory_movements")
+    movement_kind.drop(op.get_bind(), checkfirst=True)
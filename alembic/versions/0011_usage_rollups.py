@@ -0,0 +1,42 @@
+"""tool usage rollups
+
+Revision ID: 0011_usage_rollups
+Revises: 0010_inventory_ledger
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011_usage_rollups"
+down_revision = "0010_inventory_ledger"
+branch_labels = None
+depends_on = None
+
+rollup_grain = sa.Enum("HOUR", "DAY", name="rollupgrain")
+
+def upgrade():
+    op.create_table(
+        "tool_usage_rollups",
+        sa.Column("grain", rollup_grain, primary_key=True),
+        sa.Column("bucket_start", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("tool_id", sa.Integer(), sa.ForeignKey("tool_inventory.id"), primary_key=True),
+        sa.Column("location", sa.String(100), nullable=True),
+        sa.Column("requested", sa.Integer(), nullable=False),
+        sa.Column("approved", sa.Integer(), nullable=False),
+        sa.Column("approved_qty", sa.Integer(), nullable=False),
+        sa.Column("returned", sa.Integer(), nullable=False),
+        sa.Column("turnaround_seconds", sa.BigInteger(), nullable=False),
+    )
+    op.create_index("ix_tool_usage_rollups_grain_bucket", "tool_usage_rollups", ["grain", "bucket_start"])
+    op.create_table(
+        "rollup_watermarks",
+        sa.Column("source", sa.String(50), primary_key=True),
+        sa.Column("last_id", sa.BigInteger(), nullable=False),
+    )
+    # Return turnaround looks up the ISSUE movement by request code
+    op.create_index("ix_inventory_movements_ref", "inventory_movements", ["ref"])
+
+def downgrade():
+    op.drop_index("ix_inventory_movements_ref", table_name="inventory_movements")
+    op.drop_table("rollup_watermarks")
+    op.drop_table("tool_usage_rollups")
+    rollup_grain.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,86 @@
+"""range-partition sessions by login month
+
+Revision ID: 0012_partition_sessions
+Revises: 0011_usage_rollups
+"""
+from datetime import datetime, timezone
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_partition_sessions"
+down_revision = "0011_usage_rollups"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, session_id, user_id, role, login_at, expires_at, logout_at, ended_reason, ip_address, user_agent"
+# The session partition job creates months beyond these
+MONTHS_AHEAD = 2
+
+def _columns_sql(primary_key: str) -> str:
+    return (
+        "id integer NOT NULL DEFAULT nextval('sessions_id_seq'), "
+        "session_id varchar(64) NOT NULL, "
+        "user_id integer NOT NULL REFERENCES users (id) ON DELETE CASCADE, "
+        "role userrole NOT NULL, "
+        "login_at timestamptz NOT NULL DEFAULT now(), "
+        "expires_at timestamptz NOT NULL, "
+        "logout_at timestamptz, "
+        "ended_reason sessionendreason, "
+        "ip_address varchar(64), "
+        "user_agent varchar(255), "
+        f"PRIMARY KEY ({primary_key})"
+    )
+
+def _create_indexes(unique_session_id: bool):
+    op.create_index("ix_sessions_session_id", "sessions", ["session_id"], unique=unique_session_id)
+    op.create_index("ix_sessions_login_at_id", "sessions", [sa.text("login_at DESC"), sa.text("id DESC")])
+    op.create_index("ix_sessions_role_login_at_id", "sessions", ["role", sa.text("login_at DESC"), sa.text("id DESC")])
+    op.create_index("ix_sessions_user_id_login_at_id", "sessions", ["user_id", sa.text("login_at DESC"), sa.text("id DESC")])
+    op.create_index("ix_sessions_open_expires_at", "sessions", ["expires_at"], postgresql_where=sa.text("logout_at IS NULL"))
+
+def _month(year: int, month: int) -> datetime:
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1, tzinfo=timezone.utc)
+
+def _move_aside():
+    op.rename_table("sessions", "sessions_old")
+    op.execute("ALTER TABLE sessions_old RENAME CONSTRAINT sessions_pkey TO sessions_old_pkey")
+    for name in (
+        "ix_sessions_session_id", "ix_sessions_user_id", "ix_sessions_role", "ix_sessions_login_at_id",
+        "ix_sessions_role_login_at_id", "ix_sessions_user_id_login_at_id", "ix_sessions_open_expires_at",
+    ):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+def _replace_old():
+    op.execute(f"INSERT INTO sessions ({COLUMNS}) SELECT {COLUMNS} FROM sessions_old")
+    op.execute("ALTER SEQUENCE sessions_id_seq OWNED BY sessions.id")
+    op.drop_table("sessions_old")
+
+def upgrade():
+    # Logins are blocked while the rows are copied; run it in a quiet window
+    _move_aside()
+    op.execute(f"CREATE TABLE sessions ({_columns_sql('id, login_at')}) PARTITION BY RANGE (login_at)")
+    oldest = op.get_bind().execute(sa.text("SELECT min(login_at) FROM sessions_old")).scalar()
+    now = datetime.now(timezone.utc)
+    # The connection's TimeZone decides what offset min(login_at) comes back
+    # in; partition bounds are UTC months
+    start = oldest.astimezone(timezone.utc) if oldest else now
+    month = _month(start.year, start.month)
+    last = _month(now.year, now.month + MONTHS_AHEAD)
+    while month <= last:
+        following = _month(month.year, month.month + 1)
+        op.execute(
+            f"CREATE TABLE sessions_p{month:%Y%m} PARTITION OF sessions "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{following.isoformat()}')"
+        )
+        month = following
+    _replace_old()
+    _create_indexes(unique_session_id=False)
+
+def downgrade():
+    # Archived partitions are not brought back
+    _move_aside()
+    op.execute(f"CREATE TABLE sessions ({_columns_sql('id')})")
+    _replace_old()
+    _create_indexes(unique_session_id=True)
+    op.create_index("ix_sessions_user_id", "sessions", ["user_id"])
+    op.create_index("ix_sessions_role", "sessions", ["role"])
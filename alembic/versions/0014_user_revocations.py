@@ -0,0 +1,23 @@
+"""persisted revocations of deleted users
+
+Revision ID: 0014_user_revocations
+Revises: 0013_idempotency_keys
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0014_user_revocations"
+down_revision = "0013_idempotency_keys"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "user_revocations",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("revoked_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_user_revocations_revoked_at", "user_revocations", ["revoked_at"])
+
+def downgrade():
+    op.drop_table("user_revocations")
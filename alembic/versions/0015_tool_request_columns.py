@@ -0,0 +1,61 @@
+"""request codes, quantities and review columns on tool requests
+
+Revision ID: 0015_tool_request_columns
+Revises: 0014_user_revocations
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0015_tool_request_columns"
+down_revision = "0014_user_revocations"
+branch_labels = None
+depends_on = None
+
+def _timestamp(name):
+    return sa.Column(name, sa.DateTime(timezone=True), nullable=True)
+
+def upgrade():
+    op.alter_column("tool_usage_requests", "user_id", new_column_name="operator_id")
+    op.add_column("tool_usage_requests", sa.Column("request_id", sa.String(20), nullable=True))
+    op.add_column("tool_usage_requests", sa.Column("requested_qty", sa.Integer(), server_default="1", nullable=False))
+    op.add_column("tool_usage_requests", _timestamp("reviewed_at"))
+    op.add_column("tool_usage_requests", sa.Column("supervisor_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True))
+    op.add_column("tool_usage_requests", sa.Column("approved_by", sa.Integer(), sa.ForeignKey("users.id"), nullable=True))
+    op.add_column("tool_usage_requests", sa.Column("reviewer_remarks", sa.String(255), nullable=True))
+    op.add_column("tool_usage_requests", _timestamp("received_at"))
+    op.add_column("tool_usage_requests", _timestamp("returned_at"))
+
+    op.alter_column("tool_addition_requests", "requested_by", new_column_name="supervisor_id")
+    op.alter_column("tool_addition_requests", "created_at", new_column_name="requested_at")
+    op.add_column("tool_addition_requests", sa.Column("request_id", sa.String(20), nullable=True))
+    op.add_column("tool_addition_requests", sa.Column("make", sa.String(100), nullable=True))
+    op.add_column("tool_addition_requests", sa.Column("range_mm", sa.String(50), nullable=True))
+    op.add_column("tool_addition_requests", sa.Column("location", sa.String(100), nullable=True))
+    op.add_column("tool_addition_requests", sa.Column("quantity", sa.Integer(), server_default="1", nullable=False))
+    op.add_column("tool_addition_requests", sa.Column("officer_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True))
+    op.add_column("tool_addition_requests", _timestamp("reviewed_at"))
+    op.add_column("tool_addition_requests", sa.Column("reviewer_remarks", sa.String(255), nullable=True))
+
+    # Existing rows get codes from their ids; 0005 started the code sequences past max(id)
+    for table, prefix in (("tool_usage_requests", "TR"), ("tool_addition_requests", "TAR")):
+        op.execute(f"UPDATE {table} SET request_id = '{prefix}' || lpad(id::text, 5, '0')")
+        op.alter_column(table, "request_id", nullable=False)
+        op.create_index(f"ix_{table}_request_id", table, ["request_id"], unique=True)
+    # Only needed to fill existing rows, the app always sends a quantity
+    op.alter_column("tool_usage_requests", "requested_qty", server_default=None)
+    op.alter_column("tool_addition_requests", "quantity", server_default=None)
+    op.create_index("ix_tool_usage_requests_operator_id", "tool_usage_requests", ["operator_id"])
+
+def downgrade():
+    op.drop_index("ix_tool_usage_requests_operator_id", table_name="tool_usage_requests")
+    for table in ("tool_usage_requests", "tool_addition_requests"):
+        op.drop_index(f"ix_{table}_request_id", table_name=table)
+        op.drop_column(table, "request_id")
+    for column in ("requested_qty", "reviewed_at", "supervisor_id", "approved_by", "reviewer_remarks", "received_at", "returned_at"):
+        op.drop_column("tool_usage_requests", column)
+    op.alter_column("tool_usage_requests", "operator_id", new_column_name="user_id")
+
+    for column in ("make", "range_mm", "location", "quantity", "officer_id", "reviewed_at", "reviewer_remarks"):
+        op.drop_column("tool_addition_requests", column)
+    op.alter_column("tool_addition_requests", "requested_at", new_column_name="created_at")
+    op.alter_column("tool_addition_requests", "supervisor_id", new_column_name="requested_by")
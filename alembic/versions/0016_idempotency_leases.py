@@ -0,0 +1,18 @@
+"""lease on pending idempotency keys
+
+Revision ID: 0016_idempotency_leases
+Revises: 0015_tool_request_columns
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0016_idempotency_leases"
+down_revision = "0015_tool_request_columns"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("idempotency_keys", sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True))
+
+def downgrade():
+    op.drop_column("idempotency_keys", "locked_until")
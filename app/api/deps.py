@@ -1,45 +1,139 @@
+from dataclasses import dataclass
 from datetime import datetime, timezone
-from arrow import now
-from fastapi import Depends, Header, HTTPException, status
-from matplotlib.pyplot import arrow
-from sqlalchemy.orm import Session as OrmSession
+from fastapi import Depends, Header, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.db.session import get_db
-from app.models import user
+from app.core.config import settings
+from app.core.security import decode_session_token
+from app.db.session import get_async_db, open_async_session
 from app.models.session import Session as SessionModel
 from app.models.user import User
-from app.models.enums import UserRole, SessionEndReason
-from app.services.locks import release_lock_if_owner
+from app.models.enums import UserRole
+from app.services.idempotency import MAX_KEY_LENGTH, IdempotentReplay, fingerprint, store as idempotency_store
+from app.services.locks import lock_manager
+from app.services.revocation import is_revoked
+from app.services.session_partitions import live_since
 
-def get_current_session(
-    db: OrmSession = Depends(get_db),
+# Stand-ins for the ORM rows when the session comes from a signed token
+@dataclass(frozen=True)
+class TokenSession:
+    id: int
+    session_id: str
+    user_id: int
+    role: UserRole
+    expires_at: datetime
+
+@dataclass(frozen=True)
+class TokenUser:
+    id: int
+    username: str
+    full_name: str
+    role: UserRole
+    is_active: bool = True
+
+def session_token_claims(sess: SessionModel, user: User) -> dict:
+    return {
+        "id": sess.id,
+        "sid": sess.session_id,
+        "uid": user.id,
+        "usr": user.username,
+        "name": user.full_name,
+        "role": user.role.value,
+        "exp": int(sess.expires_at.timestamp()),
+    }
+
+def session_from_token(token: str) -> tuple[TokenSession, TokenUser]:
+    claims = decode_session_token(token)
+    if not claims:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
+    expires_at = datetime.fromtimestamp(claims["exp"], timezone.utc)
+    if expires_at <= datetime.now(timezone.utc):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired")
+    if is_revoked(claims["sid"], claims["uid"]):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session ended")
+    role = UserRole(claims["role"])
+    sess = TokenSession(id=claims["id"], session_id=claims["sid"], user_id=claims["uid"], role=role, expires_at=expires_at)
+    user = TokenUser(id=claims["uid"], username=claims["usr"], full_name=claims["name"], role=role)
+    return sess, user
+
+async def _role_lock_heartbeat(db: AsyncSession, sess):
+    if sess.role in (UserRole.OFFICER, UserRole.SUPERVISOR) and not await lock_manager.heartbeat(db, sess.role, sess):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Role lock lost")
+
+async def get_current_session(
+    db: AsyncSession = Depends(get_async_db),
     x_session_id: str | None = Header(None)
     ) -> tuple[SessionModel, User]:
     if not x_session_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing session")
-    sess = db.execute(select(SessionModel).where(SessionModel.session_id == x_session_id)).scalar_one_or_none()
+    if settings.SESSION_MODE == "signed":
+        # The session is never loaded from the database; get_async_db only
+        # connects when a role lease heartbeat is due
+        sess, user = session_from_token(x_session_id)
+        await _role_lock_heartbeat(db, sess)
+        return sess, user
+    now = datetime.now(timezone.utc)
+    sess = (await db.execute(
+        select(SessionModel)
+        .where(SessionModel.session_id == x_session_id, SessionModel.login_at >= live_since(now))
+    )).scalar_one_or_none()
     if not sess:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid session")
-    now = arrow.now()
     if sess.expires_at <= now or sess.logout_at is not None:
-        # mark expired if needed
-        if sess.logout_at is None:
-            sess.logout_at = sess.expires_at
-            sess.ended_reason = SessionEndReason.EXPIRED
-            db.commit()
-        # release role lock if held
-        if sess.role in (UserRole.OFFICER, UserRole.SUPERVISOR):
-            release_lock_if_owner(db, sess.role, sess)
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired")
-        user = db.get(User, sess.user_id)
-        if not user or not user.is_active:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User inactive")
+        # Marking it EXPIRED and freeing its role lock is left to the session reaper
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired")
+    user = await db.get(User, sess.user_id)
+    if not user or not user.is_active:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User inactive")
+    await _role_lock_heartbeat(db, sess)
     return sess, user
 
+async def get_stream_session(x_session_id: str | None = Header(None)) -> tuple[SessionModel, User]:
+    """get_current_session for streaming responses.
+
+    Authenticates on a session of its own and closes it before the response
+    starts, so a long-lived stream doesn't keep a pooled connection idle in
+    transaction for as long as the client stays connected.
+    """
+    db = open_async_session()
+    try:
+        return await get_current_session(db=db, x_session_id=x_session_id)
+    finally:
+        await db.close()
+
 def require_role(required: UserRole):
-    def checker(data=Depends(get_current_session)):
+    async def checker(data=Depends(get_current_session)):
         sess, user = data
         if user.role != required:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
         return sess, user
-    return checker
\ No newline at end of file
+    return checker
+
+async def idempotent(request: Request, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
+    """Replays the first response to a POST retried with the same Idempotency-Key.
+
+    Runs on the request's session, so checking the key costs no second connection.
+    """
+    claim = request.scope.get("idempotency")
+    if claim is None:
+        return
+    if len(claim.key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Idempotency-Key too long")
+    sess, user = data
+    claim.owner = str(user.id)
+    claim.fingerprint = fingerprint(request.method, request.url.path, await request.body())
+    # Second round only when another call reserved the key between lookup and reserve
+    for _ in range(2):
+        stored = await idempotency_store.lookup(db, claim.owner, claim.key)
+        if stored is not None and stored.fingerprint != claim.fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was used for a different request")
+        if stored is not None and stored.complete:
+            idempotency_store.replayed()
+            raise IdempotentReplay(stored)
+        if stored is None or stored.abandoned(datetime.now(timezone.utc)):
+            if await idempotency_store.reserve(db, claim):
+                claim.active = True
+                return
+            continue
+        break
+    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A request with this Idempotency-Key is still in progress")
@@ -2,12 +2,13 @@ import uuid
 from datetime import datetime, timezone, timedelta
 import base64
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session as OrmSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.db.session import get_db
+from sqlalchemy.exc import IntegrityError
+from app.api.deps import session_from_token, session_token_claims
+from app.db.session import get_async_db
 from app.core.config import settings
-from app.core.security import verify_password, hash_password
-from app.models import user
+from app.core.security import create_session_token, decode_session_token
 from app.models.user import User
 from app.models.session import Session as SessionModel
 from app.models.enums import UserRole, SessionEndReason
@@ -16,8 +17,12 @@ LoginIn, LoginSuccessOut, FirstLoginRequiredOut, FirstLoginChangeIn,
 RoleInUseOut, RequestResetIn, ResetPasswordIn
 )
 from app.schemas.common import SessionCheckOut, MessageOut
-from app.services.email_service import send_email
-from app.services.locks import get_active_lock, acquire_lock, release_lock_if_owner
+from app.services.email_service import enqueue_email
+from app.services.email_dispatcher import dispatcher
+from app.services.password_hasher import hasher
+from app.services.locks import lock_manager
+from app.services.revocation import revoke_session
+from app.services.session_partitions import create_missing_partitions, is_missing_partition, live_since
 
 router = APIRouter()
 
@@ -28,17 +33,42 @@ def _now():
     return datetime.now(timezone.utc)
 
 @router.post("/login", response_model=LoginSuccessOut | FirstLoginRequiredOut | RoleInUseOut)
-def login(payload: LoginIn, request: Request, db: OrmSession = Depends(get_db)):
-    user = db.execute(select(User).where(User.username == payload.username)).scalar_one_or_none()
-    if not user or not verify_password(payload.password, user.hashed_password):
+async def login(payload: LoginIn, request: Request, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.username == payload.username))).scalar_one_or_none()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    valid, new_hash = await hasher.verify_and_update(payload.password, user.hashed_password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # Cost parameters changed since this hash was made; saved with the session below,
+        # or on its own when no session is created
+        user.hashed_password = new_hash
     
     if user.is_first_login:
+        if new_hash:
+            await db.commit()
         return FirstLoginRequiredOut()
 
-# Create session
+    # A login month the partition job hasn't created yet fails the insert;
+    # create it here and retry once rather than refuse every login
+    try:
+        return await _open_session(db, user, request)
+    except IntegrityError as exc:
+        if not is_missing_partition(exc):
+            raise
+        await db.rollback()
+    await create_missing_partitions(_now())
+    await db.refresh(user)
+    if new_hash:
+        user.hashed_password = new_hash
+    return await _open_session(db, user, request)
+
+async def _open_session(db: AsyncSession, user: User, request: Request):
     session_id = uuid.uuid4().hex
-    expires_at = _now() + timedelta(minutes=settings.SESSION_DURATION_MINUTES)
+    # login_at is the partition key; set here so expires_at lines up with it
+    login_at = _now()
+    expires_at = login_at + timedelta(minutes=settings.SESSION_DURATION_MINUTES)
     ip = request.client.host if request.client else None
     ua = request.headers.get("user-agent", "")
 
@@ -46,80 +76,89 @@ def login(payload: LoginIn, request: Request, db: OrmSession = Depends(get_db)):
         session_id=session_id,
         user_id=user.id,
         role=user.role,
+        login_at=login_at,
         expires_at=expires_at,
         ip_address=ip,
         user_agent=ua,
     )
     db.add(sess)
-    db.commit()
-    db.refresh(sess)
 
-    # Role lock for OFFICER/SUPERVISOR
+    # Role lock for OFFICER/SUPERVISOR, decided in the same transaction as the session insert
     if user.role in (UserRole.OFFICER, UserRole.SUPERVISOR):
-        active = get_active_lock(db, user.role)
-        if active:
-            # Cleanup created session since we can't use it
-            sess.logout_at = _now()
-            sess.ended_reason = SessionEndReason.EXPIRED
-            db.commit()
-            return RoleInUseOut(role_in_use=True, locked_since=active.locked_at, message="Role currently in use by another user")
-        acquired = acquire_lock(db, user.role, sess)
+        await db.flush()
+        acquired, locked_since = await lock_manager.acquire(db, user.role, sess)
         if not acquired:
+            # Keep the attempt in the session log, ended right away
             sess.logout_at = _now()
             sess.ended_reason = SessionEndReason.EXPIRED
-            db.commit()
-            return RoleInUseOut(role_in_use=True, locked_since=None, message="Role currently in use by another user")
+            await db.commit()
+            return RoleInUseOut(role_in_use=True, locked_since=locked_since, message="Role currently in use by another user")
+    await db.commit()
 
+    if settings.SESSION_MODE == "signed":
+        session_id = create_session_token(session_token_claims(sess, user))
     return LoginSuccessOut(session_id=session_id, role=user.role.value, username=user.username, expires_at=expires_at)
 
 @router.get("/session-check", response_model=SessionCheckOut)
-def session_check(x_session_id: str | None = None, db: OrmSession = Depends(get_db)):
+async def session_check(x_session_id: str | None = None, db: AsyncSession = Depends(get_async_db)):
     if not x_session_id:
         return SessionCheckOut(valid=False)
-    sess = db.execute(select(SessionModel).where(SessionModel.session_id == x_session_id)).scalar_one_or_none()
+    if settings.SESSION_MODE == "signed":
+        try:
+            sess, user = session_from_token(x_session_id)
+        except HTTPException:
+            return SessionCheckOut(valid=False)
+        return SessionCheckOut(valid=True, username=user.username, role=user.role.value, expires_at=sess.expires_at)
+    sess = (await db.execute(
+        select(SessionModel)
+        .where(SessionModel.session_id == x_session_id, SessionModel.login_at >= live_since(_now()))
+    )).scalar_one_or_none()
     if not sess or sess.logout_at is not None:
         return SessionCheckOut(valid=False)
     if sess.expires_at <= _now():
-        if sess.logout_at is None:
-            sess.logout_at = sess.expires_at
-            sess.ended_reason = SessionEndReason.EXPIRED
-            db.commit()
-        if sess.role in (UserRole.OFFICER, UserRole.SUPERVISOR):
-            release_lock_if_owner(db, sess.role, sess)
         return SessionCheckOut(valid=False)
-    user = db.get(User, sess.user_id)
+    user = await db.get(User, sess.user_id)
     if not user or not user.is_active:
         return SessionCheckOut(valid=False)
     return SessionCheckOut(valid=True, username=user.username, role=user.role.value, expires_at=sess.expires_at)
 
 @router.post("/logout", response_model=MessageOut)
-def logout(x_session_id: str | None = None, db: OrmSession = Depends(get_db)):
+async def logout(x_session_id: str | None = None, db: AsyncSession = Depends(get_async_db)):
     if not x_session_id:
         return MessageOut(message="Logged out")
-    sess = db.execute(select(SessionModel).where(SessionModel.session_id == x_session_id)).scalar_one_or_none()
+    if settings.SESSION_MODE == "signed":
+        claims = decode_session_token(x_session_id)
+        if not claims:
+            return MessageOut(message="Logged out")
+        x_session_id = claims["sid"]
+    sess = (await db.execute(
+        select(SessionModel)
+        .where(SessionModel.session_id == x_session_id, SessionModel.login_at >= live_since(_now()))
+    )).scalar_one_or_none()
     if not sess or sess.logout_at is not None:
         return MessageOut(message="Logged out")
     sess.logout_at = _now()
     sess.ended_reason = SessionEndReason.LOGOUT
-    db.commit()
     if sess.role in (UserRole.OFFICER, UserRole.SUPERVISOR):
-        release_lock_if_owner(db, sess.role, sess)
+        await lock_manager.release(db, sess.role, sess)
+    await db.commit()
+    revoke_session(sess.session_id, sess.expires_at)
     return MessageOut(message="Logged out")
 
 @router.post("/first-login-change", response_model=MessageOut)
-def first_login_change(payload: FirstLoginChangeIn, db: OrmSession = Depends(get_db)):
-    user = db.execute(select(User).where(User.username == payload.username)).scalar_one_or_none()
+async def first_login_change(payload: FirstLoginChangeIn, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.username == payload.username))).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if not user.is_first_login:
         raise HTTPException(status_code=403, detail="Already completed first login change")
-    if not verify_password(payload.old_password, user.hashed_password):
+    if not await hasher.verify(payload.old_password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     if payload.new_password == settings.DEFAULT_PASSWORD:
         raise HTTPException(status_code=400, detail="New password cannot be the default password")
-        user.hashed_password = hash_password(payload.new_password)
+        user.hashed_password = await hasher.hash(payload.new_password)
         user.is_first_login = False
-        db.commit()
+        await db.commit()
     return MessageOut(message="Password updated, please log in")
 
 def make_reset_token(email: str) -> str:
@@ -138,25 +177,27 @@ def parse_reset_token(token: str) -> str | None:
         return None
 
 @router.post("/request-reset", response_model=MessageOut)
-def request_reset(payload: RequestResetIn, db: OrmSession = Depends(get_db)):
-    user = db.execute(select(User).where(User.email == payload.email)).scalar_one_or_none()
+async def request_reset(payload: RequestResetIn, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.email == payload.email))).scalar_one_or_none()
     if not user:
         return MessageOut(message="If this email exists, a reset token was sent")
     token = make_reset_token(user.email)
-    send_email(user.email, "Password Reset", f"Your reset token: {token}")
+    enqueue_email(db, user.email, "Password Reset", f"Your reset token: {token}")
+    await db.commit()
+    dispatcher.wake()
     return MessageOut(message="If this email exists, a reset token was sent")
 
 @router.post("/reset-password", response_model=MessageOut)
-def reset_password(payload: ResetPasswordIn, db: OrmSession = Depends(get_db)):
+async def reset_password(payload: ResetPasswordIn, db: AsyncSession = Depends(get_async_db)):
     email = parse_reset_token(payload.token)
     if not email:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
-        user = db.execute(select(User).where(User.email == email)).scalar_one_or_none()
+        user = (await db.execute(select(User).where(User.email == email))).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if payload.new_password == settings.DEFAULT_PASSWORD:
         raise HTTPException(status_code=400, detail="New password cannot be the default password")
-        user.hashed_password = hash_password(payload.new_password)
+        user.hashed_password = await hasher.hash(payload.new_password)
         user.is_first_login = False
-        db.commit()
+        await db.commit()
     return MessageOut(message="Password reset successful. Please log in.")
\ No newline at end of file
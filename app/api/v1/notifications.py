@@ -1,28 +1,97 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session as OrmSession
+import asyncio
+import json
+from fastapi import APIRouter, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from app.api.deps import get_current_session
-from app.db.session import get_db
+from app.api.deps import get_current_session, get_stream_session
+from app.core.config import settings
+from app.db.session import get_async_db, get_read_db, open_read_session
 from app.models.notification import Notification
-from app.schemas.notification import NotificationOut
+from app.schemas.notification import NotificationOut, NotificationIdsIn, UnreadCountOut
+from app.services.notification_broker import broker
+from app.services import notifications as notification_service
 
 router = APIRouter()
 
 @router.get("", response_model=list[NotificationOut])
-def list_notifications(data=Depends(get_current_session), db: OrmSession = Depends(get_db)):
+async def list_notifications(data=Depends(get_current_session), db: AsyncSession = Depends(get_read_db)):
     sess, user = data
-    rows = db.execute(
+    rows = (await db.execute(
     select(Notification)
-    .where((Notification.user_id == user.id) | (Notification.role == user.role.value))
-    .order_by(Notification.created_at.desc())
-    ).scalars().all()
+    .where(Notification.user_id == user.id)
+    .order_by(Notification.id.desc())
+    )).scalars().all()
     return rows
 
+def _sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: notification\ndata: {json.dumps(event)}\n\n"
+
+async def _missed_since(user, last_id: int) -> list[dict]:
+    db = open_read_session()
+    try:
+        rows = (await db.execute(
+        select(Notification)
+        .where(Notification.user_id == user.id, Notification.id > last_id)
+        .order_by(Notification.id)
+        .limit(100)
+        )).scalars().all()
+        return [notification_service.notification_event(n) for n in rows]
+    finally:
+        await db.close()
+
+@router.get("/stream")
+async def stream_notifications(
+    request: Request,
+    last_event_id: int | None = Header(None),
+    data=Depends(get_stream_session),
+):
+    sess, user = data
+    # Subscribe before replaying so nothing written in between is lost
+    sub = broker.subscribe(user.id)
+
+    async def events():
+        last_id = last_event_id or 0
+        try:
+            if last_event_id is not None:
+                for event in await _missed_since(user, last_id):
+                    last_id = event["id"]
+                    yield _sse(event)
+            while not sub.overflowed:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), settings.NOTIFICATION_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                if event["id"] > last_id:
+                    last_id = event["id"]
+                    yield _sse(event)
+        finally:
+            broker.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/unread-count", response_model=UnreadCountOut)
+async def unread_count(data=Depends(get_current_session), db: AsyncSession = Depends(get_read_db)):
+    sess, user = data
+    return {"unread": await notification_service.unread_count(db, user.id)}
+
+@router.post("/mark-read")
+async def mark_many_read(payload: NotificationIdsIn, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
+    sess, user = data
+    marked = await notification_service.mark_read(db, user.id, payload.ids)
+    return {"message": "OK", "marked": marked}
+
+@router.post("/mark-all-read")
+async def mark_all_read(data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
+    sess, user = data
+    marked = await notification_service.mark_all_read(db, user.id)
+    return {"message": "OK", "marked": marked}
+
 @router.post("/{notif_id}/mark-read")
-def mark_read(notif_id: int, data=Depends(get_current_session), db: OrmSession = Depends(get_db)):
-    n = db.get(Notification, notif_id)
-    if not n:
-        return {"message": "OK"}
-    n.is_read = True
-    db.commit()
-    return {"message": "OK"}
\ No newline at end of file
+async def mark_read(notif_id: int, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
+    sess, user = data
+    await notification_service.mark_read(db, user.id, [notif_id])
+    return {"message": "OK"}
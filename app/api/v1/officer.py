@@ -1,27 +1,36 @@
 from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session as OrmSession
-from sqlalchemy import select, func
-from app.api.deps import require_role, get_current_session
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, insert, update, or_, tuple_
+from app.api.deps import require_role, get_current_session, idempotent
+from app.core.fast_json import RowsResponse, row_dicts
+from app.core.sql_audit import query_budget
+from app.db.session import get_async_db, get_read_db
 from app.models.user import User
-from app.models.enums import UserRole, RequestStatus
+from app.models.enums import UserRole, RequestStatus, BulkResult
 from app.models.session import Session as SessionModel
 from app.models.tool_requests import ToolAdditionRequest
 from app.models.inventory import ToolInventory
-from app.schemas.user import UserCreateIn, UserOut
+from app.schemas.user import UserCreateIn, UserOut, UserImportOut
 from app.schemas.inventory import ToolAdditionOut, ApproveToolAdditionOut
-from app.schemas.common import MessageOut
+from app.schemas.common import MessageOut, BulkActionIn, BulkRejectIn, BulkItemResult, BulkActionOut
 from app.core.config import settings
-from app.core.security import hash_password
+from app.services.id_generator import make_request_id, tool_codes
+from app.services.inventory import lock_tool_identities, receive_stock_many
+from app.services.ledger import stock_at, movements_between, reconcile
+from app.services.password_hasher import hasher
+from app.services.pagination import encode_cursor, decode_cursor
+from app.services.revocation import persist_user_revocation, revoke_user
+from app.services.session_partitions import live_since
+from app.services.user_import import parse_user_file, import_users
 
 router = APIRouter()
 
 @router.post("/users", response_model=UserOut, dependencies=[Depends(require_role(UserRole.OFFICER))])
-def create_user(payload: UserCreateIn, db: OrmSession = Depends(get_db)):
-    if db.execute(select(User).where(User.username == payload.username)).scalar_one_or_none():
+async def create_user(payload: UserCreateIn, db: AsyncSession = Depends(get_async_db)):
+    if (await db.execute(select(User).where(User.username == payload.username))).scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Username already exists")
-    if db.execute(select(User).where(User.email == payload.email)).scalar_one_or_none():
+    if (await db.execute(select(User).where(User.email == payload.email))).scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Email already exists")
     user = User(
     full_name=payload.full_name,
@@ -29,35 +38,48 @@ def create_user(payload: UserCreateIn, db: OrmSession = Depends(get_db)):
     email=payload.email,
     contact_number=payload.contact_number,
     role=payload.role,
-    hashed_password=hash_password(settings.DEFAULT_PASSWORD),
+    hashed_password=await hasher.hash(settings.DEFAULT_PASSWORD),
     is_first_login=True,
     is_active=True,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
-@router.get("/users", response_model=list[UserOut], dependencies=[Depends(require_role(UserRole.OFFICER))])
-def list_users(db: OrmSession = Depends(get_db)):
-    users = db.execute(select(User).order_by(User.created_at.desc())).scalars().all()
-    return users
+@router.post("/users/import", response_model=UserImportOut, dependencies=[Depends(require_role(UserRole.OFFICER))])
+async def import_users_file(file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db)):
+    try:
+        rows = parse_user_file(await file.read(), file.filename or "")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable file: {e}")
+    return await import_users(db, rows)
+
+@router.get("/users", response_model=list[UserOut], dependencies=[Depends(require_role(UserRole.OFFICER)), Depends(query_budget(1))])
+async def list_users(db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(
+    select(User.id, User.username, User.full_name, User.email, User.contact_number, User.role, User.is_active)
+    .order_by(User.created_at.desc())
+    )
+    return RowsResponse(row_dicts(result))
 
 @router.delete("/users/{user_id}", response_model=MessageOut, dependencies=[Depends(require_role(UserRole.OFFICER))])
-def delete_user(user_id: int, db: OrmSession = Depends(get_db)):
-    user = db.get(User, user_id)
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    persist_user_revocation(db, user_id)
+    await db.commit()
+    revoke_user(user_id)
     return MessageOut(message="User deleted")
 
-@router.get("/tool-additions", response_model=list[ToolAdditionOut], dependencies=[Depends(require_role(UserRole.OFFICER))])
-def list_tool_additions(status_filter: RequestStatus | None = None, db: OrmSession = Depends(get_db)):
+@router.get("/tool-additions", response_model=list[ToolAdditionOut], dependencies=[Depends(require_role(UserRole.OFFICER)), Depends(query_budget(1))])
+async def list_tool_additions(status_filter: RequestStatus | None = None, db: AsyncSession = Depends(get_async_db)):
     stmt = select(ToolAdditionRequest)
     if status_filter:
         stmt = stmt.where(ToolAdditionRequest.status == status_filter)
-        rows = db.execute(stmt.order_by(ToolAdditionRequest.requested_at.desc())).scalars().all()
+    rows = (await db.execute(stmt.order_by(ToolAdditionRequest.requested_at.desc()))).scalars().all()
     return [
     ToolAdditionOut(
     request_id=r.request_id,
@@ -71,115 +93,279 @@ def list_tool_additions(status_filter: RequestStatus | None = None, db: OrmSessi
     ) for r in rows
     ]
 
-@router.post("/tool-additions/{request_id}/approve", response_model=ApproveToolAdditionOut, dependencies=[Depends(require_role(UserRole.OFFICER))])
-def approve_tool_addition(request_id: str, data=Depends(get_current_session), db: OrmSession = Depends(get_db)):
+@router.post("/tool-additions/{request_id}/approve", response_model=ApproveToolAdditionOut, dependencies=[Depends(require_role(UserRole.OFFICER)), Depends(idempotent)])
+async def approve_tool_addition(request_id: str, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
     sess, officer = data
-    req = db.execute(select(ToolAdditionRequest).where(ToolAdditionRequest.request_id == request_id)).scalar_one_or_none()
+    now = datetime.now(timezone.utc)
+    # Claim the request first, as the bulk route's row locks do, so a
+    # concurrent approval can't receive the stock twice
+    req = (await db.execute(
+        update(ToolAdditionRequest)
+        .where(ToolAdditionRequest.request_id == request_id, ToolAdditionRequest.status == RequestStatus.PENDING)
+        .values(status=RequestStatus.APPROVED, reviewed_at=now, officer_id=officer.id)
+        .returning(
+            ToolAdditionRequest.tool_name, ToolAdditionRequest.make, ToolAdditionRequest.range_mm,
+            ToolAdditionRequest.location, ToolAdditionRequest.quantity,
+        )
+        .execution_options(synchronize_session=False)
+    )).one_or_none()
     if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
-    if req.status != RequestStatus.PENDING:
+        if (await db.execute(select(ToolAdditionRequest.id).where(ToolAdditionRequest.request_id == request_id))).scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Request not found")
         raise HTTPException(status_code=400, detail="Request already processed")
-    inv = db.execute(
+    await lock_tool_identities(db, [(req.tool_name, req.make, req.range_mm, req.location)])
+    inv = (await db.execute(
     select(ToolInventory).where(
         (ToolInventory.name == req.tool_name) &
         (ToolInventory.make == req.make) &
         (ToolInventory.range_mm == req.range_mm) &
         (ToolInventory.location == req.location)
         )
-    ).scalar_one_or_none()
-
-    if inv:
-        inv.quantity_total += req.quantity
-        inv.quantity_available += req.quantity
-    else:
-        next_id = (db.execute(select(func.max(ToolInventory.id))).scalar() or 0) + 1
-        tool_code = f"T{next_id:05d}"
+    )).scalar_one_or_none()
+
+    if not inv:
         inv = ToolInventory(
-            tool_code=tool_code,
+            tool_code=make_request_id("T", await tool_codes.allocate(db)),
             name=req.tool_name,
             make=req.make,
             range_mm=req.range_mm,
             location=req.location,
-            quantity_total=req.quantity,
-            quantity_available=req.quantity,
+            quantity_total=0,
+            quantity_available=0,
             status="ACTIVE",
         )
         db.add(inv)
-
-    req.status = RequestStatus.APPROVED
-    req.reviewed_at = datetime.now(timezone.utc)
-    req.officer_id = officer.id
-
-    db.commit()
+        await db.flush()
+    await receive_stock_many(db, [(inv.id, req.quantity, request_id)])
+    await db.commit()
 
     return ApproveToolAdditionOut(
-        request_id=req.request_id,
-        status=req.status.value,
+        request_id=request_id,
+        status=RequestStatus.APPROVED.value,
         tool_name=req.tool_name,
         make=req.make,
         range_mm=req.range_mm,
         quantity=req.quantity,
-        approved_at=req.reviewed_at,
+        approved_at=now,
         officer={"id": officer.id, "name": officer.full_name},
     )
 
 @router.post("/tool-additions/{request_id}/reject", response_model=MessageOut, dependencies=[Depends(require_role(UserRole.OFFICER))])
-def reject_tool_addition(request_id: str, reason: str = "Not approved", data=Depends(get_current_session), db: OrmSession = Depends(get_db)):
+async def reject_tool_addition(request_id: str, reason: str = "Not approved", data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
     _, officer = data
-    req = db.execute(select(ToolAdditionRequest).where(ToolAdditionRequest.request_id == request_id)).scalar_one_or_none()
-    if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
-    if req.status != RequestStatus.PENDING:
+    # Conditional on PENDING so a reject can't overwrite an approval that already received stock
+    rejected = (await db.execute(
+        update(ToolAdditionRequest)
+        .where(ToolAdditionRequest.request_id == request_id, ToolAdditionRequest.status == RequestStatus.PENDING)
+        .values(status=RequestStatus.REJECTED, reviewed_at=datetime.now(timezone.utc), reviewer_remarks=reason, officer_id=officer.id)
+        .returning(ToolAdditionRequest.id)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    if rejected is None:
+        if (await db.execute(select(ToolAdditionRequest.id).where(ToolAdditionRequest.request_id == request_id))).scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Request not found")
         raise HTTPException(status_code=400, detail="Request already processed")
-    req.status = RequestStatus.REJECTED
-    req.reviewed_at = datetime.now(timezone.utc)
-    req.reviewer_remarks = reason
-    req.officer_id = officer.id
-    db.commit()
+    await db.commit()
     return MessageOut(message="Rejected")
 
-@router.get("/session-logs", dependencies=[Depends(require_role(UserRole.OFFICER))])
-def session_logs(role: UserRole | None = None, username: str | None = None, status_filter: str | None = None, db: OrmSession = Depends(get_db)):
-    stmt = select(SessionModel).join(User, User.id == SessionModel.user_id)
+@router.post("/tool-additions/bulk-approve", response_model=BulkActionOut, dependencies=[Depends(require_role(UserRole.OFFICER)), Depends(idempotent)])
+async def bulk_approve_tool_additions(payload: BulkActionIn, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
+    _, officer = data
+    ids = list(dict.fromkeys(payload.request_ids))
+    reqs = (await db.execute(
+        select(
+            ToolAdditionRequest.id, ToolAdditionRequest.request_id, ToolAdditionRequest.status, ToolAdditionRequest.tool_name,
+            ToolAdditionRequest.make, ToolAdditionRequest.range_mm, ToolAdditionRequest.location, ToolAdditionRequest.quantity,
+        )
+        .where(ToolAdditionRequest.request_id.in_(ids))
+        .order_by(ToolAdditionRequest.id)
+        .with_for_update()
+    )).all()
+    pending = [r for r in reqs if r.status == RequestStatus.PENDING]
+
+    keys = list(dict.fromkeys((r.tool_name, r.make, r.range_mm, r.location) for r in pending))
+    tool_ids = {}
+    if keys:
+        await lock_tool_identities(db, keys)
+        tool_ids = {
+            (i.name, i.make, i.range_mm, i.location): i.id
+            for i in (await db.execute(
+                select(ToolInventory.id, ToolInventory.name, ToolInventory.make, ToolInventory.range_mm, ToolInventory.location)
+                .where(tuple_(ToolInventory.name, ToolInventory.make, ToolInventory.range_mm, ToolInventory.location).in_(keys))
+                .order_by(ToolInventory.id)
+                .with_for_update()
+            )).all()
+        }
+    new_tools = [k for k in keys if k not in tool_ids]
+    if new_tools:
+        # Created empty; the stock arrives through receive_stock_many like any other receipt
+        codes = await tool_codes.allocate_many(db, len(new_tools))
+        created = (await db.execute(
+            insert(ToolInventory)
+            .values([
+                {
+                    "tool_code": make_request_id("T", code),
+                    "name": name,
+                    "make": make,
+                    "range_mm": range_mm,
+                    "location": location,
+                    "quantity_total": 0,
+                    "quantity_available": 0,
+                    "status": "ACTIVE",
+                } for code, (name, make, range_mm, location) in zip(codes, new_tools)
+            ])
+            .returning(ToolInventory.id, ToolInventory.name, ToolInventory.make, ToolInventory.range_mm, ToolInventory.location)
+        )).all()
+        tool_ids.update({(i.name, i.make, i.range_mm, i.location): i.id for i in created})
+    await receive_stock_many(db, [
+        (tool_ids[(r.tool_name, r.make, r.range_mm, r.location)], r.quantity, r.request_id) for r in pending
+    ])
+    if pending:
+        await db.execute(
+            update(ToolAdditionRequest)
+            .where(ToolAdditionRequest.id.in_([r.id for r in pending]))
+            .values(status=RequestStatus.APPROVED, reviewed_at=datetime.now(timezone.utc), officer_id=officer.id)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+    results = {r.request_id: BulkResult.APPROVED if r.status == RequestStatus.PENDING else BulkResult.ALREADY_PROCESSED for r in reqs}
+    return BulkActionOut(results=[BulkItemResult(request_id=rid, result=results.get(rid, BulkResult.NOT_FOUND)) for rid in ids])
+
+@router.post("/tool-additions/bulk-reject", response_model=BulkActionOut, dependencies=[Depends(require_role(UserRole.OFFICER))])
+async def bulk_reject_tool_additions(payload: BulkRejectIn, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
+    _, officer = data
+    ids = list(dict.fromkeys(payload.request_ids))
+    rejected = set((await db.execute(
+        update(ToolAdditionRequest)
+        .where(ToolAdditionRequest.request_id.in_(ids), ToolAdditionRequest.status == RequestStatus.PENDING)
+        .values(status=RequestStatus.REJECTED, reviewed_at=datetime.now(timezone.utc), reviewer_remarks=payload.reason, officer_id=officer.id)
+        .returning(ToolAdditionRequest.request_id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all())
+    existing = set((await db.execute(
+        select(ToolAdditionRequest.request_id).where(ToolAdditionRequest.request_id.in_([rid for rid in ids if rid not in rejected]))
+    )).scalars().all())
+    await db.commit()
+    return BulkActionOut(results=[
+        BulkItemResult(
+            request_id=rid,
+            result=BulkResult.REJECTED if rid in rejected else BulkResult.ALREADY_PROCESSED if rid in existing else BulkResult.NOT_FOUND,
+        ) for rid in ids
+    ])
+
+@router.get("/tools/{tool_id}/stock", dependencies=[Depends(require_role(UserRole.OFFICER))])
+async def tool_stock_at(tool_id: int, at: datetime | None = None, db: AsyncSession = Depends(get_read_db)):
+    if await db.get(ToolInventory, tool_id) is None:
+        raise HTTPException(status_code=404, detail="Tool not found")
+    at = at or datetime.now(timezone.utc)
+    return {"tool_id": tool_id, "at": at, "quantity_available": await stock_at(db, tool_id, at)}
+
+@router.get("/tools/{tool_id}/movements", dependencies=[Depends(require_role(UserRole.OFFICER)), Depends(query_budget(1))])
+async def tool_movements(
+    tool_id: int,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db),
+):
+    after = None
+    if cursor:
+        after = decode_cursor(cursor)
+        if not after:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    rows = await movements_between(db, tool_id, start, end, after, limit)
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return {
+        "items": [
+            {
+            "id": m.id,
+            "delta": m.delta,
+            "kind": m.kind.value,
+            "ref": m.ref,
+            "created_at": m.created_at,
+            } for m in rows[:limit]
+        ],
+        "next_cursor": next_cursor,
+    }
+
+@router.post("/inventory/reconcile", dependencies=[Depends(require_role(UserRole.OFFICER))])
+async def reconcile_inventory(db: AsyncSession = Depends(get_async_db)):
+    mismatches = await reconcile(db)
+    return {"ok": not mismatches, "mismatches": mismatches}
+
+@router.get("/session-logs", dependencies=[Depends(require_role(UserRole.OFFICER)), Depends(query_budget(1))])
+async def session_logs(
+    role: UserRole | None = None,
+    username: str | None = None,
+    status_filter: str | None = None,
+    login_from: datetime | None = None,
+    login_to: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+):
+    now = datetime.now(timezone.utc)
+    stmt = (
+        select(
+            SessionModel.id,
+            SessionModel.session_id,
+            SessionModel.role,
+            SessionModel.login_at,
+            SessionModel.expires_at,
+            SessionModel.logout_at,
+            SessionModel.ended_reason,
+            SessionModel.ip_address,
+            User.username,
+            User.full_name,
+        )
+        .join(User, User.id == SessionModel.user_id)
+    )
     if role:
         stmt = stmt.where(SessionModel.role == role)
     if username:
         stmt = stmt.where(User.username == username)
-        rows = db.execute(stmt.order_by(SessionModel.login_at.desc())).scalars().all()
-        result = []
-        now = datetime.now(timezone.utc)
-        for s in rows:
-            u = db.get(User, s.user_id)
-            active = s.logout_at is None and s.expires_at > now
-            if status_filter == "ACTIVE" and not active:
-                continue
-            if status_filter == "ENDED" and active:
-                continue
-            result.append({
+    if status_filter == "ACTIVE":
+        stmt = stmt.where(SessionModel.logout_at.is_(None), SessionModel.expires_at > now, SessionModel.login_at >= live_since(now))
+    elif status_filter == "ENDED":
+        stmt = stmt.where(or_(SessionModel.logout_at.is_not(None), SessionModel.expires_at <= now))
+    if login_from:
+        stmt = stmt.where(SessionModel.login_at >= login_from)
+    if login_to:
+        stmt = stmt.where(SessionModel.login_at < login_to)
+    if cursor:
+        after = decode_cursor(cursor)
+        if not after:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        stmt = stmt.where(tuple_(SessionModel.login_at, SessionModel.id) < after)
+    # One extra row tells us whether there is a next page
+    stmt = stmt.order_by(SessionModel.login_at.desc(), SessionModel.id.desc()).limit(limit + 1)
+    rows = (await db.execute(stmt)).all()
+    next_cursor = encode_cursor(rows[limit - 1].login_at, rows[limit - 1].id) if len(rows) > limit else None
+    return {
+        "items": [
+            {
             "session_id": s.session_id,
-            "username": u.username if u else None,
-            "full_name": u.full_name if u else None,
+            "username": s.username,
+            "full_name": s.full_name,
             "role": s.role.value,
             "login_at": s.login_at,
             "expires_at": s.expires_at,
             "logout_at": s.logout_at,
             "ended_reason": s.ended_reason.value if s.ended_reason else None,
             "ip_address": s.ip_address,
-            })
-    return result
+            } for s in rows[:limit]
+        ],
+        "next_cursor": next_cursor,
+    }
 
-@router.get("/active-sessions", dependencies=[Depends(require_role(UserRole.OFFICER))])
-def active_sessions(db: OrmSession = Depends(get_db)):
+@router.get("/active-sessions", dependencies=[Depends(require_role(UserRole.OFFICER)), Depends(query_budget(1))])
+async def active_sessions(db: AsyncSession = Depends(get_async_db)):
     now = datetime.now(timezone.utc)
-    rows = db.execute(select(SessionModel).where(SessionModel.logout_at.is_(None))).scalars().all()
-    active = []
-    for s in rows:
-        if s.expires_at > now:
-            active.append({
-            "session_id": s.session_id,
-            "user_id": s.user_id,
-            "role": s.role.value,
-            "login_at": s.login_at,
-            "expires_at": s.expires_at,
-            })
-    return active
\ No newline at end of file
+    # Expiry filtered in SQL; the login_at bound keeps it to the live partitions
+    result = await db.execute(
+    select(SessionModel.session_id, SessionModel.user_id, SessionModel.role, SessionModel.login_at, SessionModel.expires_at)
+    .where(SessionModel.logout_at.is_(None), SessionModel.expires_at > now, SessionModel.login_at >= live_since(now))
+    )
+    return RowsResponse(row_dicts(result))
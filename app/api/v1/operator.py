@@ -1,47 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session as OrmSession
-from sqlalchemy import select, func
-from app.api.deps import require_role, get_current_session
-from app.db.session import get_db
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from app.api.deps import require_role, get_current_session, idempotent
+from app.db.session import get_async_db, get_read_db
 from app.models.enums import UserRole, RequestStatus
 from app.models.inventory import ToolInventory
 from app.models.tool_requests import ToolUsageRequest
-from app.schemas.inventory import ToolListItem
+from app.schemas.inventory import ToolListItem, ToolSearchOut
 from app.schemas.tool_requests import ToolUsageCreateIn, ToolUsageShortOut
-from app.services.id_generator import make_request_id
+from app.services.id_generator import make_request_id, usage_request_ids
+from app.services.inventory import restock
+from app.services.catalog import catalog, etag_matches
+from app.services.tool_search import tool_search
 
 router = APIRouter()
 
 @router.get("/tools", response_model=list[ToolListItem], dependencies=[Depends(require_role(UserRole.OPERATOR))])
-def list_available_tools(db: OrmSession = Depends(get_db)):
-    rows = db.execute(
-    select(ToolInventory)
-    .where(ToolInventory.quantity_available > 0)
-    .order_by(ToolInventory.name.asc())
-    ).scalars().all()
-    return [
-    ToolListItem(
-    tool_id=r.id,
-    name=r.name,
-    make=r.make,
-    range_mm=r.range_mm,
-    location=r.location,
-    quantity_available=r.quantity_available
-    ) for r in rows
-    ]
+async def list_available_tools(if_none_match: str | None = Header(None)):
+    # A fresh entry answers without touching the database
+    entry = await catalog.get()
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
 
-@router.post("/tool-requests", response_model=ToolUsageShortOut, dependencies=[Depends(require_role(UserRole.OPERATOR))])
-def create_tool_request(payload: ToolUsageCreateIn, data=Depends(get_current_session), db: OrmSession = Depends(get_db)):
+@router.get("/tools/search", response_model=ToolSearchOut, dependencies=[Depends(require_role(UserRole.OPERATOR))])
+async def search_tools(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+):
+    items, next_offset = await tool_search.search(db, q, limit, offset)
+    return ToolSearchOut(items=items, next_offset=next_offset)
+
+@router.post("/tool-requests", response_model=ToolUsageShortOut, dependencies=[Depends(require_role(UserRole.OPERATOR)), Depends(idempotent)])
+async def create_tool_request(payload: ToolUsageCreateIn, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
     sess, operator = data
-    inv = db.get(ToolInventory, payload.tool_id)
+    inv = await db.get(ToolInventory, payload.tool_id)
     if not inv:
         raise HTTPException(status_code=404, detail="Tool not found")
     if payload.requested_qty <= 0:
         raise HTTPException(status_code=400, detail="Invalid quantity")
     if payload.requested_qty > inv.quantity_available:
         raise HTTPException(status_code=400, detail="Requested quantity exceeds available")
-    next_id = (db.execute(select(func.max(ToolUsageRequest.id))).scalar() or 0) + 1
-    rid = make_request_id("TR", next_id)
+    rid = make_request_id("TR", await usage_request_ids.allocate(db))
 
     row = ToolUsageRequest(
         request_id=rid,
@@ -50,8 +53,8 @@ def create_tool_request(payload: ToolUsageCreateIn, data=Depends(get_current_ses
         requested_qty=payload.requested_qty,
     )
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    await db.commit()
+    await db.refresh(row)
     return ToolUsageShortOut(
         request_id=row.request_id,
         tool_id=row.tool_id,
@@ -61,10 +64,10 @@ def create_tool_request(payload: ToolUsageCreateIn, data=Depends(get_current_ses
         requested_at=row.requested_at,
     )
 
-@router.post("/tool-requests/{request_id}/mark-received", dependencies=[Depends(require_role(UserRole.OPERATOR))])
-def mark_received(request_id: str, data=Depends(get_current_session), db: OrmSession = Depends(get_db)):
+@router.post("/tool-requests/{request_id}/mark-received", dependencies=[Depends(require_role(UserRole.OPERATOR)), Depends(idempotent)])
+async def mark_received(request_id: str, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
     sess, operator = data
-    req = db.execute(select(ToolUsageRequest).where(ToolUsageRequest.request_id == request_id)).scalar_one_or_none()
+    req = (await db.execute(select(ToolUsageRequest).where(ToolUsageRequest.request_id == request_id))).scalar_one_or_none()
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
     if req.operator_id != operator.id:
@@ -74,25 +77,34 @@ def mark_received(request_id: str, data=Depends(get_current_session), db: OrmSes
     from datetime import datetime, timezone
     req.status = RequestStatus.RECEIVED
     req.received_at = datetime.now(timezone.utc)
-    db.commit()
+    await db.commit()
     return {"message": "Marked received"}
 
-@router.post("/tool-requests/{request_id}/return", dependencies=[Depends(require_role(UserRole.OPERATOR))])
-def return_tool(request_id: str, data=Depends(get_current_session), db: OrmSession = Depends(get_db)):
+@router.post("/tool-requests/{request_id}/return", dependencies=[Depends(require_role(UserRole.OPERATOR)), Depends(idempotent)])
+async def return_tool(request_id: str, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
     sess, operator = data
-    req = db.execute(select(ToolUsageRequest).where(ToolUsageRequest.request_id == request_id)).scalar_one_or_none()
+    from datetime import datetime, timezone
+    # Only the RECEIVED -> RETURNED transition may restock, so a repeated return is a no-op
+    req = (await db.execute(
+        update(ToolUsageRequest)
+        .where(
+            ToolUsageRequest.request_id == request_id,
+            ToolUsageRequest.operator_id == operator.id,
+            ToolUsageRequest.status == RequestStatus.RECEIVED,
+        )
+        .values(status=RequestStatus.RETURNED, returned_at=datetime.now(timezone.utc))
+        .returning(ToolUsageRequest.tool_id, ToolUsageRequest.requested_qty)
+        .execution_options(synchronize_session=False)
+    )).one_or_none()
     if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
-    if req.operator_id != operator.id:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    if req.status != RequestStatus.RECEIVED:
+        current = (await db.execute(select(ToolUsageRequest).where(ToolUsageRequest.request_id == request_id))).scalar_one_or_none()
+        if not current:
+            raise HTTPException(status_code=404, detail="Request not found")
+        if current.operator_id != operator.id:
+            raise HTTPException(status_code=403, detail="Forbidden")
         raise HTTPException(status_code=400, detail="Tool not in received status")
-    inv = db.get(ToolInventory, req.tool_id)
-    if not inv:
+    if not await restock(db, req.tool_id, req.requested_qty, request_id):
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Tool not found")
-    inv.quantity_available += req.requested_qty
-    from datetime import datetime, timezone
-    req.status = RequestStatus.RETURNED
-    req.returned_at = datetime.now(timezone.utc)
-    db.commit()
-    return {"message": "Returned"}
\ No newline at end of file
+    await db.commit()
+    return {"message": "Returned"}
@@ -1,24 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session as OrmSession
-from sqlalchemy import select, func, text
-from app.api.deps import require_role, get_current_session
-from app.db.session import get_db
-from app.models.enums import UserRole, RequestStatus
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
+from sqlalchemy.orm import aliased, selectinload
+from app.api.deps import require_role, get_current_session, idempotent
+from app.core.fast_json import RowsResponse, row_dicts
+from app.core.sql_audit import query_budget
+from app.db.session import get_async_db, get_read_db
+from app.models.enums import UserRole, RequestStatus, BulkResult, RollupGrain
 from app.models.tool_requests import ToolUsageRequest, ToolAdditionRequest
 from app.models.inventory import ToolInventory
+from app.models.user import User
 from app.schemas.tool_requests import ApproveToolUsageOut
 from app.schemas.inventory import ToolAdditionCreateIn, ToolAdditionOut
-from app.services.id_generator import make_request_id
+from app.schemas.common import BulkActionIn, BulkRejectIn, BulkItemResult, BulkActionOut
+from app.services.id_generator import make_request_id, addition_request_ids
+from app.services.inventory import take_stock, lock_stock, take_stock_many
+from app.services.analytics import summary
 
 router = APIRouter()
 
-@router.get("/tool-requests", dependencies=[Depends(require_role(UserRole.SUPERVISOR))])
-def list_pending_tool_requests(db: OrmSession = Depends(get_db)):
-    rows = db.execute(
+@router.get("/tool-requests", dependencies=[Depends(require_role(UserRole.SUPERVISOR)), Depends(query_budget(3))])
+async def list_pending_tool_requests(db: AsyncSession = Depends(get_async_db)):
+    rows = (await db.execute(
     select(ToolUsageRequest)
     .where(ToolUsageRequest.status == RequestStatus.PENDING)
+    # Relationships can't lazy-load under AsyncSession
+    .options(selectinload(ToolUsageRequest.operator), selectinload(ToolUsageRequest.tool))
     .order_by(ToolUsageRequest.requested_at.asc())
-    ).scalars().all()
+    )).scalars().all()
     return [
     {
     "request_id": r.request_id,
@@ -31,64 +41,122 @@ def list_pending_tool_requests(db: OrmSession = Depends(get_db)):
     } for r in rows
     ]
 
-@router.post("/tool-requests/{request_id}/approve", response_model=ApproveToolUsageOut, dependencies=[Depends(require_role(UserRole.SUPERVISOR))])
-def approve_tool_request(request_id: str, data=Depends(get_current_session), db: OrmSession = Depends(get_db)):
+@router.post("/tool-requests/{request_id}/approve", response_model=ApproveToolUsageOut, dependencies=[Depends(require_role(UserRole.SUPERVISOR)), Depends(idempotent)])
+async def approve_tool_request(request_id: str, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
     sess, user = data
-    req = db.execute(select(ToolUsageRequest).where(ToolUsageRequest.request_id == request_id)).scalar_one_or_none()
+    now = datetime.now(timezone.utc)
+    # Claim the request first so a concurrent approval of the same request can't decrement twice
+    req = (await db.execute(
+        update(ToolUsageRequest)
+        .where(ToolUsageRequest.request_id == request_id, ToolUsageRequest.status == RequestStatus.PENDING)
+        .values(status=RequestStatus.APPROVED, reviewed_at=now, approved_by=user.id, supervisor_id=user.id)
+        .returning(ToolUsageRequest.tool_id, ToolUsageRequest.requested_qty)
+        .execution_options(synchronize_session=False)
+    )).one_or_none()
     if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
-    if req.status != RequestStatus.PENDING:
+        if (await db.execute(select(ToolUsageRequest.id).where(ToolUsageRequest.request_id == request_id))).scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Request not found")
         raise HTTPException(status_code=400, detail="Request already processed")
-    inv = db.get(ToolInventory, req.tool_id)
-    if not inv:
-        raise HTTPException(status_code=404, detail="Tool not found")
-
-    # Lock table row to avoid race (Postgres)
-    db.execute(text("LOCK TABLE tool_inventory IN ROW EXCLUSIVE MODE"))
-    db.refresh(inv)
 
-    if inv.quantity_available < req.requested_qty:
+    inv = await take_stock(db, req.tool_id, req.requested_qty, request_id)
+    if not inv:
+        await db.rollback()
+        if await db.get(ToolInventory, req.tool_id) is None:
+            raise HTTPException(status_code=404, detail="Tool not found")
         raise HTTPException(status_code=400, detail="Insufficient stock at approval time")
 
-    inv.quantity_available -= req.requested_qty
-    req.status = RequestStatus.APPROVED
-    from datetime import datetime, timezone
-    req.reviewed_at = datetime.now(timezone.utc)
-    req.approved_by = user.id
-    req.supervisor_id = user.id
-
-    db.commit()
+    await db.commit()
 
     return ApproveToolUsageOut(
-        request_id=req.request_id,
-        status=req.status.value,
+        request_id=request_id,
+        status=RequestStatus.APPROVED.value,
         tool_id=inv.id,
         tool_name=inv.name,
         requested_qty=req.requested_qty,
         remaining_qty=inv.quantity_available,
-        approved_at=req.reviewed_at,
+        approved_at=now,
         approved_by={"id": user.id, "name": user.full_name},
     )
 
 @router.post("/tool-requests/{request_id}/reject", dependencies=[Depends(require_role(UserRole.SUPERVISOR))])
-def reject_tool_request(request_id: str, reason: str = "Not approved", db: OrmSession = Depends(get_db)):
-    req = db.execute(select(ToolUsageRequest).where(ToolUsageRequest.request_id == request_id)).scalar_one_or_none()
-    if not req:
-        raise HTTPException(status_code=404, detail="Request not found")
-    if req.status != RequestStatus.PENDING:
+async def reject_tool_request(request_id: str, reason: str = "Not approved", db: AsyncSession = Depends(get_async_db)):
+    # Conditional on PENDING so a reject can't overwrite an approval that already took the stock
+    rejected = (await db.execute(
+        update(ToolUsageRequest)
+        .where(ToolUsageRequest.request_id == request_id, ToolUsageRequest.status == RequestStatus.PENDING)
+        .values(status=RequestStatus.REJECTED, reviewed_at=datetime.now(timezone.utc), reviewer_remarks=reason)
+        .returning(ToolUsageRequest.id)
+        .execution_options(synchronize_session=False)
+    )).scalar_one_or_none()
+    if rejected is None:
+        if (await db.execute(select(ToolUsageRequest.id).where(ToolUsageRequest.request_id == request_id))).scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Request not found")
         raise HTTPException(status_code=400, detail="Request already processed")
-    from datetime import datetime, timezone
-    req.status = RequestStatus.REJECTED
-    req.reviewed_at = datetime.now(timezone.utc)
-    req.reviewer_remarks = reason
-    db.commit()
+    await db.commit()
     return {"message": "Rejected"}
 
+@router.post("/tool-requests/bulk-approve", response_model=BulkActionOut, dependencies=[Depends(require_role(UserRole.SUPERVISOR)), Depends(idempotent)])
+async def bulk_approve_tool_requests(payload: BulkActionIn, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
+    sess, user = data
+    ids = list(dict.fromkeys(payload.request_ids))
+    now = datetime.now(timezone.utc)
+    reqs = (await db.execute(
+        select(ToolUsageRequest.id, ToolUsageRequest.request_id, ToolUsageRequest.tool_id, ToolUsageRequest.requested_qty, ToolUsageRequest.status)
+        .where(ToolUsageRequest.request_id.in_(ids))
+        .order_by(ToolUsageRequest.requested_at, ToolUsageRequest.id)
+        .with_for_update()
+    )).all()
+    pending = [r for r in reqs if r.status == RequestStatus.PENDING]
+    stock = await lock_stock(db, {r.tool_id for r in pending})
+
+    results = {r.request_id: BulkResult.ALREADY_PROCESSED for r in reqs}
+    approved, taken = [], []
+    # Oldest requests get the stock first
+    for r in pending:
+        if stock.get(r.tool_id, 0) < r.requested_qty:
+            results[r.request_id] = BulkResult.INSUFFICIENT_STOCK
+            continue
+        stock[r.tool_id] -= r.requested_qty
+        taken.append((r.tool_id, r.requested_qty, r.request_id))
+        approved.append(r.id)
+        results[r.request_id] = BulkResult.APPROVED
+
+    if approved:
+        await db.execute(
+            update(ToolUsageRequest)
+            .where(ToolUsageRequest.id.in_(approved))
+            .values(status=RequestStatus.APPROVED, reviewed_at=now, approved_by=user.id, supervisor_id=user.id)
+            .execution_options(synchronize_session=False)
+        )
+        await take_stock_many(db, taken)
+    await db.commit()
+    return BulkActionOut(results=[BulkItemResult(request_id=rid, result=results.get(rid, BulkResult.NOT_FOUND)) for rid in ids])
+
+@router.post("/tool-requests/bulk-reject", response_model=BulkActionOut, dependencies=[Depends(require_role(UserRole.SUPERVISOR))])
+async def bulk_reject_tool_requests(payload: BulkRejectIn, db: AsyncSession = Depends(get_async_db)):
+    ids = list(dict.fromkeys(payload.request_ids))
+    rejected = set((await db.execute(
+        update(ToolUsageRequest)
+        .where(ToolUsageRequest.request_id.in_(ids), ToolUsageRequest.status == RequestStatus.PENDING)
+        .values(status=RequestStatus.REJECTED, reviewed_at=datetime.now(timezone.utc), reviewer_remarks=payload.reason)
+        .returning(ToolUsageRequest.request_id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all())
+    existing = set((await db.execute(
+        select(ToolUsageRequest.request_id).where(ToolUsageRequest.request_id.in_([rid for rid in ids if rid not in rejected]))
+    )).scalars().all())
+    await db.commit()
+    return BulkActionOut(results=[
+        BulkItemResult(
+            request_id=rid,
+            result=BulkResult.REJECTED if rid in rejected else BulkResult.ALREADY_PROCESSED if rid in existing else BulkResult.NOT_FOUND,
+        ) for rid in ids
+    ])
+
 @router.post("/tool-additions", response_model=ToolAdditionOut, dependencies=[Depends(require_role(UserRole.SUPERVISOR))])
-def create_tool_addition(payload: ToolAdditionCreateIn, data=Depends(get_current_session), db: OrmSession = Depends(get_db)):
+async def create_tool_addition(payload: ToolAdditionCreateIn, data=Depends(get_current_session), db: AsyncSession = Depends(get_async_db)):
     sess, supervisor = data
-    next_id = (db.execute(select(func.max(ToolAdditionRequest.id))).scalar() or 0) + 1
-    rid = make_request_id("TAR", next_id)
+    rid = make_request_id("TAR", await addition_request_ids.allocate(db))
     row = ToolAdditionRequest(
     request_id=rid,
     tool_name=payload.tool_name,
@@ -99,8 +167,8 @@ def create_tool_addition(payload: ToolAdditionCreateIn, data=Depends(get_current
     supervisor_id=supervisor.id,
     )
     db.add(row)
-    db.commit()
-    db.refresh(row)
+    await db.commit()
+    await db.refresh(row)
     return ToolAdditionOut(
     request_id=row.request_id,
     tool_name=row.tool_name,
@@ -112,23 +180,51 @@ def create_tool_addition(payload: ToolAdditionCreateIn, data=Depends(get_current
     requested_at=row.requested_at,
     )
 
-@router.get("/logs/approved-usage", dependencies=[Depends(require_role(UserRole.SUPERVISOR))])
-def approved_usage_logs(db: OrmSession = Depends(get_db)):
-    rows = db.execute(
-    select(ToolUsageRequest)
+@router.get("/logs/approved-usage", dependencies=[Depends(require_role(UserRole.SUPERVISOR)), Depends(query_budget(1))])
+async def approved_usage_logs(db: AsyncSession = Depends(get_read_db)):
+    operator = aliased(User)
+    approver = aliased(User)
+    result = await db.execute(
+    select(
+    ToolUsageRequest.request_id,
+    ToolInventory.name.label("tool"),
+    ToolUsageRequest.requested_qty.label("quantity"),
+    ToolUsageRequest.operator_id,
+    operator.username.label("operator_username"),
+    ToolUsageRequest.approved_by.label("supervisor_id"),
+    approver.full_name.label("supervisor_name"),
+    ToolUsageRequest.requested_at,
+    ToolUsageRequest.reviewed_at.label("approved_at"),
+    )
+    .outerjoin(ToolInventory, ToolInventory.id == ToolUsageRequest.tool_id)
+    .outerjoin(operator, operator.id == ToolUsageRequest.operator_id)
+    .outerjoin(approver, approver.id == ToolUsageRequest.approved_by)
     .where(ToolUsageRequest.status == RequestStatus.APPROVED)
     .order_by(ToolUsageRequest.reviewed_at.desc())
-    ).scalars().all()
-    return [
-    {
-    "request_id": r.request_id,
-    "tool": r.tool.name if r.tool else None,
-    "quantity": r.requested_qty,
-    "operator_id": r.operator_id,
-    "operator_username": r.operator.username if r.operator else None,
-    "supervisor_id": r.approved_by,
-    "supervisor_name": r.approver.full_name if r.approver else None,
-    "requested_at": r.requested_at,
-    "approved_at": r.reviewed_at,
-    } for r in rows
-    ]
+    )
+    return RowsResponse(row_dicts(result))
+
+# Upper bound on buckets per query keeps analytics cost independent of history
+MAX_ANALYTICS_BUCKETS = 1000
+
+@router.get("/analytics", dependencies=[Depends(require_role(UserRole.SUPERVISOR))])
+async def analytics(
+    grain: RollupGrain = RollupGrain.DAY,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    top: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    step = timedelta(days=1) if grain == RollupGrain.DAY else timedelta(hours=1)
+    # Bounds without an offset are UTC, so they compare with aware ones and the default
+    if start is not None and start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end is not None and end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    end = end or datetime.now(timezone.utc)
+    start = start or end - (timedelta(days=30) if grain == RollupGrain.DAY else timedelta(hours=48))
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if (end - start) / step > MAX_ANALYTICS_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range too large for {grain.value} buckets")
+    return await summary(db, start, end, grain, top)
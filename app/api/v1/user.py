@@ -3,18 +3,18 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import UserCreateIn, UserOut
-from passlib.context import CryptContext
+from app.services.password_hasher import hasher
+from app.services.revocation import persist_user_revocation, revoke_user
 from pydantic import BaseModel
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 @router.post("/create", response_model=UserOut)
 def create_user(user_in: UserCreateIn, db: Session = Depends(get_db)):
     existing_user = db.query(User).filter(User.username == user_in.username).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
-    hashed_password = pwd_context.hash(user_in.password)
+    hashed_password = hasher.hash_sync(user_in.password)
     user = User(
         username=user_in.username,
         full_name=user_in.full_name,
@@ -39,7 +39,9 @@ def delete_user(user_id: int, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     db.delete(user)
+    persist_user_revocation(db, user_id)
     db.commit()
+    revoke_user(user_id)
     return {"message": "User deleted successfully"}
 
 class PasswordResetIn(BaseModel):
@@ -52,8 +54,8 @@ def reset_password(data: PasswordResetIn, db: Session = Depends(get_db)):
     user = db.query(User).filter(User.username == data.username).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if not pwd_context.verify(data.old_password, user.hashed_password):
+    if not hasher.verify_sync(data.old_password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Old password is incorrect")
-    user.hashed_password = pwd_context.hash(data.new_password)
+    user.hashed_password = hasher.hash_sync(data.new_password)
     db.commit()
     return {"message": "Password updated successfully"}
@@ -10,12 +10,83 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str = "localhost"
     POSTGRES_PORT: int = 2424
     POSTGRES_DB: str = "toolcrib"
+    # Serve the routers through asyncpg instead of the threadpooled sync driver
+    DB_ASYNC: bool = False
+    # Connection pool, per engine. Pre-ping costs a round trip on every
+    # checkout; with it off, recycling retires connections before the server
+    # or a proxy drops them and a dropped one is only noticed on use.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # Read replica for read-only routes (catalog, logs, notifications,
+    # analytics); empty keeps every query on the primary
+    POSTGRES_REPLICA_HOST: str = ""
+    POSTGRES_REPLICA_PORT: int = 2424
 
     # Auth/Passwords
     DEFAULT_PASSWORD: str = "password"
     SECRET_KEY: str = "change-this-secret"
     PASSWORD_RESET_TOKEN_EXPIRE_MINUTES: int = 30
     SESSION_DURATION_MINUTES: int = 60
+    # "db" looks every session up in the sessions table, "signed" validates an
+    # HMAC-signed token in-process and only consults the revocation set
+    SESSION_MODE: str = "db"
+    SESSION_REVOCATION_REFRESH_SECONDS: int = 30
+    # Role locks: "lease" keeps them in role_locks, "memory" in process (tests).
+    # A positive lease length makes owners heartbeat instead of holding the
+    # role for their whole session.
+    ROLE_LOCK_BACKEND: str = "lease"
+    ROLE_LOCK_LEASE_SECONDS: int = 0
+    # Notification streaming: fan out through Postgres LISTEN/NOTIFY so
+    # subscribers on every worker receive them, not just the writer's
+    NOTIFICATIONS_PG_NOTIFY: bool = False
+    NOTIFICATION_STREAM_KEEPALIVE_SECONDS: int = 15
+    # Operator tool catalog cache; changes committed by other workers show up
+    # within this many seconds, changes from this worker immediately
+    TOOL_CATALOG_TTL_SECONDS: int = 30
+    # Inventory ledger job: snapshots tools that moved, then checks every
+    # tool's ledger balance against quantity_available; 0 disables it
+    INVENTORY_LEDGER_INTERVAL_SECONDS: int = 3600
+    INVENTORY_SNAPSHOT_BATCH_SIZE: int = 500
+    # Usage rollups for /supervisor/analytics. Source rows younger than the
+    # grace period are left for the next run so that transactions still in
+    # flight are not skipped past by the watermark.
+    ANALYTICS_ROLLUP_INTERVAL_SECONDS: int = 300
+    ANALYTICS_ROLLUP_BATCH_SIZE: int = 5000
+    ANALYTICS_ROLLUP_GRACE_SECONDS: int = 60
+    # Per-route request, SQL and pool-wait metrics served at /metrics
+    METRICS_ENABLED: bool = True
+    # A statement shape repeated this often within one request is reported as
+    # N+1 (0 disables it). Strict mode raises instead of logging, which is how
+    # the test suite holds routes to their query_budget.
+    SQL_N_PLUS_ONE_THRESHOLD: int = 10
+    SQL_AUDIT_STRICT: bool = False
+    # Background job ending expired sessions and their role locks; 0 disables it
+    SESSION_REAPER_INTERVAL_SECONDS: int = 60
+    SESSION_REAPER_BATCH_SIZE: int = 1000
+    # sessions is partitioned by login month. The job keeps partitions this
+    # many months ahead and moves ones past the retention out of the table,
+    # into gzipped CSV under SESSION_ARCHIVE_DIR (empty: detach only); 0 disables it
+    SESSION_PARTITION_INTERVAL_SECONDS: int = 21600
+    SESSION_PARTITIONS_AHEAD: int = 2
+    SESSION_RETENTION_MONTHS: int = 12
+    SESSION_ARCHIVE_DIR: str = "archive/sessions"
+    # Retried POSTs carrying the same Idempotency-Key get the stored response
+    # for this long; each worker also keeps the most recent ones in memory.
+    # Expired keys are purged by the session reaper.
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    # How long a first call holds its key. A retry after that takes the key
+    # over instead of getting 409, so a worker dying mid-request doesn't lock
+    # the key until it expires. Keep it above the slowest idempotent route.
+    IDEMPOTENCY_LEASE_SECONDS: int = 60
+    # bcrypt runs in a process pool; 0 workers means one per CPU. Hashes beyond
+    # PASSWORD_HASH_MAX_PENDING are refused with 503 instead of queueing.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 0
+    PASSWORD_HASH_MAX_PENDING: int = 64
 
     # Email
     EMAIL_FROM: str = "toolcribcmti@gmail.com"
@@ -24,14 +95,39 @@ class Settings(BaseSettings):
     SMTP_USER: str = "smtp-user"
     SMTP_PASSWORD: str = "smtp-pass"
     SMTP_TLS: bool = True
+    SMTP_TIMEOUT_SECONDS: int = 10
+    # Reopen the pooled connection rather than reuse one idle this long
+    SMTP_IDLE_SECONDS: int = 60
+    # Outbox dispatcher; 0 disables it. Failed sends back off exponentially
+    # from EMAIL_RETRY_BASE_SECONDS until EMAIL_MAX_ATTEMPTS is reached.
+    EMAIL_DISPATCH_INTERVAL_SECONDS: int = 5
+    EMAIL_DISPATCH_BATCH_SIZE: int = 50
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: int = 30
 
     # CORS
     CORS_ORIGINS: str = "http://localhost:3000"
 
     def db_url(self) -> str:
+        return self._url("psycopg2", self.POSTGRES_HOST, self.POSTGRES_PORT)
+
+    def async_db_url(self) -> str:
+        return self._url("asyncpg", self.POSTGRES_HOST, self.POSTGRES_PORT)
+
+    def replica_db_url(self) -> str | None:
+        if not self.POSTGRES_REPLICA_HOST:
+            return None
+        return self._url("psycopg2", self.POSTGRES_REPLICA_HOST, self.POSTGRES_REPLICA_PORT)
+
+    def async_replica_db_url(self) -> str | None:
+        if not self.POSTGRES_REPLICA_HOST:
+            return None
+        return self._url("asyncpg", self.POSTGRES_REPLICA_HOST, self.POSTGRES_REPLICA_PORT)
+
+    def _url(self, driver: str, host: str, port: int) -> str:
         return (
-            f"postgresql+psycopg2://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
-            f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+            f"postgresql+{driver}://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+            f"@{host}:{port}/{self.POSTGRES_DB}"
         )
 
     class Config:
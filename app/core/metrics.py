@@ -0,0 +1,135 @@
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, Prometheus "le" bounds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class RequestStats:
+    """SQL work done on behalf of the current request.
+
+    The engine hooks fill it from whichever thread runs the query; a request
+    only ever runs one query at a time, so there is a single writer.
+    """
+    __slots__ = ("statements", "db_seconds", "pool_wait_seconds", "budget", "shapes", "repeated")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        # Filled by app.core.sql_audit: declared statement budget, statement
+        # shape counts and the first shape repeated often enough to be N+1
+        self.budget = None
+        self.shapes: dict[str, int] = {}
+        self.repeated = None
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+class RouteMetrics:
+    __slots__ = (
+        "buckets", "count", "seconds", "statements", "db_seconds", "pool_wait_seconds",
+        "over_budget", "n_plus_one", "statuses",
+    )
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.pool_wait_seconds = 0.0
+        self.over_budget = 0
+        self.n_plus_one = 0
+        self.statuses: dict[int, int] = {}
+
+# Only the event loop thread writes here (see MetricsMiddleware), so plain
+# counters are enough; no locks on the request path.
+routes: dict[tuple[str, str], RouteMetrics] = {}
+
+def observe(method: str, route: str, status: int, seconds: float, stats: RequestStats):
+    m = routes.get((method, route))
+    if m is None:
+        m = routes[(method, route)] = RouteMetrics()
+    m.buckets[bisect_left(BUCKETS, seconds)] += 1
+    m.count += 1
+    m.seconds += seconds
+    m.statements += stats.statements
+    m.db_seconds += stats.db_seconds
+    m.pool_wait_seconds += stats.pool_wait_seconds
+    m.statuses[status] = m.statuses.get(status, 0) + 1
+    if stats.budget is not None and stats.statements > stats.budget:
+        m.over_budget += 1
+        logger.warning("%s %s ran %d SQL statements, budget is %d", method, route, stats.statements, stats.budget)
+    if stats.repeated is not None:
+        m.n_plus_one += 1
+        logger.warning("%s %s looks like N+1, ran %d times: %s", method, route, stats.shapes[stats.repeated], stats.repeated[:200])
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+class MetricsMiddleware:
+    """Times every HTTP request and folds its SQL stats into the per-route metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            observe(scope["method"], _route_template(scope), status, time.perf_counter() - started, stats)
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{k}="{str(v)}"' for k, v in labels.items()) + "}"
+
+def render(extra_gauges: dict[str, dict[str, float]] | None = None) -> str:
+    lines = [
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    snapshot = list(routes.items())
+    for (method, route), m in snapshot:
+        cumulative = 0
+        for bound, n in zip(BUCKETS, m.buckets):
+            cumulative += n
+            lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+        lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le='+Inf')} {m.count}")
+        lines.append(f"http_request_duration_seconds_sum{_labels(method=method, route=route)} {m.seconds}")
+        lines.append(f"http_request_duration_seconds_count{_labels(method=method, route=route)} {m.count}")
+    lines.append("# TYPE http_requests_total counter")
+    for (method, route), m in snapshot:
+        for status, n in list(m.statuses.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {n}")
+    for name, attr, kind in (
+        ("db_statements_total", "statements", "counter"),
+        ("db_time_seconds_total", "db_seconds", "counter"),
+        ("db_pool_wait_seconds_total", "pool_wait_seconds", "counter"),
+        ("db_query_budget_exceeded_total", "over_budget", "counter"),
+        ("db_n_plus_one_total", "n_plus_one", "counter"),
+    ):
+        lines.append(f"# TYPE {name} {kind}")
+        for (method, route), m in snapshot:
+            lines.append(f"{name}{_labels(method=method, route=route)} {getattr(m, attr)}")
+    for name, values in (extra_gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        for label, value in values.items():
+            lines.append(f"{name}{label} {value}")
+    return "\n".join(lines) + "\n"
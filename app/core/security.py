@@ -1,9 +1,44 @@
+import base64
+import hashlib
+import hmac
+import json
 from passlib.context import CryptContext
+from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
+def hash_passwords(passwords: list[str]) -> list[str]:
+    return [pwd_context.hash(p) for p in passwords]
+
 def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
+
+def verify_and_update_password(plain: str, hashed: str) -> tuple[bool, str | None]:
+    return pwd_context.verify_and_update(plain, hashed)
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(settings.SECRET_KEY.encode(), body.encode(), hashlib.sha256).digest())
+
+def create_session_token(claims: dict) -> str:
+    body = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{body}.{_sign(body)}"
+
+def decode_session_token(token: str) -> dict | None:
+    # Returns the claims of a correctly signed token; expiry is left to the caller
+    try:
+        body, sig = token.split(".")
+        # As bytes: compare_digest refuses str with non-ASCII characters
+        if not hmac.compare_digest(sig.encode(), _sign(body).encode()):
+            return None
+        return json.loads(_b64decode(body))
+    except ValueError:
+        return None
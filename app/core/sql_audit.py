@@ -0,0 +1,46 @@
+import re
+from functools import lru_cache
+from app.core.config import settings
+from app.core.metrics import RequestStats, current_request
+
+class QueryAuditError(Exception):
+    """Raised in SQL_AUDIT_STRICT mode when a request breaks its query budget or runs N+1 queries."""
+
+_PARAM = r"(?:%\(\w+\)s|%s|:\w+|\$\d+|\?)"
+_IN_LIST = re.compile(rf"\bIN\s*\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """The shape of a statement: literals and expanded IN lists folded away."""
+    shape = _IN_LIST.sub("IN (?)", statement)
+    shape = _STRING.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+def check(stats: RequestStats, statement: str):
+    """Called by the engine before each statement of a request."""
+    shape = fingerprint(statement)
+    seen = stats.shapes.get(shape, 0) + 1
+    stats.shapes[shape] = seen
+    threshold = settings.SQL_N_PLUS_ONE_THRESHOLD
+    if threshold > 0 and seen >= threshold and stats.repeated is None:
+        stats.repeated = shape
+        if settings.SQL_AUDIT_STRICT:
+            raise QueryAuditError(f"N+1 query, {seen} times: {shape[:200]}")
+    if settings.SQL_AUDIT_STRICT and stats.budget is not None and stats.statements >= stats.budget:
+        raise QueryAuditError(f"query budget of {stats.budget} exceeded: {shape[:200]}")
+
+def query_budget(statements: int):
+    """Route dependency declaring how many statements the route runs on top of authentication.
+
+    List it after require_role so whatever authentication ran (session
+    lookup, user, a due role lease heartbeat) is already counted.
+    """
+    async def dependency():
+        stats = current_request.get()
+        if stats is not None:
+            stats.budget = stats.statements + statements
+    return dependency
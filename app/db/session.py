@@ -1,8 +1,95 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import time
+from sqlalchemy import Select, TextClause, create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.sql.dml import UpdateBase
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.metrics import current_request
+from app.core.sql_audit import check
 
-engine = create_engine(settings.db_url(), pool_pre_ping=True, future=True)
+class _TimedCheckout:
+    """Charges the time spent waiting for a pooled connection to the current request."""
+
+    def _do_get(self):
+        stats = current_request.get()
+        if stats is None:
+            return super()._do_get()
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            stats.pool_wait_seconds += time.perf_counter() - started
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is not None:
+        check(stats, statement)
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.statements += 1
+    stats.db_seconds += time.perf_counter() - started.pop()
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_started"):
+        conn.info["query_started"].pop()
+
+def instrument(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+def pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def _create_engine(url: str):
+    created = create_engine(url, future=True, poolclass=TimedQueuePool, **pool_options())
+    instrument(created)
+    return created
+
+engine = _create_engine(settings.db_url())
+replica_engine = _create_engine(settings.replica_db_url()) if settings.replica_db_url() else None
+
+class RoutingSession(Session):
+    """Sends reads to the replica and writes to the primary.
+
+    Once the session has written anything, every later statement goes to the
+    primary as well so that it reads its own writes despite replica lag.
+    Locking reads and raw SQL always go to the primary.
+    """
+
+    def __init__(self, primary, replica, **kwargs):
+        super().__init__(**kwargs)
+        self.primary = primary
+        self.replica = replica
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.info.get("wrote"):
+            return self.primary
+        if self._flushing or isinstance(clause, (UpdateBase, TextClause)) or (
+            isinstance(clause, Select) and clause._for_update_arg is not None
+        ):
+            self.info["wrote"] = True
+            return self.primary
+        return self.replica
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 def get_db():
@@ -10,4 +97,120 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Async stack. With DB_ASYNC the routers talk to Postgres through asyncpg;
+# otherwise they get the sync session wrapped so that every database call runs
+# in the threadpool, which keeps the two modes comparable behind one code path.
+async_engine = None
+async_replica_engine = None
+AsyncSessionLocal = None
+AsyncReadSessionLocal = None
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    def _create_async_engine(url: str):
+        created = create_async_engine(url, poolclass=TimedAsyncQueuePool, **pool_options())
+        instrument(created.sync_engine)
+        return created
+
+    async_engine = _create_async_engine(settings.async_db_url())
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if settings.async_replica_db_url():
+        async_replica_engine = _create_async_engine(settings.async_replica_db_url())
+        AsyncReadSessionLocal = async_sessionmaker(
+            sync_session_class=RoutingSession,
+            primary=async_engine.sync_engine,
+            replica=async_replica_engine.sync_engine,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+
+# Attributes must stay loaded after commit: lazy refreshes would block the event loop
+ThreadedSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True, expire_on_commit=False)
+ThreadedReadSessionLocal = None
+if replica_engine is not None:
+    ThreadedReadSessionLocal = sessionmaker(
+        class_=RoutingSession,
+        primary=engine,
+        replica=replica_engine,
+        autoflush=False,
+        future=True,
+        expire_on_commit=False,
+    )
+
+class ThreadedSession:
+    """The subset of AsyncSession used by the routers, backed by a sync Session."""
+
+    def __init__(self, sync_session):
+        self.sync_session = sync_session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalar, *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.scalars, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def refresh(self, *args, **kwargs):
+        await run_in_threadpool(self.sync_session.refresh, *args, **kwargs)
+
+    async def delete(self, instance):
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+def open_async_session():
+    if AsyncSessionLocal is not None:
+        return AsyncSessionLocal()
+    return ThreadedSession(ThreadedSessionLocal())
+
+async def get_async_db():
+    db = open_async_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+def open_read_session():
+    """A session for read-only work, routed to the replica when one is configured."""
+    if AsyncReadSessionLocal is not None:
+        return AsyncReadSessionLocal()
+    if AsyncSessionLocal is None and ThreadedReadSessionLocal is not None:
+        return ThreadedSession(ThreadedReadSessionLocal())
+    return open_async_session()
+
+async def _get_read_db():
+    db = open_read_session()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+# Without a replica read routes share the request's primary session
+# (FastAPI caches a dependency per request) instead of opening a second one
+get_read_db = _get_read_db if settings.POSTGRES_REPLICA_HOST else get_async_db
@@ -1,11 +1,18 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.api.router import api_router
+from app.core import metrics
 from app.db.session import engine
-from app.db.base import Base
-# Ensure tables exist if running without Alembic (dev convenience)
-Base.metadata.create_all(bind=engine)
+from app.api.router import api_router
+from app.services.password_hasher import hasher, HasherBusy
+from app.services.reaper import reaper
+from app.services.notification_broker import listener
+from app.services.email_dispatcher import dispatcher
+from app.services.ledger import ledger_job
+from app.services.analytics import rollup_job
+from app.services.session_partitions import partition_job
+from app.services.idempotency import IdempotencyMiddleware, IdempotentReplay, store as idempotency_store
 
 app = FastAPI(title=settings.APP_NAME)
 
@@ -17,8 +24,73 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+app.add_middleware(IdempotencyMiddleware)
+
+if settings.METRICS_ENABLED:
+    # Outermost, so the timing covers CORS and everything below it
+    app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(api_router, prefix="/api")
 
+@app.exception_handler(HasherBusy)
+async def hasher_busy(request: Request, exc: HasherBusy):
+    # Shed load fast rather than letting logins queue behind bcrypt
+    return JSONResponse(status_code=503, content={"detail": "Server busy, please retry"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(IdempotentReplay)
+async def idempotent_replay(request: Request, exc: IdempotentReplay):
+    stored = exc.stored
+    return Response(content=stored.body, status_code=stored.status_code, media_type=stored.content_type, headers={"Idempotent-Replayed": "true"})
+
+@app.on_event("startup")
+async def start_background_jobs():
+    reaper.start()
+    dispatcher.start()
+    ledger_job.start()
+    rollup_job.start()
+    partition_job.start()
+    if settings.NOTIFICATIONS_PG_NOTIFY:
+        listener.start()
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await reaper.stop()
+    await dispatcher.stop()
+    await ledger_job.stop()
+    await rollup_job.stop()
+    await partition_job.stop()
+    listener.stop()
+    hasher.shutdown()
+
+def _job_gauges() -> dict[str, dict[str, float]]:
+    values = {}
+    for job, stats in (
+        ("password_hasher", hasher.stats()),
+        ("session_reaper", reaper.stats()),
+        ("email_dispatcher", dispatcher.stats()),
+        ("inventory_ledger", ledger_job.stats()),
+        ("usage_rollup", rollup_job.stats()),
+        ("session_partitions", partition_job.stats()),
+        ("idempotency", idempotency_store.stats()),
+    ):
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)):
+                values[f'{{job="{job}",stat="{stat}"}}'] = value
+    pool = engine.pool
+    return {
+        "background_job_stat": values,
+        "db_pool_connections": {
+            '{state="checked_out"}': pool.checkedout(),
+            '{state="idle"}': pool.checkedin(),
+            '{state="overflow"}': pool.overflow(),
+        },
+    }
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.render(_job_gauges()), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     return {"status": "Router test passed"}
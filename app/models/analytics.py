@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Enum, ForeignKey, Index
+from app.db.base import Base
+from app.models.enums import RollupGrain
+
+class ToolUsageRollup(Base):
+	"""Per-tool usage counters for one hour or day, maintained by app.services.analytics."""
+	__tablename__ = "tool_usage_rollups"
+	__table_args__ = (
+		Index("ix_tool_usage_rollups_grain_bucket", "grain", "bucket_start"),
+	)
+	grain = Column(Enum(RollupGrain), primary_key=True)
+	bucket_start = Column(DateTime(timezone=True), primary_key=True)
+	tool_id = Column(Integer, ForeignKey("tool_inventory.id"), primary_key=True)
+	location = Column(String(100), nullable=True)
+	requested = Column(Integer, nullable=False, default=0)
+	approved = Column(Integer, nullable=False, default=0)
+	approved_qty = Column(Integer, nullable=False, default=0)
+	returned = Column(Integer, nullable=False, default=0)
+	# Sum over returns of the time since the matching approval, for averages
+	turnaround_seconds = Column(BigInteger, nullable=False, default=0)
+
+class RollupWatermark(Base):
+	"""Highest source row id already folded into the rollups."""
+	__tablename__ = "rollup_watermarks"
+	source = Column(String(50), primary_key=True)
+	last_id = Column(BigInteger, nullable=False, default=0)
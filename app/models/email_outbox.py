@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+from app.models.enums import EmailStatus
+
+class EmailOutbox(Base):
+	"""Emails written in the same transaction as the change that triggers them."""
+	__tablename__ = "email_outbox"
+	__table_args__ = (
+		Index("ix_email_outbox_due", "next_attempt_at", postgresql_where="status = 'PENDING'"),
+	)
+	id = Column(Integer, primary_key=True, index=True)
+	to_email = Column(String(255), nullable=False)
+	subject = Column(String(255), nullable=False)
+	body = Column(Text, nullable=False)
+	status = Column(Enum(EmailStatus), nullable=False, default=EmailStatus.PENDING)
+	attempts = Column(Integer, nullable=False, default=0)
+	last_error = Column(String(500), nullable=True)
+	next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+	created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+	sent_at = Column(DateTime(timezone=True), nullable=True)
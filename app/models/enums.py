@@ -1,7 +1,4 @@
-import enum     
-
-
-print("enums.py loaded ✅")
+import enum
 
 
 class UserRole(str, enum.Enum):
@@ -9,9 +6,6 @@ class UserRole(str, enum.Enum):
     SUPERVISOR = "SUPERVISOR"
     OPERATOR = "OPERATOR"
 
-print("UserRole in scope?", 'UserRole' in globals())
-print("Available globals:", list(globals().keys()))
-
 class RequestStatus(str, enum.Enum):
     PENDING = "PENDING"
     APPROVED = "APPROVED"
@@ -22,4 +16,26 @@ class RequestStatus(str, enum.Enum):
 
 class SessionEndReason(str, enum.Enum):
     LOGOUT = "LOGOUT"
-    EXPIRED = "EXPIRED"
\ No newline at end of file
+    EXPIRED = "EXPIRED"
+
+class BulkResult(str, enum.Enum):
+    APPROVED = "APPROVED"
+    REJECTED = "REJECTED"
+    INSUFFICIENT_STOCK = "INSUFFICIENT_STOCK"
+    ALREADY_PROCESSED = "ALREADY_PROCESSED"
+    NOT_FOUND = "NOT_FOUND"
+
+class EmailStatus(str, enum.Enum):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
+class MovementKind(str, enum.Enum):
+    OPENING = "OPENING"
+    ISSUE = "ISSUE"
+    RETURN = "RETURN"
+    RECEIPT = "RECEIPT"
+
+class RollupGrain(str, enum.Enum):
+    HOUR = "HOUR"
+    DAY = "DAY"
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, LargeBinary, DateTime, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class IdempotencyKey(Base):
+	"""Response of a mutating call, replayed when the client retries with the same Idempotency-Key."""
+	__tablename__ = "idempotency_keys"
+	__table_args__ = (
+		Index("ix_idempotency_keys_expires_at", "expires_at"),
+	)
+	# Keys are scoped to the calling user
+	owner = Column(String(64), primary_key=True)
+	key = Column(String(255), primary_key=True)
+	# Hash of method, path and body; a reused key with another request is refused
+	fingerprint = Column(String(64), nullable=False)
+	# Unset while the first call is still running
+	status_code = Column(Integer, nullable=True)
+	content_type = Column(String(100), nullable=True)
+	body = Column(LargeBinary, nullable=True)
+	# While the first call runs; a pending key past it can be taken over
+	locked_until = Column(DateTime(timezone=True), nullable=True)
+	created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+	expires_at = Column(DateTime(timezone=True), nullable=False)
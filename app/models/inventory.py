@@ -1,10 +1,56 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Enum, ForeignKey, Sequence, Computed, Index
 from sqlalchemy.sql import func
 from app.db.base import Base
+from app.models.enums import MovementKind
+
+# Tool codes (T00001...), handed out in blocks by app.services.id_generator
+tool_code_seq = Sequence("tool_code_seq", increment=50, metadata=Base.metadata)
 
 class ToolInventory(Base):
 	__tablename__ = "tool_inventory"
+	__table_args__ = (
+		Index("ix_tool_inventory_search_text_trgm", "search_text", postgresql_using="gin", postgresql_ops={"search_text": "gin_trgm_ops"}),
+	)
 	id = Column(Integer, primary_key=True, index=True)
-	tool_name = Column(String(100), nullable=False)
-	quantity = Column(Integer, nullable=False, default=0)
+	tool_code = Column(String(20), nullable=False, unique=True, index=True)
+	name = Column(String(100), nullable=False, index=True)
+	make = Column(String(100), nullable=True)
+	range_mm = Column(String(50), nullable=True)
+	location = Column(String(100), nullable=True)
+	quantity_total = Column(Integer, nullable=False, default=0)
+	quantity_available = Column(Integer, nullable=False, default=0)
+	status = Column(String(20), nullable=False, default="ACTIVE")
+	# What /operator/tools/search matches against, kept up to date by the database
+	search_text = Column(String(400), Computed(
+		"lower(name || ' ' || coalesce(make, '') || ' ' || coalesce(range_mm, '') || ' ' || coalesce(location, ''))",
+		persisted=True,
+	))
 	added_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class InventoryMovement(Base):
+	"""Append-only record of every change to a tool's available quantity."""
+	__tablename__ = "inventory_movements"
+	__table_args__ = (
+		Index("ix_inventory_movements_tool_id_id", "tool_id", "id"),
+		Index("ix_inventory_movements_tool_id_created_at_id", "tool_id", "created_at", "id"),
+	)
+	id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+	tool_id = Column(Integer, ForeignKey("tool_inventory.id"), nullable=False)
+	delta = Column(Integer, nullable=False)
+	kind = Column(Enum(MovementKind), nullable=False)
+	# Request code (TR.../TAR...) that caused the movement
+	ref = Column(String(50), nullable=True, index=True)
+	created_at = Column(DateTime(timezone=True), nullable=False)
+
+class InventorySnapshot(Base):
+	"""A tool's ledger balance up to and including last_movement_id."""
+	__tablename__ = "inventory_snapshots"
+	__table_args__ = (
+		Index("ix_inventory_snapshots_tool_id_taken_at", "tool_id", "taken_at"),
+		Index("ix_inventory_snapshots_tool_id_last_movement_id", "tool_id", "last_movement_id"),
+	)
+	id = Column(Integer, primary_key=True)
+	tool_id = Column(Integer, ForeignKey("tool_inventory.id"), nullable=False)
+	last_movement_id = Column(BigInteger, nullable=False)
+	quantity_available = Column(Integer, nullable=False)
+	taken_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,10 +1,25 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from app.db.base import Base
 
 class Notification(Base):
 	__tablename__ = "notifications"
+	__table_args__ = (
+		# Role-wide notifications are fanned out to one row per user, so every read is by user
+		Index("ix_notifications_user_id_id", "user_id", "id"),
+	)
 	id = Column(Integer, primary_key=True, index=True)
 	user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-	message = Column(String(255), nullable=False)
+	# Role the notification was fanned out to, if any
+	role = Column(String(50), nullable=True)
+	title = Column(String(255), nullable=False)
+	description = Column(String(1000), nullable=True)
+	target_url = Column(String(255), nullable=True)
+	is_read = Column(Boolean, nullable=False, default=False, server_default="false")
 	created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+class NotificationCounter(Base):
+	"""Unread notifications per user, kept in step with inserts and mark-read."""
+	__tablename__ = "notification_counters"
+	user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+	unread = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer, DateTime
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+class UserRevocation(Base):
+	"""Deleted users, so every worker rejects their signed tokens until those expire."""
+	__tablename__ = "user_revocations"
+	# No foreign key: the user row is gone
+	user_id = Column(Integer, primary_key=True)
+	revoked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
@@ -6,6 +6,7 @@ from app.models.enums import UserRole
 class RoleLock(Base):
 	__tablename__ = "role_locks"
 	id = Column(Integer, primary_key=True, index=True)
-	role = Column(Enum(UserRole), nullable=False, index=True)
+	role = Column(Enum(UserRole), nullable=False, unique=True, index=True)
 	session_id = Column(String(64), nullable=False, index=True)
 	locked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+	expires_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
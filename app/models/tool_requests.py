@@ -1,21 +1,46 @@
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Sequence
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
 from app.models.enums import RequestStatus
 
+# Request codes (TR.../TAR...), handed out in blocks by app.services.id_generator
+tool_usage_request_code_seq = Sequence("tool_usage_request_code_seq", increment=50, metadata=Base.metadata)
+tool_addition_request_code_seq = Sequence("tool_addition_request_code_seq", increment=50, metadata=Base.metadata)
+
 class ToolAdditionRequest(Base):
 	__tablename__ = "tool_addition_requests"
 	id = Column(Integer, primary_key=True, index=True)
+	request_id = Column(String(20), nullable=False, unique=True, index=True)
 	tool_name = Column(String(100), nullable=False)
+	make = Column(String(100), nullable=True)
+	range_mm = Column(String(50), nullable=True)
+	location = Column(String(100), nullable=True)
+	quantity = Column(Integer, nullable=False)
 	status = Column(Enum(RequestStatus), nullable=False, default=RequestStatus.PENDING)
-	requested_by = Column(Integer, ForeignKey("users.id"), nullable=False)
-	created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+	supervisor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+	officer_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+	requested_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+	reviewed_at = Column(DateTime(timezone=True), nullable=True)
+	reviewer_remarks = Column(String(255), nullable=True)
 
 
 class ToolUsageRequest(Base):
 	__tablename__ = "tool_usage_requests"
 	id = Column(Integer, primary_key=True, index=True)
+	request_id = Column(String(20), nullable=False, unique=True, index=True)
 	tool_id = Column(Integer, ForeignKey("tool_inventory.id"), nullable=False)
-	user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+	operator_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+	requested_qty = Column(Integer, nullable=False, default=1)
 	status = Column(Enum(RequestStatus), nullable=False, default=RequestStatus.PENDING)
 	requested_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+	reviewed_at = Column(DateTime(timezone=True), nullable=True)
+	supervisor_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+	approved_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+	reviewer_remarks = Column(String(255), nullable=True)
+	received_at = Column(DateTime(timezone=True), nullable=True)
+	returned_at = Column(DateTime(timezone=True), nullable=True)
+
+	operator = relationship("User", foreign_keys=[operator_id])
+	tool = relationship("ToolInventory")
+	approver = relationship("User", foreign_keys=[approved_by])
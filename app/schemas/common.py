@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
@@ -10,3 +10,20 @@ class SessionCheckOut(BaseModel):
 
 class MessageOut(BaseModel):
 	message: str
+
+class BulkActionIn(BaseModel):
+	request_ids: list[str] = Field(min_length=1, max_length=500)
+
+class BulkRejectIn(BulkActionIn):
+	reason: str = "Not approved"
+
+class BulkItemResult(BaseModel):
+	request_id: str
+	result: str
+
+class BulkActionOut(BaseModel):
+	results: list[BulkItemResult]
+
+class ReviewerOut(BaseModel):
+	id: int
+	name: str
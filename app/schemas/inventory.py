@@ -1,29 +1,49 @@
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from app.schemas.common import ReviewerOut
 
 class ToolListItem(BaseModel):
-	id: int
-	tool_name: str
-	quantity: int
+	tool_id: int
+	name: str
+	make: Optional[str] = None
+	range_mm: Optional[str] = None
+	location: Optional[str] = None
+	quantity_available: int
+
+class ToolSearchItem(ToolListItem):
+	score: float
+
+class ToolSearchOut(BaseModel):
+	items: list[ToolSearchItem]
+	next_offset: Optional[int] = None
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 
 class ToolAdditionCreateIn(BaseModel):
 	tool_name: str
+	make: Optional[str] = None
+	range_mm: Optional[str] = None
+	location: Optional[str] = None
 	quantity: int
 
 class ToolAdditionOut(BaseModel):
-	id: int
+	request_id: str
 	tool_name: str
+	make: Optional[str] = None
+	range_mm: Optional[str] = None
+	quantity: int
+	location: Optional[str] = None
 	status: str
-	requested_by: int
-	created_at: datetime
+	requested_at: datetime
 
 class ApproveToolAdditionOut(BaseModel):
-	id: int
-	tool_name: str
+	request_id: str
 	status: str
-	approved_by: Optional[int] = None
+	tool_name: str
+	make: Optional[str] = None
+	range_mm: Optional[str] = None
+	quantity: int
 	approved_at: Optional[datetime] = None
+	officer: Optional[ReviewerOut] = None
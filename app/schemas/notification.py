@@ -1,8 +1,17 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 
 class NotificationOut(BaseModel):
 	id: int
 	user_id: int
-	message: str
+	title: str
+	description: str | None = None
+	target_url: str | None = None
+	is_read: bool
 	created_at: datetime
+
+class NotificationIdsIn(BaseModel):
+	ids: list[int] = Field(min_length=1, max_length=500)
+
+class UnreadCountOut(BaseModel):
+	unread: int
@@ -1,21 +1,26 @@
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
+from app.schemas.common import ReviewerOut
 
 class ToolUsageShortOut(BaseModel):
-	id: int
+	request_id: str
 	tool_id: int
-	user_id: int
+	tool_name: str
+	requested_qty: int
 	status: str
+	requested_at: datetime
 
 class ToolUsageCreateIn(BaseModel):
 	tool_id: int
-	user_id: int
+	requested_qty: int = 1
 
 class ApproveToolUsageOut(BaseModel):
-	id: int
-	tool_id: int
-	user_id: int
+	request_id: str
 	status: str
-	approved_by: Optional[int] = None
+	tool_id: int
+	tool_name: str
+	requested_qty: int
+	remaining_qty: int
 	approved_at: Optional[datetime] = None
+	approved_by: Optional[ReviewerOut] = None
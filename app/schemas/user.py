@@ -18,3 +18,15 @@ class UserOut(BaseModel):
 	role: str
 	is_active: bool
 	# Add any other fields from your User model if needed
+
+class UserImportRowOut(BaseModel):
+	row: int
+	username: Optional[str] = None
+	status: str
+	detail: Optional[str] = None
+	id: Optional[int] = None
+
+class UserImportOut(BaseModel):
+	created: int
+	failed: int
+	rows: list[UserImportRowOut]
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from app.core.config import settings
+from app.db.session import open_async_session
+from app.models.analytics import RollupWatermark, ToolUsageRollup
+from app.models.enums import MovementKind, RollupGrain
+from app.models.inventory import InventoryMovement, ToolInventory
+from app.models.tool_requests import ToolUsageRequest
+
+logger = logging.getLogger(__name__)
+
+# Rollups are folded in from two append-only sources, each behind its own id
+# watermark: new tool_usage_requests (requested) and the inventory ledger
+# (ISSUE = approved, RETURN = returned). Serving analytics then costs one
+# row per tool per bucket in the asked range, however much history exists.
+
+COUNTERS = ("requested", "approved", "approved_qty", "returned", "turnaround_seconds")
+
+def bucket(ts: datetime, grain: RollupGrain) -> datetime:
+    ts = ts.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0) if grain == RollupGrain.DAY else ts
+
+class _Buckets:
+    def __init__(self):
+        self.rows: dict[tuple, dict] = {}
+
+    def add(self, ts: datetime, tool_id: int, location: str | None, **counts):
+        for grain in RollupGrain:
+            key = (grain, bucket(ts, grain), tool_id)
+            row = self.rows.setdefault(key, {"location": location, **{c: 0 for c in COUNTERS}})
+            for name, n in counts.items():
+                row[name] += n
+
+async def _watermarks(db: AsyncSession, sources) -> dict[str, int]:
+    await db.execute(insert(RollupWatermark).values([{"source": s, "last_id": 0} for s in sources]).on_conflict_do_nothing())
+    # Locking the watermarks makes concurrent runs on other workers wait instead of double counting
+    rows = (await db.execute(
+        select(RollupWatermark)
+        .where(RollupWatermark.source.in_(sources))
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )).scalars().all()
+    return {r.source: r for r in rows}
+
+async def fold_batch(db: AsyncSession, batch_size: int, grace_seconds: int) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+    marks = await _watermarks(db, ["tool_usage_requests", "inventory_movements"])
+    buckets = _Buckets()
+
+    requests = (await db.execute(
+        select(ToolUsageRequest.id, ToolUsageRequest.tool_id, ToolUsageRequest.requested_at, ToolInventory.location)
+        .join(ToolInventory, ToolInventory.id == ToolUsageRequest.tool_id)
+        .where(ToolUsageRequest.id > marks["tool_usage_requests"].last_id, ToolUsageRequest.requested_at <= cutoff)
+        .order_by(ToolUsageRequest.id)
+        .limit(batch_size)
+    )).all()
+    for r in requests:
+        buckets.add(r.requested_at, r.tool_id, r.location, requested=1)
+
+    issue = aliased(InventoryMovement)
+    approved_at = (
+        select(func.min(issue.created_at))
+        .where(issue.ref == InventoryMovement.ref, issue.tool_id == InventoryMovement.tool_id, issue.kind == MovementKind.ISSUE)
+        .scalar_subquery()
+    )
+    movements = (await db.execute(
+        select(InventoryMovement.id, InventoryMovement.tool_id, InventoryMovement.kind, InventoryMovement.delta,
+               InventoryMovement.created_at, ToolInventory.location, approved_at.label("approved_at"))
+        .join(ToolInventory, ToolInventory.id == InventoryMovement.tool_id)
+        .where(InventoryMovement.id > marks["inventory_movements"].last_id, InventoryMovement.created_at <= cutoff)
+        .order_by(InventoryMovement.id)
+        .limit(batch_size)
+    )).all()
+    for m in movements:
+        if m.kind == MovementKind.ISSUE:
+            buckets.add(m.created_at, m.tool_id, m.location, approved=1, approved_qty=-m.delta)
+        elif m.kind == MovementKind.RETURN:
+            turnaround = int((m.created_at - m.approved_at).total_seconds()) if m.approved_at else 0
+            buckets.add(m.created_at, m.tool_id, m.location, returned=1, turnaround_seconds=turnaround)
+
+    if buckets.rows:
+        stmt = insert(ToolUsageRollup).values([
+            {"grain": grain, "bucket_start": start, "tool_id": tool_id, **row}
+            for (grain, start, tool_id), row in sorted(buckets.rows.items())
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[ToolUsageRollup.grain, ToolUsageRollup.bucket_start, ToolUsageRollup.tool_id],
+            set_={c: getattr(ToolUsageRollup, c) + getattr(stmt.excluded, c) for c in COUNTERS},
+        ))
+    if requests:
+        marks["tool_usage_requests"].last_id = requests[-1].id
+    if movements:
+        marks["inventory_movements"].last_id = movements[-1].id
+    await db.commit()
+    return max(len(requests), len(movements))
+
+async def summary(db: AsyncSession, start: datetime, end: datetime, grain: RollupGrain, top: int) -> dict:
+    in_range = (
+        ToolUsageRollup.grain == grain,
+        ToolUsageRollup.bucket_start >= bucket(start, grain),
+        ToolUsageRollup.bucket_start < end,
+    )
+    sums = [func.coalesce(func.sum(getattr(ToolUsageRollup, c)), 0).label(c) for c in COUNTERS]
+
+    def _figures(r) -> dict:
+        return {
+            "requested": r.requested,
+            "approved": r.approved,
+            "approved_qty": r.approved_qty,
+            "returned": r.returned,
+            "avg_turnaround_seconds": round(r.turnaround_seconds / r.returned, 1) if r.returned else None,
+        }
+
+    totals = (await db.execute(select(*sums).where(*in_range))).one()
+    top_tools = (await db.execute(
+        select(ToolUsageRollup.tool_id, ToolInventory.name, *sums)
+        .join(ToolInventory, ToolInventory.id == ToolUsageRollup.tool_id)
+        .where(*in_range)
+        .group_by(ToolUsageRollup.tool_id, ToolInventory.name)
+        .order_by(func.sum(ToolUsageRollup.requested).desc(), ToolUsageRollup.tool_id)
+        .limit(top)
+    )).all()
+    by_location = (await db.execute(
+        select(ToolUsageRollup.location, *sums)
+        .where(*in_range)
+        .group_by(ToolUsageRollup.location)
+        .order_by(func.sum(ToolUsageRollup.approved_qty).desc())
+    )).all()
+    series = (await db.execute(
+        select(ToolUsageRollup.bucket_start, *sums)
+        .where(*in_range)
+        .group_by(ToolUsageRollup.bucket_start)
+        .order_by(ToolUsageRollup.bucket_start)
+    )).all()
+    return {
+        "grain": grain.value,
+        "start": start,
+        "end": end,
+        "totals": _figures(totals),
+        "top_tools": [{"tool_id": r.tool_id, "name": r.name, **_figures(r)} for r in top_tools],
+        "by_location": [{"location": r.location, **_figures(r)} for r in by_location],
+        "series": [{"bucket_start": r.bucket_start, **_figures(r)} for r in series],
+    }
+
+class RollupJob:
+    """Folds new requests and ledger movements into the usage rollups."""
+
+    def __init__(self, interval_seconds: int, batch_size: int, grace_seconds: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.grace_seconds = grace_seconds
+        self._task: asyncio.Task | None = None
+        self._runs = 0
+        self._rows_folded = 0
+        self._last_run_seconds = 0.0
+        self._last_run_at: datetime | None = None
+
+    async def run_once(self) -> int:
+        started = time.perf_counter()
+        folded = 0
+        db = open_async_session()
+        try:
+            while True:
+                n = await fold_batch(db, self.batch_size, self.grace_seconds)
+                folded += n
+                if n < self.batch_size:
+                    break
+        finally:
+            await db.close()
+        self._runs += 1
+        self._rows_folded += folded
+        self._last_run_seconds = time.perf_counter() - started
+        self._last_run_at = datetime.now(timezone.utc)
+        return folded
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("usage rollup job failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self._runs,
+            "rows_folded": self._rows_folded,
+            "last_run_seconds": self._last_run_seconds,
+            "last_run_at": self._last_run_at.isoformat() if self._last_run_at else None,
+        }
+
+rollup_job = RollupJob(settings.ANALYTICS_ROLLUP_INTERVAL_SECONDS, settings.ANALYTICS_ROLLUP_BATCH_SIZE, settings.ANALYTICS_ROLLUP_GRACE_SECONDS)
@@ -0,0 +1,110 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.fast_json import dumps, row_dicts
+from app.db.session import open_read_session
+from app.models.inventory import ToolInventory
+
+@dataclass(frozen=True)
+class CatalogEntry:
+    version: int
+    etag: str
+    body: bytes
+    built_at: float
+
+class ToolCatalog:
+    """The operator tool list, serialized once per inventory version.
+
+    The version is bumped after any commit that wrote tool_inventory in this
+    process; the TTL bounds how long a change committed by another worker
+    can go unseen.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._entry: CatalogEntry | None = None
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self.version += 1
+
+    def fresh(self) -> CatalogEntry | None:
+        entry = self._entry
+        if entry is None or entry.version != self.version:
+            return None
+        if time.monotonic() - entry.built_at > self.ttl_seconds:
+            return None
+        return entry
+
+    async def get(self) -> CatalogEntry:
+        entry = self.fresh()
+        if entry is not None:
+            return entry
+        async with self._lock:
+            # Another request may have rebuilt it while this one waited
+            entry = self.fresh()
+            if entry is None:
+                entry = await self._build()
+                self._entry = entry
+            return entry
+
+    async def _build(self) -> CatalogEntry:
+        # Read the version first: a bump during the query leaves this entry stale
+        version = self.version
+        db = open_read_session()
+        try:
+            # Columns labelled as the ToolListItem fields, encoded without a model per row
+            result = await db.execute(
+            select(
+            ToolInventory.id.label("tool_id"),
+            ToolInventory.name,
+            ToolInventory.make,
+            ToolInventory.range_mm,
+            ToolInventory.location,
+            ToolInventory.quantity_available,
+            )
+            .where(ToolInventory.quantity_available > 0)
+            .order_by(ToolInventory.name.asc())
+            )
+            body = dumps(row_dicts(result))
+        finally:
+            await db.close()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return CatalogEntry(version=version, etag=etag, body=body, built_at=time.monotonic())
+
+catalog = ToolCatalog(settings.TOOL_CATALOG_TTL_SECONDS)
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return any(tag.strip() in (etag, "*") for tag in if_none_match.split(","))
+
+# Stock changes reach tool_inventory through the services in
+# app.services.inventory, bulk INSERTs and plain ORM edits; watching the
+# session catches all of them without each route having to remember.
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_inventory_dml(state):
+    # The statement carries an annotated copy of the table, so compare by name
+    table = getattr(state.statement, "table", None)
+    if (state.is_update or state.is_insert or state.is_delete) and getattr(table, "name", None) == ToolInventory.__tablename__:
+        state.session.info["inventory_changed"] = True
+
+@event.listens_for(Session, "after_flush")
+def _track_inventory_flush(session, flush_context):
+    if any(isinstance(o, ToolInventory) for o in (*session.new, *session.dirty, *session.deleted)):
+        session.info["inventory_changed"] = True
+
+@event.listens_for(Session, "after_commit")
+def _bump_catalog_version(session):
+    if session.info.pop("inventory_changed", False):
+        catalog.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def _forget_inventory_change(session):
+    session.info.pop("inventory_changed", None)
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select, update
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.session import open_async_session
+from app.models.email_outbox import EmailOutbox
+from app.models.enums import EmailStatus
+from app.services.email_service import SmtpConnection
+
+logger = logging.getLogger(__name__)
+
+class EmailDispatcher:
+    """Sends queued outbox rows in batches over one reused SMTP connection."""
+
+    def __init__(self, interval_seconds: int, batch_size: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.smtp = SmtpConnection()
+        self._task: asyncio.Task | None = None
+        self._wake = asyncio.Event()
+        self._sent = 0
+        self._failed = 0
+        self._retried = 0
+        self._queue_depth = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 3600))
+
+    async def _claim(self, db, now: datetime) -> list[EmailOutbox]:
+        # Claiming pushes next_attempt_at past the send timeout, so a worker
+        # that dies mid-batch leaves its rows to be retried, not lost
+        batch = (
+            select(EmailOutbox.id)
+            .where(EmailOutbox.status == EmailStatus.PENDING, EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        rows = (await db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(batch))
+            .values(attempts=EmailOutbox.attempts + 1, next_attempt_at=now + timedelta(seconds=settings.SMTP_TIMEOUT_SECONDS * self.batch_size))
+            .returning(EmailOutbox)
+            .execution_options(synchronize_session=False)
+        )).scalars().all()
+        await db.commit()
+        return rows
+
+    def _send_batch(self, rows, results: list[tuple[EmailOutbox, Exception | None]]):
+        # Appends as it goes, so whatever went out is still recorded if the batch is cut short
+        for row in rows:
+            try:
+                self.smtp.send(row.to_email, row.subject, row.body)
+            except Exception as exc:
+                results.append((row, exc))
+            else:
+                results.append((row, None))
+
+    async def _record(self, db, results: list[tuple[EmailOutbox, Exception | None]]):
+        sent_at = datetime.now(timezone.utc)
+        sent = [row for row, exc in results if exc is None]
+        if sent:
+            # Committed on their own first: a delivered row must never be sent again
+            await db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_([row.id for row in sent]))
+                .values(status=EmailStatus.SENT, sent_at=sent_at, last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            for row in sent:
+                latency = (sent_at - row.created_at).total_seconds()
+                self._sent += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+        for row, exc in results:
+            if exc is None:
+                continue
+            if row.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                values = {"status": EmailStatus.FAILED, "last_error": str(exc)[:500]}
+                self._failed += 1
+                logger.warning("giving up on email %s to %s: %s", row.id, row.to_email, exc)
+            else:
+                values = {"next_attempt_at": sent_at + self._backoff(row.attempts), "last_error": str(exc)[:500]}
+                self._retried += 1
+            await db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == row.id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+        await db.commit()
+
+    async def run_once(self) -> int:
+        now = datetime.now(timezone.utc)
+        db = open_async_session()
+        try:
+            rows = await self._claim(db, now)
+            if rows:
+                results = []
+                try:
+                    await run_in_threadpool(self._send_batch, rows, results)
+                finally:
+                    await self._record(db, results)
+            self._queue_depth = await db.scalar(
+                select(func.count()).select_from(EmailOutbox).where(EmailOutbox.status == EmailStatus.PENDING)
+            )
+        finally:
+            await db.close()
+        return len(rows)
+
+    async def _loop(self):
+        while True:
+            try:
+                # Keep draining while batches come back full
+                while await self.run_once() == self.batch_size:
+                    pass
+            except Exception:
+                logger.exception("email dispatcher run failed")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def wake(self):
+        # Called after a commit that queued mail so it goes out without waiting for the poll
+        self._wake.set()
+
+    def start(self):
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await run_in_threadpool(self.smtp.close)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue_depth,
+            "sent": self._sent,
+            "failed": self._failed,
+            "retried": self._retried,
+            "delivery_latency_avg_seconds": self._latency_total / self._sent if self._sent else 0.0,
+            "delivery_latency_max_seconds": self._latency_max,
+        }
+
+dispatcher = EmailDispatcher(settings.EMAIL_DISPATCH_INTERVAL_SECONDS, settings.EMAIL_DISPATCH_BATCH_SIZE)
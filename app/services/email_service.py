@@ -1,2 +1,55 @@
-def send_email(to_email: str, subject: str, body: str):
-	print(f"Sending email to {to_email}: {subject}\n{body}")
+import smtplib
+import time
+from email.message import EmailMessage
+from app.core.config import settings
+from app.models.email_outbox import EmailOutbox
+
+def enqueue_email(db, to_email: str, subject: str, body: str) -> EmailOutbox:
+	# Only stages the row; it is sent once the caller's transaction commits
+	row = EmailOutbox(to_email=to_email, subject=subject, body=body)
+	db.add(row)
+	return row
+
+class SmtpConnection:
+	"""One SMTP session reused across messages and reopened when it drops or idles out."""
+
+	def __init__(self):
+		self._smtp: smtplib.SMTP | None = None
+		self._last_used = 0.0
+
+	def _open(self):
+		smtp = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+		if settings.SMTP_TLS:
+			smtp.starttls()
+		if settings.SMTP_USER:
+			smtp.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+		self._smtp = smtp
+
+	def _connection(self) -> smtplib.SMTP:
+		if self._smtp is not None and time.monotonic() - self._last_used > settings.SMTP_IDLE_SECONDS:
+			self.close()
+		if self._smtp is None:
+			self._open()
+		return self._smtp
+
+	def send(self, to_email: str, subject: str, body: str):
+		msg = EmailMessage()
+		msg["From"] = settings.EMAIL_FROM
+		msg["To"] = to_email
+		msg["Subject"] = subject
+		msg.set_content(body)
+		try:
+			self._connection().send_message(msg)
+		except (smtplib.SMTPServerDisconnected, OSError):
+			# The server may have dropped an idle connection; retry once on a fresh one
+			self.close()
+			self._connection().send_message(msg)
+		self._last_used = time.monotonic()
+
+	def close(self):
+		if self._smtp is not None:
+			try:
+				self._smtp.quit()
+			except Exception:
+				pass
+			self._smtp = None
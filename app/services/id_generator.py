@@ -1,4 +1,37 @@
-import uuid
+import asyncio
+from sqlalchemy import Sequence, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.inventory import tool_code_seq
+from app.models.tool_requests import tool_usage_request_code_seq, tool_addition_request_code_seq
 
-def make_request_id() -> str:
-	return uuid.uuid4().hex
+# The code sequences use INCREMENT BY > 1, so one nextval() reserves the whole
+# block [v, v + increment) for this process and most codes need no query.
+def make_request_id(prefix: str, n: int) -> str:
+	return f"{prefix}{n:05d}"
+
+class IdAllocator:
+	def __init__(self, sequence: Sequence):
+		self.sequence = sequence
+		self._next = 0
+		self._end = 0
+		self._lock = asyncio.Lock()
+
+	async def allocate(self, db: AsyncSession) -> int:
+		return (await self.allocate_many(db, 1))[0]
+
+	async def allocate_many(self, db: AsyncSession, count: int) -> list[int]:
+		ids = []
+		async with self._lock:
+			while len(ids) < count:
+				if self._next >= self._end:
+					# nextval() is not transactional, a rollback only leaves a gap
+					self._next = (await db.execute(select(self.sequence.next_value()))).scalar_one()
+					self._end = self._next + self.sequence.increment
+				take = min(count - len(ids), self._end - self._next)
+				ids.extend(range(self._next, self._next + take))
+				self._next += take
+		return ids
+
+usage_request_ids = IdAllocator(tool_usage_request_code_seq)
+addition_request_ids = IdAllocator(tool_addition_request_code_seq)
+tool_codes = IdAllocator(tool_code_seq)
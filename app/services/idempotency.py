@@ -0,0 +1,240 @@
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.db.session import open_async_session
+from app.models.idempotency import IdempotencyKey
+
+HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+
+class IdempotentReplay(Exception):
+    """Raised by the idempotent dependency to answer with a stored response."""
+
+    def __init__(self, stored: "StoredResponse"):
+        self.stored = stored
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int | None
+    content_type: str | None
+    body: bytes | None
+    expires_at: datetime
+    locked_until: datetime | None = None
+
+    @property
+    def complete(self) -> bool:
+        return self.status_code is not None
+
+    def abandoned(self, now: datetime) -> bool:
+        """Pending past its lease: the first call died without answering."""
+        return not self.complete and self.locked_until is not None and self.locked_until <= now
+
+class Claim:
+    """Set on the ASGI scope by IdempotencyMiddleware for requests carrying an Idempotency-Key.
+
+    The idempotent dependency fills in owner and fingerprint and activates it
+    once the key is reserved; only then is the response recorded. lease is
+    the locked_until the reservation wrote, so a call whose key was taken
+    over after its lease ran out leaves the new holder's row alone.
+    """
+    __slots__ = ("key", "owner", "fingerprint", "active", "lease")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.owner = None
+        self.fingerprint = None
+        self.active = False
+        self.lease = None
+
+def fingerprint(method: str, path: str, body: bytes) -> str:
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+class IdempotencyStore:
+    """idempotency_keys behind a per-process LRU of completed responses.
+
+    Completed entries never change, so the LRU can't go stale; pending ones
+    are only ever read from the table. lookup and reserve run on the
+    request's own session, ahead of the handler; complete and release run
+    once the request has given its connection back.
+    """
+
+    def __init__(self, ttl_seconds: int, lease_seconds: int, cache_size: int):
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, str], StoredResponse] = OrderedDict()
+        self._hits = 0
+        self._replays = 0
+
+    def _cached(self, owner: str, key: str, now: datetime) -> StoredResponse | None:
+        stored = self._cache.get((owner, key))
+        if stored is None:
+            return None
+        if stored.expires_at <= now:
+            del self._cache[(owner, key)]
+            return None
+        self._cache.move_to_end((owner, key))
+        self._hits += 1
+        return stored
+
+    def _remember(self, owner: str, key: str, stored: StoredResponse):
+        self._cache[(owner, key)] = stored
+        self._cache.move_to_end((owner, key))
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def lookup(self, db, owner: str, key: str) -> StoredResponse | None:
+        now = datetime.now(timezone.utc)
+        stored = self._cached(owner, key, now)
+        if stored is not None:
+            return stored
+        row = (await db.execute(
+            select(
+                IdempotencyKey.fingerprint, IdempotencyKey.status_code, IdempotencyKey.content_type,
+                IdempotencyKey.body, IdempotencyKey.expires_at, IdempotencyKey.locked_until,
+            )
+            .where(IdempotencyKey.owner == owner, IdempotencyKey.key == key, IdempotencyKey.expires_at > now)
+        )).one_or_none()
+        if row is None:
+            return None
+        stored = StoredResponse(*row)
+        if stored.complete:
+            self._remember(owner, key, stored)
+        return stored
+
+    async def reserve(self, db, claim: Claim) -> bool:
+        """Claims the key for a first call; False when another call holds it.
+
+        Commits, so the reservation is visible to retries before the handler runs.
+        """
+        now = datetime.now(timezone.utc)
+        lease = now + timedelta(seconds=self.lease_seconds)
+        values = {
+            "fingerprint": claim.fingerprint, "status_code": None, "content_type": None, "body": None,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds), "locked_until": lease,
+        }
+        stmt = insert(IdempotencyKey).values(owner=claim.owner, key=claim.key, **values)
+        # An expired row is taken over as if it weren't there, and so is one
+        # left pending past its lease
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.owner, IdempotencyKey.key],
+            set_=values,
+            where=or_(
+                IdempotencyKey.expires_at <= now,
+                IdempotencyKey.status_code.is_(None) & (IdempotencyKey.locked_until <= now),
+            ),
+        ).returning(IdempotencyKey.key)
+        reserved = (await db.execute(stmt)).first() is not None
+        await db.commit()
+        if reserved:
+            claim.lease = lease
+        return reserved
+
+    def _held(self, claim: Claim):
+        return (
+            (IdempotencyKey.owner == claim.owner) & (IdempotencyKey.key == claim.key)
+            & IdempotencyKey.status_code.is_(None) & (IdempotencyKey.locked_until == claim.lease)
+        )
+
+    async def complete(self, claim: Claim, status_code: int, content_type: str | None, body: bytes):
+        db = open_async_session()
+        try:
+            expires_at = (await db.execute(
+                update(IdempotencyKey)
+                .where(self._held(claim))
+                .values(status_code=status_code, content_type=content_type, body=body, locked_until=None)
+                .returning(IdempotencyKey.expires_at)
+                .execution_options(synchronize_session=False)
+            )).scalar_one_or_none()
+            await db.commit()
+        finally:
+            await db.close()
+        if expires_at is not None:
+            self._remember(claim.owner, claim.key, StoredResponse(claim.fingerprint, status_code, content_type, body, expires_at))
+
+    async def release(self, claim: Claim):
+        # The call failed without an answer worth replaying; let a retry run it again
+        db = open_async_session()
+        try:
+            await db.execute(delete(IdempotencyKey).where(self._held(claim)).execution_options(synchronize_session=False))
+            await db.commit()
+        finally:
+            await db.close()
+
+    def replayed(self):
+        self._replays += 1
+
+    def stats(self) -> dict:
+        return {"cached": len(self._cache), "cache_hits": self._hits, "replays": self._replays}
+
+store = IdempotencyStore(settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_LEASE_SECONDS, settings.IDEMPOTENCY_CACHE_SIZE)
+
+class IdempotencyMiddleware:
+    """Records the response of requests whose Idempotency-Key the idempotent dependency reserved."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+        key = next((v.decode("latin-1") for k, v in scope["headers"] if k == HEADER.encode()), None)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        claim = scope["idempotency"] = Claim(key)
+        status = 500
+        content_type = None
+        chunks = []
+
+        async def send_wrapper(message):
+            nonlocal status, content_type
+            if claim.active:
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    content_type = next((v.decode("latin-1") for k, v in message.get("headers", []) if k == b"content-type"), None)
+                elif message["type"] == "http.response.body":
+                    chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException:
+            if claim.active:
+                await store.release(claim)
+            raise
+        if not claim.active:
+            return
+        if status >= 500:
+            await store.release(claim)
+        else:
+            await store.complete(claim, status, content_type, b"".join(chunks))
+
+async def purge_expired(db, now: datetime, batch_size: int) -> int:
+    purged = 0
+    while True:
+        # SKIP LOCKED, like the session sweep, so workers don't queue on each other
+        batch = (
+            select(IdempotencyKey.owner, IdempotencyKey.key)
+            .where(IdempotencyKey.expires_at <= now)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        deleted = len((await db.execute(
+            delete(IdempotencyKey)
+            .where(tuple_(IdempotencyKey.owner, IdempotencyKey.key).in_(batch))
+            .returning(IdempotencyKey.key)
+            .execution_options(synchronize_session=False)
+        )).all())
+        await db.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
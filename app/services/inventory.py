@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, case, insert, select, text, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.types import Text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.enums import MovementKind
+from app.models.inventory import InventoryMovement, ToolInventory
+
+# Stock moves are single conditional UPDATEs: the row lock taken by the
+# UPDATE itself serializes concurrent movements of the same tool, and
+# movements of different tools never wait on each other. Every move also
+# appends to inventory_movements in the same transaction, while that lock
+# is held, so the ledger and quantity_available commit together.
+
+async def record_movements(db: AsyncSession, movements):
+    # movements: (tool_id, delta, kind, ref)
+    if not movements:
+        return
+    now = datetime.now(timezone.utc)
+    await db.execute(insert(InventoryMovement), [
+        {"tool_id": tool_id, "delta": delta, "kind": kind, "ref": ref, "created_at": now}
+        for tool_id, delta, kind, ref in movements
+    ])
+
+async def lock_tool_identities(db: AsyncSession, keys):
+    # keys: (name, make, range_mm, location). Tools have no unique key on those
+    # columns, so approvals that may create one take a transaction-scoped
+    # advisory lock per identity first; two approvals of the same new tool then
+    # find-or-create one row instead of two. Sorted so lockers never deadlock.
+    names = sorted({"\x1f".join("" if part is None else str(part) for part in key) for key in keys})
+    if names:
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(hashtext('tool:' || k)) FROM (SELECT unnest(:keys) AS k ORDER BY 1) AS ordered")
+            .bindparams(bindparam("keys", value=names, type_=ARRAY(Text)))
+        )
+
+async def take_stock(db: AsyncSession, tool_id: int, qty: int, ref: str | None = None):
+    # None when the tool is missing or has fewer than qty available
+    row = (await db.execute(
+        update(ToolInventory)
+        .where(ToolInventory.id == tool_id, ToolInventory.quantity_available >= qty)
+        .values(quantity_available=ToolInventory.quantity_available - qty)
+        .returning(ToolInventory.id, ToolInventory.name, ToolInventory.quantity_available)
+        .execution_options(synchronize_session=False)
+    )).one_or_none()
+    if row:
+        await record_movements(db, [(tool_id, -qty, MovementKind.ISSUE, ref)])
+    return row
+
+async def restock(db: AsyncSession, tool_id: int, qty: int, ref: str | None = None):
+    row = (await db.execute(
+        update(ToolInventory)
+        .where(ToolInventory.id == tool_id)
+        .values(quantity_available=ToolInventory.quantity_available + qty)
+        .returning(ToolInventory.id, ToolInventory.name, ToolInventory.quantity_available)
+        .execution_options(synchronize_session=False)
+    )).one_or_none()
+    if row:
+        await record_movements(db, [(tool_id, qty, MovementKind.RETURN, ref)])
+    return row
+
+# Batch variants for the bulk endpoints: lock the rows once, decide in
+# Python, then apply every movement in a single UPDATE. They take
+# (tool_id, qty, ref) per request so the ledger keeps one row per request.
+
+def _per_tool(items) -> dict[int, int]:
+    quantities: dict[int, int] = {}
+    for tool_id, qty, _ in items:
+        quantities[tool_id] = quantities.get(tool_id, 0) + qty
+    return quantities
+
+async def lock_stock(db: AsyncSession, tool_ids) -> dict[int, int]:
+    if not tool_ids:
+        return {}
+    rows = (await db.execute(
+        select(ToolInventory.id, ToolInventory.quantity_available)
+        .where(ToolInventory.id.in_(tool_ids))
+        .order_by(ToolInventory.id)
+        .with_for_update()
+    )).all()
+    return {r.id: r.quantity_available for r in rows}
+
+async def take_stock_many(db: AsyncSession, issues):
+    # Callers hold the locks from lock_stock and have checked availability
+    quantities = _per_tool(issues)
+    if not quantities:
+        return
+    await db.execute(
+        update(ToolInventory)
+        .where(ToolInventory.id.in_(list(quantities)))
+        .values(quantity_available=ToolInventory.quantity_available - case(quantities, value=ToolInventory.id))
+        .execution_options(synchronize_session=False)
+    )
+    await record_movements(db, [(tool_id, -qty, MovementKind.ISSUE, ref) for tool_id, qty, ref in issues])
+
+async def receive_stock_many(db: AsyncSession, receipts):
+    # New stock from approved tool additions grows both total and available
+    quantities = _per_tool(receipts)
+    if not quantities:
+        return
+    added = case(quantities, value=ToolInventory.id)
+    await db.execute(
+        update(ToolInventory)
+        .where(ToolInventory.id.in_(list(quantities)))
+        .values(
+            quantity_total=ToolInventory.quantity_total + added,
+            quantity_available=ToolInventory.quantity_available + added,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await record_movements(db, [(tool_id, qty, MovementKind.RECEIPT, ref) for tool_id, qty, ref in receipts])
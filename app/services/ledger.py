@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from sqlalchemy import and_, func, insert, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.session import open_async_session
+from app.models.inventory import InventoryMovement, InventorySnapshot, ToolInventory
+
+logger = logging.getLogger(__name__)
+
+# A snapshot is the ledger balance of one tool up to last_movement_id. It is
+# taken with the tool row locked, and every stock movement updates that row
+# before appending to the ledger, so no movement at or below last_movement_id
+# can still be in flight. Balances are then one snapshot plus the movements
+# after it.
+
+async def stock_at(db: AsyncSession, tool_id: int, at: datetime) -> int:
+    snap = (await db.execute(
+        select(InventorySnapshot.quantity_available, InventorySnapshot.last_movement_id)
+        .where(InventorySnapshot.tool_id == tool_id, InventorySnapshot.taken_at <= at)
+        .order_by(InventorySnapshot.last_movement_id.desc())
+        .limit(1)
+    )).one_or_none()
+    base, since = (snap.quantity_available, snap.last_movement_id) if snap else (0, 0)
+    delta = await db.scalar(
+        select(func.coalesce(func.sum(InventoryMovement.delta), 0))
+        .where(InventoryMovement.tool_id == tool_id, InventoryMovement.id > since, InventoryMovement.created_at <= at)
+    )
+    return base + delta
+
+async def movements_between(db: AsyncSession, tool_id: int, start: datetime | None, end: datetime | None, after: tuple[datetime, int] | None, limit: int):
+    stmt = select(InventoryMovement).where(InventoryMovement.tool_id == tool_id)
+    if start:
+        stmt = stmt.where(InventoryMovement.created_at >= start)
+    if end:
+        stmt = stmt.where(InventoryMovement.created_at < end)
+    if after:
+        stmt = stmt.where(tuple_(InventoryMovement.created_at, InventoryMovement.id) > after)
+    stmt = stmt.order_by(InventoryMovement.created_at, InventoryMovement.id).limit(limit + 1)
+    return (await db.execute(stmt)).scalars().all()
+
+def _latest_snapshot(column):
+    return (
+        select(column)
+        .where(InventorySnapshot.tool_id == ToolInventory.id)
+        .order_by(InventorySnapshot.last_movement_id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+async def reconcile(db: AsyncSession) -> list[dict]:
+    """Tools whose quantity_available disagrees with their ledger balance.
+
+    One statement, so it sees a single consistent view without locking.
+    """
+    since = func.coalesce(_latest_snapshot(InventorySnapshot.last_movement_id), 0)
+    moved = (
+        select(func.coalesce(func.sum(InventoryMovement.delta), 0))
+        .where(InventoryMovement.tool_id == ToolInventory.id, InventoryMovement.id > since)
+        .scalar_subquery()
+    )
+    ledger = func.coalesce(_latest_snapshot(InventorySnapshot.quantity_available), 0) + moved
+    rows = (await db.execute(
+        select(ToolInventory.id, ToolInventory.quantity_available, ledger.label("ledger"))
+        .where(ToolInventory.quantity_available != ledger)
+        .order_by(ToolInventory.id)
+    )).all()
+    return [{"tool_id": r.id, "quantity_available": r.quantity_available, "ledger": r.ledger} for r in rows]
+
+async def take_snapshots(db: AsyncSession, batch_size: int) -> int:
+    # Tools with movements newer than their latest snapshot; both maxima are index lookups
+    last_move = select(func.max(InventoryMovement.id)).where(InventoryMovement.tool_id == ToolInventory.id).scalar_subquery()
+    last_snap = select(func.max(InventorySnapshot.last_movement_id)).where(InventorySnapshot.tool_id == ToolInventory.id).scalar_subquery()
+    due = (await db.execute(
+        select(ToolInventory.id)
+        .where(last_move > func.coalesce(last_snap, 0))
+        .order_by(ToolInventory.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )).scalars().all()
+    if not due:
+        await db.commit()
+        return 0
+    latest = (
+        select(InventorySnapshot.tool_id, func.max(InventorySnapshot.last_movement_id))
+        .where(InventorySnapshot.tool_id.in_(due))
+        .group_by(InventorySnapshot.tool_id)
+    )
+    prev = {
+        s.tool_id: (s.quantity_available, s.last_movement_id)
+        for s in (await db.execute(
+            select(InventorySnapshot.tool_id, InventorySnapshot.quantity_available, InventorySnapshot.last_movement_id)
+            .where(tuple_(InventorySnapshot.tool_id, InventorySnapshot.last_movement_id).in_(latest))
+        )).all()
+    }
+    # One index range per tool: only the movements since its last snapshot
+    moved = (await db.execute(
+        select(InventoryMovement.tool_id, func.sum(InventoryMovement.delta), func.max(InventoryMovement.id))
+        .where(or_(*[
+            and_(InventoryMovement.tool_id == tool_id, InventoryMovement.id > prev.get(tool_id, (0, 0))[1])
+            for tool_id in due
+        ]))
+        .group_by(InventoryMovement.tool_id)
+    )).all()
+    now = datetime.now(timezone.utc)
+    await db.execute(insert(InventorySnapshot), [
+        {
+            "tool_id": tool_id,
+            "last_movement_id": last_id,
+            "quantity_available": prev.get(tool_id, (0, 0))[0] + delta,
+            "taken_at": now,
+        } for tool_id, delta, last_id in moved
+    ])
+    await db.commit()
+    return len(moved)
+
+class InventoryLedgerJob:
+    """Snapshots tools that moved since their last snapshot, then reconciles the ledger."""
+
+    def __init__(self, interval_seconds: int, batch_size: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: asyncio.Task | None = None
+        self._runs = 0
+        self._snapshots_taken = 0
+        self._mismatches: list[dict] = []
+        self._last_run_seconds = 0.0
+        self._last_run_at: datetime | None = None
+
+    async def run_once(self) -> tuple[int, list[dict]]:
+        started = time.perf_counter()
+        taken = 0
+        db = open_async_session()
+        try:
+            while True:
+                n = await take_snapshots(db, self.batch_size)
+                taken += n
+                if n < self.batch_size:
+                    break
+            mismatches = await reconcile(db)
+        finally:
+            await db.close()
+        if mismatches:
+            logger.warning("inventory ledger disagrees with stock for %d tools: %s", len(mismatches), mismatches[:20])
+        self._runs += 1
+        self._snapshots_taken += taken
+        self._mismatches = mismatches
+        self._last_run_seconds = time.perf_counter() - started
+        self._last_run_at = datetime.now(timezone.utc)
+        return taken, mismatches
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("inventory ledger job failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self._runs,
+            "snapshots_taken": self._snapshots_taken,
+            "mismatched_tools": len(self._mismatches),
+            "last_run_seconds": self._last_run_seconds,
+            "last_run_at": self._last_run_at.isoformat() if self._last_run_at else None,
+        }
+
+ledger_job = InventoryLedgerJob(settings.INVENTORY_LEDGER_INTERVAL_SECONDS, settings.INVENTORY_SNAPSHOT_BATCH_SIZE)
@@ -1,56 +1,124 @@
-from datetime import datetime, timezone
-from sqlalchemy.orm import Session as OrmSession
-from sqlalchemy import select
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.models.role_lock import RoleLock
 from app.models.enums import UserRole
 from app.models.session import Session as SessionModel
 
-def get_active_lock(db: OrmSession, role: UserRole):
-    lock = db.execute(select(RoleLock).where(RoleLock.role == role)).scalar_one_or_none()
-    if not lock:
-        return None
-    # Only allow lock if session is valid
-    if lock.session_id is not None:
-        # Check if the linked session is still valid
-        s = db.get(SessionModel, lock.session_id)
-        if s is None or s.expires_at <= datetime.now(timezone.utc) or s.logout_at is not None:
-            # Stale lock, delete the row
-            db.delete(lock)
-            db.commit()
-            return None
-        # Session is valid, lock is active
-        return lock
-    # No active session, lock is not held
-    return None
-
-def acquire_lock(db: OrmSession, role: UserRole, session_row: SessionModel):
-    lock = db.execute(select(RoleLock).where(RoleLock.role == role)).scalar_one_or_none()
-    active = get_active_lock(db, role)
-    if active:
-        # Lock is held by another session, deny
-        return None
-
-    if not lock:
-        # Create lock for this session
-        lock = RoleLock(
-            role=role,
-            session_id=session_row.id
+# Single officer / single supervisor: each role is a lease owned by one
+# session until it is released, the session expires, or (with
+# ROLE_LOCK_LEASE_SECONDS) the owner stops heartbeating.
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def _lease_until(session_row: SessionModel) -> datetime:
+    if settings.ROLE_LOCK_LEASE_SECONDS <= 0:
+        return session_row.expires_at
+    return min(session_row.expires_at, _now() + timedelta(seconds=settings.ROLE_LOCK_LEASE_SECONDS))
+
+class _HeartbeatSchedule:
+    # Owners renew once half the lease has run, not on every request
+    def __init__(self):
+        self._due: dict[str, float] = {}
+
+    def is_due(self, owner: str) -> bool:
+        return time.monotonic() >= self._due.get(owner, 0.0)
+
+    def renewed(self, owner: str):
+        self._due[owner] = time.monotonic() + settings.ROLE_LOCK_LEASE_SECONDS / 2
+
+    def forget(self, owner: str):
+        self._due.pop(owner, None)
+
+class LeaseLockManager:
+    """Leases stored in role_locks, taken over with a single upsert."""
+
+    def __init__(self):
+        self._heartbeats = _HeartbeatSchedule()
+
+    async def acquire(self, db: AsyncSession, role: UserRole, session_row: SessionModel) -> tuple[bool, datetime | None]:
+        # Returns (acquired, locked_since of the current holder when not acquired)
+        now = _now()
+        owner = str(session_row.id)
+        stmt = insert(RoleLock).values(role=role, session_id=owner, locked_at=now, expires_at=_lease_until(session_row))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RoleLock.role],
+            set_={"session_id": stmt.excluded.session_id, "locked_at": stmt.excluded.locked_at, "expires_at": stmt.excluded.expires_at},
+            where=(RoleLock.expires_at <= now) | (RoleLock.session_id == owner),
+        ).returning(RoleLock.id)
+        if (await db.execute(stmt)).first():
+            self._heartbeats.renewed(owner)
+            return True, None
+        locked_since = (await db.execute(select(RoleLock.locked_at).where(RoleLock.role == role))).scalar_one_or_none()
+        return False, locked_since
+
+    async def heartbeat(self, db: AsyncSession, role: UserRole, session_row: SessionModel) -> bool:
+        # False once the lease has been lost to another session
+        owner = str(session_row.id)
+        if settings.ROLE_LOCK_LEASE_SECONDS <= 0 or not self._heartbeats.is_due(owner):
+            return True
+        renewed = (await db.execute(
+            update(RoleLock)
+            .where(RoleLock.role == role, RoleLock.session_id == owner, RoleLock.expires_at > _now())
+            .values(expires_at=_lease_until(session_row))
+            .returning(RoleLock.id)
+            .execution_options(synchronize_session=False)
+        )).first()
+        await db.commit()
+        if not renewed:
+            self._heartbeats.forget(owner)
+            return False
+        self._heartbeats.renewed(owner)
+        return True
+
+    async def release(self, db: AsyncSession, role: UserRole, session_row: SessionModel):
+        owner = str(session_row.id)
+        self._heartbeats.forget(owner)
+        await db.execute(
+            delete(RoleLock)
+            .where(RoleLock.role == role, RoleLock.session_id == owner)
+            .execution_options(synchronize_session=False)
         )
-        db.add(lock)
-        db.commit()
-        db.refresh(lock)
-        return lock
-
-    # Acquire lock for this session
-    lock.session_id = session_row.id
-    db.commit()
-    db.refresh(lock)
-    return lock
-
-def release_lock_if_owner(db: OrmSession, role: UserRole, session_row: SessionModel):
-    lock = db.execute(select(RoleLock).where(RoleLock.role == role)).scalar_one_or_none()
-    if not lock:
-        return
-    if lock.session_id == session_row.id:
-        db.delete(lock)
-        db.commit()
+
+class InMemoryLockManager:
+    """Same contract kept in process memory, for tests and single-process dev runs."""
+
+    def __init__(self):
+        self._leases: dict[UserRole, tuple[str, datetime, datetime]] = {}
+        self._heartbeats = _HeartbeatSchedule()
+
+    async def acquire(self, db, role: UserRole, session_row) -> tuple[bool, datetime | None]:
+        # No await inside: the check and the write happen in one step on the event loop
+        now = _now()
+        owner = str(session_row.id)
+        held = self._leases.get(role)
+        if held and held[0] != owner and held[2] > now:
+            return False, held[1]
+        self._leases[role] = (owner, now, _lease_until(session_row))
+        self._heartbeats.renewed(owner)
+        return True, None
+
+    async def heartbeat(self, db, role: UserRole, session_row) -> bool:
+        owner = str(session_row.id)
+        if settings.ROLE_LOCK_LEASE_SECONDS <= 0 or not self._heartbeats.is_due(owner):
+            return True
+        held = self._leases.get(role)
+        if not held or held[0] != owner or held[2] <= _now():
+            self._heartbeats.forget(owner)
+            return False
+        self._leases[role] = (owner, held[1], _lease_until(session_row))
+        self._heartbeats.renewed(owner)
+        return True
+
+    async def release(self, db, role: UserRole, session_row):
+        owner = str(session_row.id)
+        self._heartbeats.forget(owner)
+        held = self._leases.get(role)
+        if held and held[0] == owner:
+            del self._leases[role]
+
+lock_manager = InMemoryLockManager() if settings.ROLE_LOCK_BACKEND == "memory" else LeaseLockManager()
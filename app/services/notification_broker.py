@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+import select
+import threading
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "notifications"
+
+@dataclass(eq=False)
+class Subscription:
+    user_id: int
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=100))
+    # Set when the subscriber fell too far behind; it should reconnect and resume
+    overflowed: bool = False
+
+    def wants(self, event: dict) -> bool:
+        return event.get("user_id") == self.user_id
+
+class NotificationBroker:
+    """In-process fan-out of new notifications to streaming subscribers."""
+
+    def __init__(self):
+        self._subscribers: set[Subscription] = set()
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def subscribe(self, user_id: int) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(user_id=user_id)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+
+    def publish(self, event: dict):
+        # Must run on the event loop; other threads use publish_threadsafe
+        for sub in list(self._subscribers):
+            if not sub.wants(event):
+                continue
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                sub.overflowed = True
+                self._subscribers.discard(sub)
+
+    def publish_threadsafe(self, event: dict):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.publish, event)
+
+class PgNotifyListener:
+    """Feeds the broker from Postgres LISTEN so every worker sees every notification."""
+
+    def __init__(self, broker: NotificationBroker):
+        self.broker = broker
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="pg-notify-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self):
+        from app.db.session import engine
+
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = engine.raw_connection()
+                dbapi = conn.driver_connection
+                dbapi.autocommit = True
+                dbapi.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                while not self._stop.is_set():
+                    if select.select([dbapi], [], [], 5) == ([], [], []):
+                        continue
+                    dbapi.poll()
+                    while dbapi.notifies:
+                        self.broker.publish_threadsafe(json.loads(dbapi.notifies.pop(0).payload))
+            except Exception:
+                logger.exception("notification listener lost its connection, reconnecting")
+                self._stop.wait(1)
+            finally:
+                if conn is not None:
+                    # Never hand a LISTENing autocommit connection back to the pool
+                    conn.invalidate()
+
+broker = NotificationBroker()
+listener = PgNotifyListener(broker)
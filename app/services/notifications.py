@@ -1,7 +1,94 @@
-from sqlalchemy.orm import Session as OrmSession
-from app.models.notification import Notification
+import json
+from datetime import datetime, timezone
+from sqlalchemy import select, update, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.notification import Notification, NotificationCounter
+from app.models.user import User
+from app.services.notification_broker import NOTIFY_CHANNEL, broker
 
-def notify_user(db: OrmSession, user_id: int | None, role: str | None, title: str, description: str | None = None, target_url: str | None = None):
-    n = Notification(user_id=user_id, role=role, title=title, description=description, target_url=target_url)
-    db.add(n)
-    db.commit()
\ No newline at end of file
+def notification_event(n) -> dict:
+    return {
+        "id": n.id,
+        "user_id": n.user_id,
+        "role": n.role,
+        "title": n.title,
+        "description": n.description,
+        "target_url": n.target_url,
+        "created_at": n.created_at.isoformat(),
+    }
+
+async def notify_users(db: AsyncSession, user_ids, title: str, description: str | None = None, target_url: str | None = None, role: str | None = None) -> int:
+    """Insert one notification per user and bump their unread counters, then commit."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return 0
+    now = datetime.now(timezone.utc)
+    rows = (await db.execute(
+        insert(Notification)
+        .values([
+            {"user_id": uid, "role": role, "title": title, "description": description,
+             "target_url": target_url, "is_read": False, "created_at": now}
+            for uid in user_ids
+        ])
+        .returning(Notification.id, Notification.user_id, Notification.role, Notification.title,
+                   Notification.description, Notification.target_url, Notification.created_at)
+    )).all()
+    # Sorted user ids keep concurrent fan-outs locking counter rows in the same order
+    counter = insert(NotificationCounter).values([{"user_id": uid, "unread": 1} for uid in user_ids])
+    await db.execute(counter.on_conflict_do_update(
+        index_elements=[NotificationCounter.user_id],
+        set_={"unread": NotificationCounter.unread + counter.excluded.unread},
+    ))
+    events = [notification_event(r) for r in rows]
+    if settings.NOTIFICATIONS_PG_NOTIFY:
+        # Delivered to every worker's listener when the transaction commits
+        await db.execute(
+            text("SELECT pg_notify(:channel, p) FROM unnest(CAST(:payloads AS text[])) AS p"),
+            {"channel": NOTIFY_CHANNEL, "payloads": [json.dumps(e) for e in events]},
+        )
+    await db.commit()
+    if not settings.NOTIFICATIONS_PG_NOTIFY:
+        for event in events:
+            broker.publish(event)
+    return len(events)
+
+async def notify_role(db: AsyncSession, role: str, title: str, description: str | None = None, target_url: str | None = None) -> int:
+    user_ids = (await db.execute(
+        select(User.id).where(User.role == role, User.is_active.is_(True))
+    )).scalars().all()
+    return await notify_users(db, user_ids, title, description, target_url, role=role)
+
+async def notify_user(db: AsyncSession, user_id: int | None, role: str | None, title: str, description: str | None = None, target_url: str | None = None) -> int:
+    if user_id is None:
+        return await notify_role(db, role, title, description, target_url)
+    return await notify_users(db, [user_id], title, description, target_url, role=role)
+
+async def _mark(db: AsyncSession, user_id: int, *criteria) -> int:
+    # Only rows flipped by this statement are subtracted, so concurrent
+    # mark-reads of the same notifications cannot push the counter below zero
+    marked = len((await db.execute(
+        update(Notification)
+        .where(Notification.user_id == user_id, Notification.is_read.is_(False), *criteria)
+        .values(is_read=True)
+        .returning(Notification.id)
+    )).all())
+    if marked:
+        await db.execute(
+            update(NotificationCounter)
+            .where(NotificationCounter.user_id == user_id)
+            .values(unread=NotificationCounter.unread - marked)
+        )
+    await db.commit()
+    return marked
+
+async def mark_read(db: AsyncSession, user_id: int, ids) -> int:
+    return await _mark(db, user_id, Notification.id.in_(list(ids)))
+
+async def mark_all_read(db: AsyncSession, user_id: int) -> int:
+    return await _mark(db, user_id)
+
+async def unread_count(db: AsyncSession, user_id: int) -> int:
+    n = await db.scalar(select(NotificationCounter.unread).where(NotificationCounter.user_id == user_id))
+    return n or 0
@@ -0,0 +1,14 @@
+import base64
+from datetime import datetime
+
+# Opaque keyset cursors: the (timestamp, id) of the last row on a page
+
+def encode_cursor(ts: datetime, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts.isoformat()}|{row_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[datetime, int] | None:
+    try:
+        ts, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(ts), int(row_id)
+    except ValueError:
+        return None
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from app.core import security
+from app.core.config import settings
+
+class HasherBusy(Exception):
+    """Raised instead of queueing when too many hashes are already waiting."""
+
+def _timed(fn, *args):
+    # Runs in the worker process; wall clock so the parent can derive queue wait
+    started = time.time()
+    result = fn(*args)
+    return started, time.time() - started, result
+
+class PasswordHasher:
+    """bcrypt on a bounded process pool so login bursts can't starve the event loop."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_wait_total = 0.0
+        self._hash_time_total = 0.0
+        self._hash_time_max = 0.0
+
+    def _reserve(self, slots: int):
+        # All or nothing, so a batch never leaves half its chunks queued behind a HasherBusy
+        with self._lock:
+            if self._pending + slots > self.max_pending:
+                self._rejected += 1
+                raise HasherBusy()
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers or None)
+            self._pending += slots
+
+    def _submit(self, fn, *args) -> Future:
+        self._reserve(1)
+        return self._dispatch(fn, *args)
+
+    def _dispatch(self, fn, *args) -> Future:
+        # Caller has already reserved the slot
+        submitted = time.time()
+        outer: Future = Future()
+        # Running futures can't be cancelled, so an abandoned request still settles cleanly
+        outer.set_running_or_notify_cancel()
+
+        def done(inner: Future):
+            with self._lock:
+                self._pending -= 1
+            try:
+                started, elapsed, result = inner.result()
+            except BaseException as exc:
+                outer.set_exception(exc)
+                return
+            with self._lock:
+                self._completed += 1
+                self._queue_wait_total += max(started - submitted, 0.0)
+                self._hash_time_total += elapsed
+                self._hash_time_max = max(self._hash_time_max, elapsed)
+            outer.set_result(result)
+
+        try:
+            inner = self._pool.submit(_timed, fn, *args)
+        except BaseException:
+            # Nothing was queued (e.g. a broken or shut down pool), so done() never releases the slot
+            with self._lock:
+                self._pending -= 1
+            raise
+        inner.add_done_callback(done)
+        return outer
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(security.hash_password, password))
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await asyncio.wrap_future(self._submit(security.verify_password, plain, hashed))
+
+    async def verify_and_update(self, plain: str, hashed: str) -> tuple[bool, str | None]:
+        # The new hash is set when the stored one uses outdated cost parameters
+        return await asyncio.wrap_future(self._submit(security.verify_and_update_password, plain, hashed))
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        # Each distinct password is hashed once (an import mostly shares the default one), in chunks
+        # so a large import is a handful of queue slots spread over every worker
+        unique = list(dict.fromkeys(passwords))
+        if not unique:
+            return []
+        workers = self.workers or os.cpu_count() or 1
+        size = max(1, -(-len(unique) // min(workers * 2, self.max_pending)))
+        chunks = [unique[i:i + size] for i in range(0, len(unique), size)]
+        self._reserve(len(chunks))
+        futures = []
+        try:
+            for chunk in chunks:
+                futures.append(self._dispatch(security.hash_passwords, chunk))
+        except BaseException:
+            # _dispatch already released the slot of the chunk that failed to queue
+            with self._lock:
+                self._pending -= len(chunks) - len(futures) - 1
+            raise
+        hashed = await asyncio.gather(*[asyncio.wrap_future(f) for f in futures])
+        by_password = dict(zip(unique, (h for chunk in hashed for h in chunk)))
+        return [by_password[p] for p in passwords]
+
+    # Blocking variants for sync routes and scripts
+    def hash_sync(self, password: str) -> str:
+        return self._submit(security.hash_password, password).result()
+
+    def verify_sync(self, plain: str, hashed: str) -> bool:
+        return self._submit(security.verify_password, plain, hashed).result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_wait_seconds_total": self._queue_wait_total,
+                "hash_seconds_total": self._hash_time_total,
+                "hash_seconds_max": self._hash_time_max,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
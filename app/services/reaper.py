@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from sqlalchemy import Integer, cast, delete, or_, select, update
+from app.core.config import settings
+from app.db.session import open_async_session
+from app.models.enums import SessionEndReason
+from app.services.idempotency import purge_expired
+from app.models.role_lock import RoleLock
+from app.models.session import Session as SessionModel
+
+logger = logging.getLogger(__name__)
+
+class SessionReaper:
+    """Ends expired sessions, frees role locks they held and purges expired idempotency keys, off the request path."""
+
+    def __init__(self, interval_seconds: int, batch_size: int):
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: asyncio.Task | None = None
+        self._runs = 0
+        self._sessions_reaped = 0
+        self._locks_freed = 0
+        self._idempotency_keys_purged = 0
+        self._last_run_seconds = 0.0
+        self._last_run_at: datetime | None = None
+
+    async def run_once(self) -> tuple[int, int]:
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        reaped = 0
+        db = open_async_session()
+        try:
+            while True:
+                # SKIP LOCKED lets every worker run the reaper without queueing on each other
+                batch = (
+                    select(SessionModel.id)
+                    .where(SessionModel.logout_at.is_(None), SessionModel.expires_at <= now)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                    .scalar_subquery()
+                )
+                ended = len((await db.execute(
+                    update(SessionModel)
+                    .where(SessionModel.id.in_(batch))
+                    .values(logout_at=SessionModel.expires_at, ended_reason=SessionEndReason.EXPIRED)
+                    .returning(SessionModel.id)
+                    .execution_options(synchronize_session=False)
+                )).all())
+                await db.commit()
+                reaped += ended
+                if ended < self.batch_size:
+                    break
+            # Only a lapsed lease or an owner that has logged out frees a lock. An owner
+            # that isn't visible is no reason: login takes the lock in the transaction that
+            # inserts the session. SKIP LOCKED passes over a lock being taken over right now.
+            # role_locks.session_id holds the owning sessions.id as text
+            stale = (
+                select(RoleLock.id)
+                .outerjoin(SessionModel, SessionModel.id == cast(RoleLock.session_id, Integer))
+                .where(or_(RoleLock.expires_at <= now, SessionModel.logout_at.is_not(None)))
+                .with_for_update(of=RoleLock, skip_locked=True)
+                .scalar_subquery()
+            )
+            freed = (await db.execute(
+                delete(RoleLock)
+                .where(RoleLock.id.in_(stale))
+                .execution_options(synchronize_session=False)
+            )).rowcount
+            await db.commit()
+            purged = await purge_expired(db, now, self.batch_size)
+        finally:
+            await db.close()
+        self._runs += 1
+        self._sessions_reaped += reaped
+        self._locks_freed += freed
+        self._idempotency_keys_purged += purged
+        self._last_run_seconds = time.perf_counter() - started
+        self._last_run_at = now
+        return reaped, freed
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("session reaper run failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self._runs,
+            "sessions_reaped": self._sessions_reaped,
+            "locks_freed": self._locks_freed,
+            "idempotency_keys_purged": self._idempotency_keys_purged,
+            "last_run_seconds": self._last_run_seconds,
+            "last_run_at": self._last_run_at.isoformat() if self._last_run_at else None,
+        }
+
+reaper = SessionReaper(settings.SESSION_REAPER_INTERVAL_SECONDS, settings.SESSION_REAPER_BATCH_SIZE)
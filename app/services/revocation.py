@@ -0,0 +1,90 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.revocation import UserRevocation
+from app.models.session import Session as SessionModel
+from app.models.user import User
+from app.services.session_partitions import live_since
+
+# Signed session tokens stay valid until they expire, so logouts and
+# deactivated users are tracked here. Every worker periodically reloads the
+# set from the database so a logout on one worker reaches the others.
+_lock = threading.Lock()
+_revoked_sessions: dict[str, float] = {}
+_revoked_users: set[int] = set()
+# Revoked on this worker, by monotonic time, until a refresh has seen them
+_local_users: dict[int, float] = {}
+_last_refresh = 0.0
+_refreshing = False
+
+def revoke_session(session_id: str, expires_at: datetime):
+    with _lock:
+        _revoked_sessions[session_id] = expires_at.timestamp()
+
+def revoke_user(user_id: int):
+    with _lock:
+        _revoked_users.add(user_id)
+        _local_users[user_id] = time.monotonic()
+
+def persist_user_revocation(db, user_id: int):
+    """Records a deletion in the caller's transaction so other workers pick it up."""
+    db.add(UserRevocation(user_id=user_id))
+
+def is_revoked(session_id: str, user_id: int) -> bool:
+    _maybe_refresh()
+    return session_id in _revoked_sessions or user_id in _revoked_users
+
+def refresh_from_db():
+    started = time.monotonic()
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        sessions = db.execute(
+            select(SessionModel.session_id, SessionModel.expires_at)
+            .where(SessionModel.logout_at.is_not(None), SessionModel.expires_at > now, SessionModel.login_at >= live_since(now))
+        ).all()
+        users = db.execute(select(User.id).where(User.is_active.is_(False))).scalars().all()
+        # Older deletions only matter for tokens that have expired by now
+        deleted = db.execute(
+            select(UserRevocation.user_id)
+            .where(UserRevocation.revoked_at > now - timedelta(minutes=settings.SESSION_DURATION_MINUTES))
+        ).scalars().all()
+    finally:
+        db.close()
+    with _lock:
+        # Tokens past their expiry are rejected anyway, no need to remember them
+        for sid in [sid for sid, exp in _revoked_sessions.items() if exp <= now.timestamp()]:
+            del _revoked_sessions[sid]
+        for sid, exp in sessions:
+            _revoked_sessions[sid] = exp.timestamp()
+        # Rebuilt rather than added to, so reactivated users are let back in;
+        # local revocations made during the query are kept until the next one
+        for uid in [uid for uid, at in _local_users.items() if at < started]:
+            del _local_users[uid]
+        _revoked_users.clear()
+        _revoked_users.update(users)
+        _revoked_users.update(deleted)
+        _revoked_users.update(_local_users)
+
+def _maybe_refresh():
+    global _last_refresh, _refreshing
+    interval = settings.SESSION_REVOCATION_REFRESH_SECONDS
+    if interval <= 0 or time.monotonic() - _last_refresh < interval:
+        return
+    with _lock:
+        if _refreshing:
+            return
+        _refreshing = True
+    # Reload off the request path; callers keep using the current set meanwhile
+    threading.Thread(target=_refresh_in_background, daemon=True).start()
+
+def _refresh_in_background():
+    global _last_refresh, _refreshing
+    try:
+        refresh_from_db()
+    finally:
+        _last_refresh = time.monotonic()
+        _refreshing = False
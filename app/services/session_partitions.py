@@ -0,0 +1,210 @@
+import asyncio
+import gzip
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.session import engine
+
+logger = logging.getLogger(__name__)
+
+# sessions is range-partitioned by login_at, one partition per month named
+# sessions_pYYYYMM. A session is only live until login_at plus
+# SESSION_DURATION_MINUTES, so lookups bounded with live_since() are pruned
+# to the newest one or two partitions however much history is kept.
+
+PARTITION_PREFIX = "sessions_p"
+_PARTITION_NAME = re.compile(r"^sessions_p(\d{4})(\d{2})$")
+# Rows from before partitioning got login_at from the database clock and
+# expires_at from the app clock
+LIVE_SLACK = timedelta(minutes=5)
+
+def live_since(now: datetime) -> datetime:
+    """Oldest login_at an unexpired session can have."""
+    return now - timedelta(minutes=settings.SESSION_DURATION_MINUTES) - LIVE_SLACK
+
+def add_months(at: datetime, months: int) -> datetime:
+    """First instant of the month `months` after the one `at` falls in."""
+    index = at.year * 12 + at.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+def _partition_month(name: str) -> datetime | None:
+    match = _PARTITION_NAME.match(name)
+    return datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc) if match else None
+
+def ensure_partitions(conn, now: datetime, ahead: int) -> list[str]:
+    """Creates the partitions for this month and the next `ahead` months."""
+    # Every worker runs this; the lock keeps them from racing on CREATE
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('sessions_partitions'))"))
+    created = []
+    month = add_months(now, 0)
+    for _ in range(ahead + 1):
+        name = partition_name(month)
+        if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF sessions "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+def is_missing_partition(exc: Exception) -> bool:
+    """Whether an insert failed because no sessions partition covers its login_at."""
+    return "no partition of relation" in str(getattr(exc, "orig", exc))
+
+async def create_missing_partitions(now: datetime) -> list[str]:
+    """Fallback for a login that found no partition for its month: the job is behind or down."""
+    def create():
+        with engine.begin() as conn:
+            return ensure_partitions(conn, now, settings.SESSION_PARTITIONS_AHEAD)
+    created = await run_in_threadpool(create)
+    logger.error(
+        "no sessions partition for %s; the partition job is behind, created %s from a login",
+        f"{now:%Y-%m}", ", ".join(created) or "nothing (another worker got there first)",
+    )
+    return created
+
+# DETACH PARTITION takes ACCESS EXCLUSIVE on sessions, stalling every login
+# and session check until it commits. From Postgres 14 DETACH ... CONCURRENTLY
+# only takes SHARE UPDATE EXCLUSIVE and waits out in-flight transactions
+# instead, but it can't run inside a transaction block, so the retention step
+# runs on an autocommit connection. On older servers schedule
+# SESSION_PARTITION_INTERVAL_SECONDS so the job runs off-shift.
+def _detach_expired(conn, cutoff: datetime) -> list[str]:
+    concurrently = conn.dialect.server_version_info >= (14,)
+    # inhdetachpending marks a concurrent detach that was interrupted part way
+    pending = "i.inhdetachpending" if concurrently else "false"
+    attached = conn.execute(text(
+        f"SELECT c.relname, {pending} FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'sessions'::regclass"
+    )).all()
+    detached = []
+    for name, interrupted in attached:
+        month = _partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        mode = "FINALIZE" if interrupted else "CONCURRENTLY" if concurrently else ""
+        conn.execute(text(f"ALTER TABLE sessions DETACH PARTITION {name} {mode}"))
+        detached.append(name)
+    return detached
+
+def _detached_partitions(conn) -> list[str]:
+    # Includes ones a previous run detached but failed to archive
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_class c WHERE c.relkind = 'r' AND c.relname LIKE 'sessions\\_p%' "
+        "AND NOT EXISTS (SELECT 1 FROM pg_inherits i WHERE i.inhrelid = c.oid)"
+    )).scalars().all()
+    return sorted(name for name in names if _partition_month(name) is not None)
+
+def archive_partition(conn, name: str, directory: str) -> str:
+    """Copies a detached partition to gzipped CSV, then drops it."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.csv.gz")
+    partial = path + ".partial"
+    cursor = conn.connection.cursor()
+    try:
+        with gzip.open(partial, "wb") as out:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)", out)
+    finally:
+        cursor.close()
+    os.replace(partial, path)
+    conn.execute(text(f"DROP TABLE {name}"))
+    return path
+
+class SessionPartitionJob:
+    """Keeps future sessions partitions created and moves old ones out of the table."""
+
+    def __init__(self, interval_seconds: int, ahead: int, retention_months: int, archive_dir: str):
+        self.interval_seconds = interval_seconds
+        self.ahead = ahead
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self._task: asyncio.Task | None = None
+        self._runs = 0
+        self._partitions_created = 0
+        self._partitions_detached = 0
+        self._partitions_archived = 0
+        self._last_run_seconds = 0.0
+        self._last_run_at: datetime | None = None
+
+    def _maintain(self, now: datetime) -> tuple[int, int, int]:
+        with engine.begin() as conn:
+            created = ensure_partitions(conn, now, self.ahead)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            # Held for the whole retention step, so two workers never detach,
+            # archive or drop the same partition. Whoever loses skips the step.
+            if not conn.execute(text("SELECT pg_try_advisory_lock(hashtext('sessions_retention'))")).scalar():
+                return len(created), 0, 0
+            try:
+                return (len(created), *self._retire(conn, now))
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(hashtext('sessions_retention'))"))
+
+    def _retire(self, conn, now: datetime) -> tuple[int, int]:
+        detached = _detach_expired(conn, add_months(now, -self.retention_months)) if self.retention_months > 0 else []
+        archived = 0
+        # Without an archive directory old partitions are only detached, for
+        # whoever manages backups to pick up
+        if self.archive_dir:
+            for name in _detached_partitions(conn):
+                logger.info("archived %s to %s", name, archive_partition(conn, name, self.archive_dir))
+                archived += 1
+        return len(detached), archived
+
+    async def run_once(self) -> tuple[int, int, int]:
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        created, detached, archived = await run_in_threadpool(self._maintain, now)
+        self._runs += 1
+        self._partitions_created += created
+        self._partitions_detached += detached
+        self._partitions_archived += archived
+        self._last_run_seconds = time.perf_counter() - started
+        self._last_run_at = now
+        return created, detached, archived
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("session partition job failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "runs": self._runs,
+            "partitions_created": self._partitions_created,
+            "partitions_detached": self._partitions_detached,
+            "partitions_archived": self._partitions_archived,
+            "last_run_seconds": self._last_run_seconds,
+            "last_run_at": self._last_run_at.isoformat() if self._last_run_at else None,
+        }
+
+partition_job = SessionPartitionJob(
+    settings.SESSION_PARTITION_INTERVAL_SECONDS,
+    settings.SESSION_PARTITIONS_AHEAD,
+    settings.SESSION_RETENTION_MONTHS,
+    settings.SESSION_ARCHIVE_DIR,
+)
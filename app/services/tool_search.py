@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from sqlalchemy import case, func, literal, or_, select
+from app.core.config import settings
+from app.db.session import open_read_session
+from app.models.inventory import ToolInventory
+from app.schemas.inventory import ToolListItem, ToolSearchItem
+from app.services.catalog import catalog
+
+# pg_trgm's default pg_trgm.word_similarity_threshold, so both backends
+# return the same matches for the same query
+MIN_SCORE = 0.6
+_EMPTY: frozenset[int] = frozenset()
+
+def escape_like(q: str) -> str:
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def trigrams(text: str) -> set[str]:
+    # Same shape as pg_trgm: lowercase alphanumeric words, two blanks in front, one behind
+    grams = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+def substring_trigrams(q: str) -> set[str]:
+    # Trigrams every text containing q must have: the first word may be the
+    # tail of a longer word and the last word the head of one, so their
+    # outer padded trigrams are not guaranteed
+    words = re.findall(r"[a-z0-9]+", q.lower())
+    grams = set()
+    for i, word in enumerate(words):
+        padded = f"  {word} "
+        for j in range(len(padded) - 2):
+            if i == 0 and j < 2:
+                continue
+            if i == len(words) - 1 and j == len(padded) - 3:
+                continue
+            grams.add(padded[j:j + 3])
+    return grams
+
+def _list_item(r) -> ToolListItem:
+    return ToolListItem(
+        tool_id=r.id,
+        name=r.name,
+        make=r.make,
+        range_mm=r.range_mm,
+        location=r.location,
+        quantity_available=r.quantity_available,
+    )
+
+class NgramIndex:
+    """In-memory trigram inverted index, the search backend when not on Postgres.
+
+    Postings hold each tool's rank in (name, id) order rather than its id, so
+    ties on score come out in display order from plain integer comparisons.
+    """
+
+    def __init__(self, items: list[tuple[ToolListItem, str]]):
+        self.items = sorted(items, key=lambda it: (it[0].name, it[0].tool_id))
+        self.postings: dict[str, set[int]] = defaultdict(set)
+        for rank, (item, text) in enumerate(self.items):
+            for gram in trigrams(text):
+                self.postings[gram].add(rank)
+
+    def _ranked(self, q: str, grams: set[str], want: int) -> list[tuple[float, int]]:
+        postings = sorted((self.postings.get(g, _EMPTY) for g in grams), key=len)
+        # Full trigram matches and plain substrings score 1.0, like word_similarity
+        best = set(postings[0].intersection(*postings[1:]))
+        inner = sorted((self.postings.get(g, _EMPTY) for g in substring_trigrams(q)), key=len)
+        if inner:
+            best |= {r for r in inner[0].intersection(*inner[1:]) - best if q in self.items[r][1]}
+        ranked = [(-1.0, r) for r in heapq.nsmallest(want, best)]
+        if len(ranked) >= want:
+            return ranked
+        # A tool scoring MIN_SCORE shares at least `need` trigrams with the
+        # query, so it appears in one of the n - need + 1 rarest postings
+        n = len(postings)
+        need = math.ceil(MIN_SCORE * n)
+        candidates = set().union(*postings[:n - need + 1]) - best
+        counts = Counter()
+        for posting in postings:
+            counts.update(posting & candidates)
+        partial = [(-c / n, r) for r, c in counts.items() if c >= need]
+        return ranked + heapq.nsmallest(want - len(ranked), partial)
+
+    def search(self, q: str, limit: int, offset: int) -> tuple[list[ToolSearchItem], int | None]:
+        q = q.strip().lower()
+        grams = trigrams(q)
+        if not grams:
+            return [], None
+        ranked = self._ranked(q, grams, offset + limit + 1)
+        page = [
+            ToolSearchItem(**self.items[r][0].model_dump(), score=round(-neg, 4))
+            for neg, r in ranked[offset:offset + limit]
+        ]
+        return page, offset + limit if len(ranked) > offset + limit else None
+
+class ToolSearch:
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._index: NgramIndex | None = None
+        self._version = -1
+        self._built_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _memory_index(self) -> NgramIndex:
+        # Rebuilt on the same inventory version and TTL as the catalog cache
+        async with self._lock:
+            if self._index is None or self._version != catalog.version or time.monotonic() - self._built_at > self.ttl_seconds:
+                version = catalog.version
+                db = open_read_session()
+                try:
+                    rows = (await db.execute(
+                        select(ToolInventory).where(ToolInventory.quantity_available > 0)
+                    )).scalars().all()
+                finally:
+                    await db.close()
+                self._index = NgramIndex([(_list_item(r), r.search_text or "") for r in rows])
+                self._version = version
+                self._built_at = time.monotonic()
+            return self._index
+
+    async def _postgres(self, db, q: str, limit: int, offset: int):
+        q = q.strip().lower()
+        substring = ToolInventory.search_text.ilike(f"%{escape_like(q)}%", escape="\\")
+        score = case((substring, 1.0), else_=func.word_similarity(q, ToolInventory.search_text))
+        # Both predicates are served by the gin_trgm_ops index on search_text
+        rows = (await db.execute(
+            select(ToolInventory, score.label("score"))
+            .where(ToolInventory.quantity_available > 0)
+            .where(or_(substring, literal(q).op("<%")(ToolInventory.search_text)))
+            .order_by(score.desc(), ToolInventory.name, ToolInventory.id)
+            .offset(offset)
+            .limit(limit + 1)
+        )).all()
+        items = [ToolSearchItem(**_list_item(r).model_dump(), score=round(s, 4)) for r, s in rows[:limit]]
+        return items, offset + limit if len(rows) > limit else None
+
+    async def search(self, db, q: str, limit: int, offset: int):
+        if db.sync_session.get_bind().dialect.name == "postgresql":
+            return await self._postgres(db, q, limit, offset)
+        index = await self._memory_index()
+        return index.search(q, limit, offset)
+
+tool_search = ToolSearch(settings.TOOL_CATALOG_TTL_SECONDS)
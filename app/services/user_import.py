@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+from pydantic import ValidationError
+from sqlalchemy import insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.enums import UserRole
+from app.models.user import User
+from app.schemas.user import UserCreateIn, UserImportOut, UserImportRowOut
+from app.services.password_hasher import hasher
+
+def parse_user_file(content: bytes, filename: str) -> list[dict]:
+    text = content.decode("utf-8-sig")
+    if filename.lower().endswith(".csv"):
+        try:
+            return list(csv.DictReader(io.StringIO(text)))
+        except csv.Error as e:
+            raise ValueError(str(e)) from e
+    rows = json.loads(text)
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON list of users")
+    return rows
+
+def _username(raw) -> str | None:
+    value = raw.get("username") if isinstance(raw, dict) else None
+    return value if isinstance(value, str) else None
+
+async def import_users(db: AsyncSession, rows: list[dict]) -> UserImportOut:
+    report = [UserImportRowOut(row=n, username=_username(r), status="ERROR") for n, r in enumerate(rows, 1)]
+    valid: list[tuple[UserImportRowOut, UserCreateIn]] = []
+    seen_usernames, seen_emails = set(), set()
+    for out, raw in zip(report, rows):
+        try:
+            user = UserCreateIn.model_validate(raw)
+        except ValidationError as e:
+            out.detail = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            continue
+        if user.role not in UserRole.__members__:
+            out.detail = "Invalid role"
+        elif user.username in seen_usernames:
+            out.detail = "Duplicate username in file"
+        elif user.email in seen_emails:
+            out.detail = "Duplicate email in file"
+        else:
+            valid.append((out, user))
+        seen_usernames.add(user.username)
+        seen_emails.add(user.email)
+
+    # One round-trip for every username/email conflict with existing users
+    if valid:
+        taken = (await db.execute(
+            select(User.username, User.email).where(or_(
+                User.username.in_([u.username for _, u in valid]),
+                User.email.in_([u.email for _, u in valid]),
+            ))
+        )).all()
+        taken_usernames = {t.username for t in taken}
+        taken_emails = {t.email for t in taken}
+        remaining = []
+        for out, user in valid:
+            if user.username in taken_usernames:
+                out.detail = "Username already exists"
+            elif user.email in taken_emails:
+                out.detail = "Email already exists"
+            else:
+                remaining.append((out, user))
+        valid = remaining
+
+    if valid:
+        hashes = await hasher.hash_many([u.password or settings.DEFAULT_PASSWORD for _, u in valid])
+        ids = (await db.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [
+                {
+                    "username": u.username,
+                    "full_name": u.full_name,
+                    "email": u.email,
+                    "contact_number": u.contact_number,
+                    "role": UserRole(u.role),
+                    "hashed_password": h,
+                    "is_first_login": True,
+                    "is_active": True,
+                } for (_, u), h in zip(valid, hashes)
+            ],
+        )).scalars().all()
+        await db.commit()
+        for (out, _), user_id in zip(valid, ids):
+            out.status = "CREATED"
+            out.id = user_id
+
+    created = sum(1 for r in report if r.status == "CREATED")
+    return UserImportOut(created=created, failed=len(report) - created, rows=report)
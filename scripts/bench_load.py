@@ -0,0 +1,268 @@
+"""End-to-end load test: boots the app and drives a shift-change traffic mix.
+
+    python -m scripts.bench_load                                # configured Postgres, defaults
+    python -m scripts.bench_load --operators 100 --duration 120
+    python -m scripts.bench_load --save                         # store results as the baseline
+    python -m scripts.bench_load --compare                      # fail on regressions vs the baseline
+
+The run seeds its own users (LT_OP001..., LT_SUP01) and tools (LT00001...)
+and then goes through two phases. First, a login storm: every operator
+and the supervisor log in at once. Then, for --duration seconds, each
+operator loops over catalog polls, notification polls and full request
+cycles (create -> approve -> receive -> return), with the supervisor
+approving as requests arrive. Latencies are reported per route as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+import httpx
+
+BASELINE = Path(__file__).with_name("load_baseline.json")
+ROOT = Path(__file__).resolve().parent.parent
+PASSWORD = "loadtest"
+STOCK = 1_000_000
+
+def build_app():
+    # router.py keeps some routers switched off; mount whatever is missing so
+    # every scenario hits a real route. Used as a uvicorn --factory.
+    from app.main import app
+    from app.api.v1 import officer, supervisor, operator, notifications
+
+    mounted = set(app.openapi()["paths"])
+    for prefix, module in (("officer", officer), ("supervisor", supervisor), ("operator", operator), ("notifications", notifications)):
+        if not any(p.startswith(f"/api/{prefix}/") or p == f"/api/{prefix}" for p in mounted):
+            app.include_router(module.router, prefix=f"/api/{prefix}", tags=[prefix])
+    app.openapi_schema = None
+    return app
+
+def seed(operators: int, tools: int):
+    from sqlalchemy.dialects.postgresql import insert
+    from app.core.security import hash_password
+    from app.db.session import SessionLocal
+    from app.models.enums import MovementKind, UserRole
+    from app.models.inventory import InventoryMovement, ToolInventory
+    from app.models.user import User
+
+    hashed = hash_password(PASSWORD)
+    users = [("LT_SUP01", UserRole.SUPERVISOR)] + [(f"LT_OP{i:03d}", UserRole.OPERATOR) for i in range(1, operators + 1)]
+    db = SessionLocal()
+    try:
+        db.execute(insert(User).values([
+            {
+                "username": name, "full_name": name, "email": f"{name.lower()}@loadtest.invalid",
+                "contact_number": "0000000000", "role": role, "hashed_password": hashed,
+                "is_first_login": False, "is_active": True,
+            } for name, role in users
+        ]).on_conflict_do_nothing())
+        # Stock large enough that cycles never run dry
+        created = db.execute(insert(ToolInventory).values([
+            {
+                "tool_code": f"LT{i:05d}", "name": f"Load Test Gauge {i}", "make": random.choice(["Mitutoyo", "Baker", "Insize"]),
+                "range_mm": f"{i % 10 * 25}-{i % 10 * 25 + 25}", "location": f"Rack LT{i % 20}",
+                "quantity_total": STOCK, "quantity_available": STOCK, "status": "ACTIVE",
+            } for i in range(1, tools + 1)
+        ]).on_conflict_do_nothing().returning(ToolInventory.id)).scalars().all()
+        # Opening balances in the same transaction, so the ledger reconciles with the seeded stock
+        if created:
+            now = datetime.now(timezone.utc)
+            db.execute(insert(InventoryMovement).values([
+                {"tool_id": tool_id, "delta": STOCK, "kind": MovementKind.OPENING, "ref": "bench_load", "created_at": now}
+                for tool_id in created
+            ]))
+        db.commit()
+        tool_ids = db.query(ToolInventory.id).filter(ToolInventory.tool_code.like("LT%")).all()
+    finally:
+        db.close()
+    return [u for u, _ in users], [t.id for t in tool_ids]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(port: int, workers: int, timeout: float = 30.0):
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "scripts.bench_load:build_app", "--factory",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    started = time.perf_counter()
+    while True:
+        if time.perf_counter() - started > timeout:
+            proc.terminate()
+            raise RuntimeError("app did not answer /health in time")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.05)
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, ok=(200,), **kwargs):
+        started = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            resp = None
+        self.latencies.setdefault(route, []).append(time.perf_counter() - started)
+        if resp is None or resp.status_code not in ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+            return None
+        return resp
+
+    def report(self, elapsed: dict[str, float]) -> dict:
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            pick = lambda q: round(samples[min(len(samples) - 1, int(q * (len(samples) - 1) + 0.5))] * 1000, 2)
+            phase = "login" if route.startswith("POST /auth/login") else "steady"
+            routes[route] = {
+                "count": len(samples),
+                "errors": self.errors.get(route, 0),
+                "throughput_rps": round(len(samples) / elapsed[phase], 2),
+                "p50_ms": pick(0.50),
+                "p95_ms": pick(0.95),
+                "p99_ms": pick(0.99),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+        return routes
+
+async def login(rec: Recorder, client, username: str) -> str | None:
+    resp = await rec.call(client, "POST /auth/login", "POST", "/api/auth/login", json={"username": username, "password": PASSWORD})
+    return resp.json().get("session_id") if resp else None
+
+async def supervisor_loop(rec: Recorder, client, token: str, approvals: asyncio.Queue):
+    headers = {"X-Session-Id": token}
+    while True:
+        request_id, done = await approvals.get()
+        await rec.call(client, "POST /supervisor/tool-requests/{id}/approve", "POST",
+                       f"/api/supervisor/tool-requests/{request_id}/approve", headers=headers)
+        done.set()
+
+async def operator_loop(rec: Recorder, client, token: str, tool_ids: list[int], approvals: asyncio.Queue, stop_at: float, think: float):
+    headers = {"X-Session-Id": token}
+    etag = None
+    while time.perf_counter() < stop_at:
+        action = random.choices(["catalog", "notifications", "cycle"], weights=[6, 3, 1])[0]
+        if action == "catalog":
+            resp = await rec.call(client, "GET /operator/tools", "GET", "/api/operator/tools", ok=(200, 304),
+                                  headers={**headers, **({"If-None-Match": etag} if etag else {})})
+            if resp is not None and resp.status_code == 200:
+                etag = resp.headers.get("etag")
+        elif action == "notifications":
+            await rec.call(client, "GET /notifications/unread-count", "GET", "/api/notifications/unread-count", headers=headers)
+            await rec.call(client, "GET /notifications", "GET", "/api/notifications", headers=headers)
+        else:
+            resp = await rec.call(client, "POST /operator/tool-requests", "POST", "/api/operator/tool-requests", headers=headers,
+                                  json={"tool_id": random.choice(tool_ids), "requested_qty": 1})
+            if resp is not None:
+                request_id = resp.json()["request_id"]
+                done = asyncio.Event()
+                await approvals.put((request_id, done))
+                await done.wait()
+                await rec.call(client, "POST /operator/tool-requests/{id}/mark-received", "POST",
+                               f"/api/operator/tool-requests/{request_id}/mark-received", headers=headers)
+                await rec.call(client, "POST /operator/tool-requests/{id}/return", "POST",
+                               f"/api/operator/tool-requests/{request_id}/return", headers=headers)
+        await asyncio.sleep(random.uniform(0, 2 * think))
+
+async def run(base_url: str, usernames: list[str], tool_ids: list[int], duration: float, think: float):
+    rec = Recorder()
+    limits = httpx.Limits(max_connections=len(usernames) + 10)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        tokens = await asyncio.gather(*[login(rec, client, u) for u in usernames])
+        login_elapsed = time.perf_counter() - started
+        supervisor_token, operator_tokens = tokens[0], [t for t in tokens[1:] if t]
+        if not supervisor_token:
+            raise SystemExit("supervisor login failed; is LT_SUP01's role lock held by an earlier run?")
+
+        approvals: asyncio.Queue = asyncio.Queue()
+        supervisor = asyncio.create_task(supervisor_loop(rec, client, supervisor_token, approvals))
+        started = time.perf_counter()
+        stop_at = started + duration
+        await asyncio.gather(*[operator_loop(rec, client, t, tool_ids, approvals, stop_at, think) for t in operator_tokens])
+        steady_elapsed = time.perf_counter() - started
+        supervisor.cancel()
+
+        # Frees the supervisor role lock for the next run
+        await asyncio.gather(*[client.post("/api/auth/logout", params={"x_session_id": t}) for t in tokens if t])
+    return {
+        "login_storm_seconds": round(login_elapsed, 3),
+        "steady_seconds": round(steady_elapsed, 3),
+        "routes": rec.report({"login": login_elapsed, "steady": steady_elapsed}),
+    }
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for route, base in baseline["routes"].items():
+        cur = results["routes"].get(route)
+        if cur is None:
+            regressions.append(f"{route}: missing from this run")
+            continue
+        if cur["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{route}: p95 {cur['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if cur["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{route}: {cur['throughput_rps']} req/s vs baseline {base['throughput_rps']} req/s")
+        if cur["errors"] > base["errors"]:
+            regressions.append(f"{route}: {cur['errors']} errors vs baseline {base['errors']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--operators", type=int, default=30)
+    parser.add_argument("--tools", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of steady-state traffic after the login storm")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="mean pause between an operator's actions")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--url", help="drive an already running app instead of booting one")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", action="store_true", help="write results to the baseline file")
+    parser.add_argument("--compare", action="store_true", help="exit non-zero when worse than the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p95 slowdown / throughput drop, as a fraction")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    usernames, tool_ids = seed(args.operators, args.tools)
+    proc = None
+    base_url = args.url
+    if not base_url:
+        port = _free_port()
+        proc = start_server(port, args.workers)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        results = asyncio.run(run(base_url, usernames, tool_ids, args.duration, args.think_ms / 1000))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    results["config"] = {"operators": args.operators, "tools": args.tools, "duration": args.duration,
+                         "think_ms": args.think_ms, "workers": args.workers}
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        BASELINE.write_text(json.dumps(results, indent=2) + "\n")
+    if args.compare:
+        if not BASELINE.exists():
+            sys.exit(f"no baseline at {BASELINE}; run with --save first")
+        regressions = compare(results, json.loads(BASELINE.read_text()), args.tolerance)
+        if regressions:
+            print("Load test regressed:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Role-lock contention benchmark: many logins race for the same role.
+
+    python -m scripts.bench_role_lock --backend memory
+    python -m scripts.bench_role_lock --backend lease --contenders 100   # uses the configured database
+
+Reports how many contenders won (must be exactly one) and decision latency.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from app.db.session import open_async_session
+from app.models.enums import UserRole
+from app.services.locks import InMemoryLockManager, LeaseLockManager
+
+async def contend(manager, role, session_row, use_db: bool):
+    db = open_async_session() if use_db else None
+    started = time.perf_counter()
+    try:
+        acquired, _ = await manager.acquire(db, role, session_row)
+        if db is not None:
+            await db.commit()
+    finally:
+        if db is not None:
+            await db.close()
+    return acquired, time.perf_counter() - started
+
+async def run(backend: str, contenders: int, rounds: int):
+    manager = InMemoryLockManager() if backend == "memory" else LeaseLockManager()
+    use_db = backend != "memory"
+    role = UserRole.SUPERVISOR
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    latencies, winners_per_round = [], []
+    for r in range(rounds):
+        # Negative ids can't collide with real sessions
+        rows = [SimpleNamespace(id=-(r * contenders + i + 1), expires_at=expires_at) for i in range(contenders)]
+        results = await asyncio.gather(*[contend(manager, role, row, use_db) for row in rows])
+        winners = [row for row, (acquired, _) in zip(rows, results) if acquired]
+        winners_per_round.append(len(winners))
+        latencies.extend(elapsed for _, elapsed in results)
+        for row in winners:
+            db = open_async_session() if use_db else None
+            try:
+                await manager.release(db, role, row)
+                if db is not None:
+                    await db.commit()
+            finally:
+                if db is not None:
+                    await db.close()
+    latencies.sort()
+    return {
+        "backend": backend,
+        "contenders": contenders,
+        "rounds": rounds,
+        "winners_per_round": winners_per_round,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "lease"], default="memory")
+    parser.add_argument("--contenders", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    result = asyncio.run(run(args.backend, args.contenders, args.rounds))
+    print(json.dumps(result, indent=2))
+    if any(w != 1 for w in result["winners_per_round"]):
+        raise SystemExit("expected exactly one winner per round")
+
+if __name__ == "__main__":
+    main()
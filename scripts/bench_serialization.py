@@ -0,0 +1,90 @@
+"""Per-row cost of the list-route serializers.
+
+    python -m scripts.bench_serialization --rows 10000
+
+Compares the two ways a list route can answer, from query to response bytes:
+"model" loads ORM objects, validates them into response_model instances and
+encodes with the stdlib json (what FastAPI does for officer.list_users), and
+"rows" selects the columns and encodes them with app.core.fast_json. Runs
+against an in-memory SQLite users table, so only the Python side differs.
+"""
+import argparse
+import json
+import statistics
+import time
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from pydantic import TypeAdapter
+from app.core import fast_json
+from app.models.enums import UserRole
+from app.models.user import User
+from app.schemas.user import UserOut
+
+ROLES = list(UserRole)
+_user_list = TypeAdapter(list[UserOut])
+
+def seed(n: int) -> Session:
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    User.__table__.create(engine)
+    db = Session(engine)
+    db.execute(insert(User), [
+        {
+            "username": f"user{i:06d}",
+            "full_name": f"Bench User {i}",
+            "email": f"user{i:06d}@example.com",
+            "contact_number": f"98{i:08d}",
+            "role": ROLES[i % len(ROLES)],
+            "hashed_password": "x",
+        } for i in range(n)
+    ])
+    db.commit()
+    return db
+
+def model_path(db: Session) -> bytes:
+    users = db.execute(select(User).order_by(User.id)).scalars().all()
+    db.expunge_all()
+    validated = _user_list.validate_python(users, from_attributes=True)
+    return json.dumps(_user_list.dump_python(validated, mode="json")).encode()
+
+def rows_path(db: Session) -> bytes:
+    result = db.execute(
+        select(User.id, User.username, User.full_name, User.email, User.contact_number, User.role, User.is_active)
+        .order_by(User.id)
+    )
+    return fast_json.dumps(fast_json.row_dicts(result))
+
+def measure(fn, db: Session, n: int, repeat: int):
+    fn(db)
+    timings = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        body = fn(db)
+        timings.append(time.perf_counter() - t)
+    median = statistics.median(timings)
+    return {
+        "median_ms": round(median * 1000, 2),
+        "per_row_us": round(median / n * 1_000_000, 2),
+        "bytes": len(body),
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    db = seed(args.rows)
+    try:
+        result = {
+            "rows": args.rows,
+            "encoder": "orjson" if fast_json.orjson is not None else "json",
+            "model": measure(model_path, db, args.rows, args.repeat),
+            "rows_path": measure(rows_path, db, args.rows, args.repeat),
+        }
+    finally:
+        db.close()
+    result["speedup"] = round(result["model"]["median_ms"] / result["rows_path"]["median_ms"], 1)
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Cold-start benchmark: import time of app.main and time to first response.
+
+    python -m scripts.bench_startup                 # print results as JSON
+    python -m scripts.bench_startup --save          # store them as the baseline
+    python -m scripts.bench_startup --compare       # fail if slower than baseline
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BASELINE = Path(__file__).with_name("startup_baseline.json")
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_PROBE = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+def measure_import(runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def measure_first_response(runs: int, timeout: float = 30.0) -> float:
+    samples = []
+    for _ in range(runs):
+        port = _free_port()
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+        )
+        try:
+            while True:
+                if time.perf_counter() - started > timeout:
+                    raise RuntimeError("app did not answer /health in time")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                        if r.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.01)
+            samples.append(time.perf_counter() - started)
+        finally:
+            proc.terminate()
+            proc.wait()
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--save", action="store_true", help="write results to the baseline file")
+    parser.add_argument("--compare", action="store_true", help="exit non-zero when slower than the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, as a fraction of the baseline")
+    args = parser.parse_args()
+
+    results = {
+        "import_seconds": round(measure_import(args.runs), 4),
+        "first_response_seconds": round(measure_first_response(args.runs), 4),
+    }
+    print(json.dumps(results, indent=2))
+
+    if args.save:
+        BASELINE.write_text(json.dumps(results, indent=2) + "\n")
+    if args.compare:
+        baseline = json.loads(BASELINE.read_text())
+        regressions = [
+            f"{key}: {results[key]}s vs baseline {baseline[key]}s"
+            for key in results
+            if key in baseline and results[key] > baseline[key] * (1 + args.tolerance)
+        ]
+        if regressions:
+            print("Startup regressed:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Tool search latency over a synthetic catalog.
+
+    python -m scripts.bench_tool_search --items 100000
+    python -m scripts.bench_tool_search --backend db      # uses the configured database
+
+The memory backend exercises the n-gram fallback index directly; the db
+backend runs the pg_trgm query against whatever tool_inventory holds.
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from app.db.session import open_async_session
+from app.schemas.inventory import ToolListItem
+from app.services.tool_search import NgramIndex, tool_search
+
+NAMES = ["Outside Micrometer", "Inside Micrometer", "Depth Micrometer", "Vernier Caliper", "Digital Caliper",
+         "Bore Gauge", "Dial Indicator", "Height Gauge", "Thread Plug Gauge", "Snap Gauge", "Feeler Gauge", "Slip Gauge"]
+MAKES = ["Mitutoyo", "Baker", "Insize", "Starrett", "Tesa", "Mahr", "Fowler"]
+QUERIES = ["micro", "mitutoyo", "calipr", "bore gauge", "dial", "starret", "0-25", "rack 12", "thread plug", "slip"]
+
+def synthetic(n: int):
+    rnd = random.Random(7)
+    items = []
+    for i in range(1, n + 1):
+        lo = rnd.choice([0, 25, 50, 75, 100, 150])
+        item = ToolListItem(
+            tool_id=i,
+            name=rnd.choice(NAMES),
+            make=rnd.choice(MAKES),
+            range_mm=f"{lo}-{lo + rnd.choice([25, 50, 150])}",
+            location=f"Rack {rnd.randint(1, 400)}",
+            quantity_available=rnd.randint(1, 10),
+        )
+        items.append((item, f"{item.name} {item.make} {item.range_mm} {item.location}".lower()))
+    return items
+
+def percentiles(latencies):
+    latencies.sort()
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+    }
+
+def run_memory(n: int, repeat: int):
+    started = time.perf_counter()
+    index = NgramIndex(synthetic(n))
+    build_seconds = time.perf_counter() - started
+    per_query = {}
+    for q in QUERIES:
+        latencies = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            index.search(q, 20, 0)
+            latencies.append(time.perf_counter() - t)
+        per_query[q] = percentiles(latencies)
+    return {"backend": "memory", "items": n, "build_seconds": round(build_seconds, 2), "queries": per_query}
+
+async def run_db(repeat: int):
+    per_query = {}
+    db = open_async_session()
+    try:
+        for q in QUERIES:
+            latencies = []
+            for _ in range(repeat):
+                t = time.perf_counter()
+                await tool_search.search(db, q, 20, 0)
+                latencies.append(time.perf_counter() - t)
+            per_query[q] = percentiles(latencies)
+    finally:
+        await db.close()
+    return {"backend": "db", "queries": per_query}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["memory", "db"], default="memory")
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    if args.backend == "memory":
+        result = run_memory(args.items, args.repeat)
+    else:
+        result = asyncio.run(run_db(args.repeat))
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
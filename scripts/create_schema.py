@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import engine
+from app.services.session_partitions import ensure_partitions
+
+# Imported for their side effect of registering tables on Base.metadata
+from app.models.user import User # noqa
+from app.models.session import Session as SessionModel # noqa
+from app.models.role_lock import RoleLock # noqa
+from app.models.inventory import ToolInventory # noqa
+from app.models.tool_requests import ToolUsageRequest, ToolAdditionRequest # noqa
+from app.models.notification import Notification # noqa
+from app.models.email_outbox import EmailOutbox # noqa
+from app.models.analytics import ToolUsageRollup, RollupWatermark # noqa
+from app.models.idempotency import IdempotencyKey # noqa
+from app.models.revocation import UserRevocation # noqa
+
+def main():
+	# Dev convenience when not running Alembic; the app no longer does this on import
+	Base.metadata.create_all(bind=engine)
+	# sessions is partitioned; logins fail until its current partition exists
+	with engine.begin() as conn:
+		ensure_partitions(conn, datetime.now(timezone.utc), settings.SESSION_PARTITIONS_AHEAD)
+	print("Schema created.")
+
+if __name__ == "__main__":
+	main()
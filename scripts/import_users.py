@@ -0,0 +1,30 @@
+import asyncio
+import sys
+from app.db.session import open_async_session
+from app.services.password_hasher import hasher
+from app.services.user_import import parse_user_file, import_users
+
+async def run(path):
+	with open(path, "rb") as f:
+		rows = parse_user_file(f.read(), path)
+	db = open_async_session()
+	try:
+		report = await import_users(db, rows)
+	finally:
+		await db.close()
+	for r in report.rows:
+		if r.status != "CREATED":
+			print(f"row {r.row} ({r.username}): {r.detail}")
+	print(f"{report.created} users created, {report.failed} rejected")
+
+def main():
+	if len(sys.argv) != 2:
+		print("usage: python -m scripts.import_users <users.csv|users.json>")
+		sys.exit(2)
+	try:
+		asyncio.run(run(sys.argv[1]))
+	finally:
+		hasher.shutdown()
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,72 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+import pytest
+
+# Postgres-backed tests run against the scratch database named by
+# TEST_POSTGRES_DB. Its tables are dropped and recreated, so never point it
+# at a database holding real data. Set before any app import so the engines
+# in app.db.session connect to it.
+TEST_DB = os.environ.get("TEST_POSTGRES_DB")
+if TEST_DB:
+    os.environ["POSTGRES_DB"] = TEST_DB
+
+@pytest.fixture(scope="session")
+def pg_engine():
+    if not TEST_DB:
+        pytest.skip("TEST_POSTGRES_DB is not set")
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app.core.config import settings
+    from app.db.base import Base
+    from app.db.session import engine
+    from app.services.session_partitions import ensure_partitions
+    # Imported for their side effect of registering tables on Base.metadata
+    from app.models.user import User # noqa
+    from app.models.session import Session as SessionModel # noqa
+    from app.models.role_lock import RoleLock # noqa
+    from app.models.inventory import ToolInventory # noqa
+    from app.models.tool_requests import ToolUsageRequest, ToolAdditionRequest # noqa
+    from app.models.notification import Notification # noqa
+    from app.models.email_outbox import EmailOutbox # noqa
+    from app.models.analytics import ToolUsageRollup, RollupWatermark # noqa
+    from app.models.idempotency import IdempotencyKey # noqa
+    from app.models.revocation import UserRevocation # noqa
+
+    try:
+        engine.connect().close()
+    except OperationalError as exc:
+        pytest.skip(f"Postgres is not reachable: {exc}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        ensure_partitions(conn, datetime.now(timezone.utc), settings.SESSION_PARTITIONS_AHEAD)
+    yield engine
+    Base.metadata.drop_all(engine)
+
+@pytest.fixture
+def pg(pg_engine):
+    """The test database, emptied before each test."""
+    from sqlalchemy import text
+    from app.db.base import Base
+    tables = ", ".join(t.name for t in Base.metadata.sorted_tables)
+    with pg_engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    return pg_engine
+
+@pytest.fixture(scope="session")
+def run():
+    """Runs a coroutine on the one event loop shared by the whole session.
+
+    With DB_ASYNC the pooled asyncpg connections belong to the loop that
+    opened them, so every async step of every test has to run on the same one.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    from app.db import session
+    for created in (session.async_engine, session.async_replica_engine):
+        if created is not None:
+            loop.run_until_complete(created.dispose())
+    loop.close()
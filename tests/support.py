@@ -0,0 +1,39 @@
+import httpx
+from app.core.security import hash_password
+from app.db.session import open_async_session
+from app.models.user import User
+from app.services.inventory import receive_stock_many
+
+PASSWORD = "test-password"
+_hashed = None
+
+def make_user(name, role, **values):
+    global _hashed
+    # One bcrypt hash for every test user
+    if _hashed is None:
+        _hashed = hash_password(PASSWORD)
+    return User(
+        username=name, full_name=name.title(), email=f"{name}@example.com", contact_number="0",
+        hashed_password=_hashed, role=role, is_first_login=False, **values,
+    )
+
+async def receive(receipts):
+    db = open_async_session()
+    try:
+        await receive_stock_many(db, receipts)
+        await db.commit()
+    finally:
+        await db.close()
+
+def build_app():
+    from scripts.bench_load import build_app
+    return build_app()
+
+def api_client(app) -> httpx.AsyncClient:
+    # In process and on the caller's loop; startup handlers (background jobs) don't run
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver")
+
+async def login(client, username) -> dict:
+    resp = await client.post("/api/auth/login", json={"username": username, "password": PASSWORD})
+    assert resp.status_code == 200, resp.text
+    return {"X-Session-Id": resp.json()["session_id"]}
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from app.api.v1.supervisor import MAX_ANALYTICS_BUCKETS
+from app.models.enums import UserRole
+from tests.support import api_client, build_app, login, make_user
+
+def test_analytics_range_checks(pg, run):
+    with Session(pg) as db:
+        db.add(make_user("supervisor", UserRole.SUPERVISOR))
+        db.commit()
+    end = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    async def fetch_all():
+        async with api_client(build_app()) as client:
+            headers = await login(client, "supervisor")
+
+            async def fetch(**params):
+                return (await client.get("/api/supervisor/analytics", params=params, headers=headers)).status_code
+
+            return {
+                # Naive bounds are UTC, next to an aware end or the default one
+                "naive start": await fetch(start=(end - timedelta(days=2)).replace(tzinfo=None).isoformat()),
+                "naive start, aware end": await fetch(start=(end - timedelta(days=2)).replace(tzinfo=None).isoformat(), end=end.isoformat()),
+                "at the cap": await fetch(grain="HOUR", start=(end - timedelta(hours=MAX_ANALYTICS_BUCKETS)).isoformat(), end=end.isoformat()),
+                "over the cap": await fetch(grain="HOUR", start=(end - timedelta(hours=MAX_ANALYTICS_BUCKETS + 1)).isoformat(), end=end.isoformat()),
+                "reversed": await fetch(start=end.isoformat(), end=(end - timedelta(days=1)).isoformat()),
+                "empty": await fetch(start=end.isoformat(), end=end.isoformat()),
+            }
+
+    assert run(fetch_all()) == {
+        "naive start": 200,
+        "naive start, aware end": 200,
+        "at the cap": 200,
+        "over the cap": 400,
+        "reversed": 400,
+        "empty": 400,
+    }
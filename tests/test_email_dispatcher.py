@@ -0,0 +1,120 @@
+import smtplib
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.email_outbox import EmailOutbox
+from app.models.enums import EmailStatus
+from app.services.email_dispatcher import EmailDispatcher
+
+class Crash(BaseException):
+    """Cuts a batch short the way a dying worker thread would."""
+
+class FakeSMTP:
+    """Stands in for smtplib.SMTP; records what was delivered over which connection."""
+
+    opened = 0
+    delivered: list[tuple[int, str]] = []
+    # Recipients that are refused, and how many sends from now the connection drops
+    refuse: set[str] = set()
+    drop_after: int | None = None
+
+    def __init__(self, host, port, timeout=None):
+        FakeSMTP.opened += 1
+        self.number = FakeSMTP.opened
+        self.alive = True
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, msg):
+        if FakeSMTP.drop_after is not None:
+            if FakeSMTP.drop_after == 0:
+                FakeSMTP.drop_after = None
+                self.alive = False
+            else:
+                FakeSMTP.drop_after -= 1
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        if msg["To"] == "crash@example.com":
+            raise Crash()
+        if msg["To"] in FakeSMTP.refuse:
+            # Not an SMTPException: any failure is recorded against its own row
+            raise ValueError(f"cannot deliver to {msg['To']}")
+        FakeSMTP.delivered.append((self.number, msg["To"]))
+
+    def quit(self):
+        self.alive = False
+
+@pytest.fixture
+def smtp(monkeypatch):
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    FakeSMTP.opened, FakeSMTP.delivered, FakeSMTP.refuse, FakeSMTP.drop_after = 0, [], set(), None
+    return FakeSMTP
+
+def _queue(engine, *recipients):
+    with Session(engine) as db:
+        db.add_all([EmailOutbox(to_email=to, subject="Hello", body="Body") for to in recipients])
+        db.commit()
+
+def _outbox(engine):
+    with Session(engine) as db:
+        return {row.to_email: row for row in db.execute(select(EmailOutbox)).scalars()}
+
+def test_batches_share_one_connection(pg, run, smtp):
+    _queue(pg, *(f"user{n}@example.com" for n in range(5)))
+    dispatcher = EmailDispatcher(0, 2)
+    assert [run(dispatcher.run_once()) for _ in range(4)] == [2, 2, 1, 0]
+    assert smtp.opened == 1
+    assert sorted(to for _, to in smtp.delivered) == [f"user{n}@example.com" for n in range(5)]
+    assert {row.status for row in _outbox(pg).values()} == {EmailStatus.SENT}
+    assert dispatcher.stats()["sent"] == 5
+
+def test_a_dropped_connection_is_reopened(pg, run, smtp):
+    _queue(pg, "a@example.com", "b@example.com", "c@example.com")
+    smtp.drop_after = 1
+    dispatcher = EmailDispatcher(0, 10)
+    assert run(dispatcher.run_once()) == 3
+    # The second send found the connection gone and went out, with the third, on a new one
+    assert [number for number, _ in smtp.delivered] == [1, 2, 2]
+    assert sorted(to for _, to in smtp.delivered) == ["a@example.com", "b@example.com", "c@example.com"]
+    assert {row.status for row in _outbox(pg).values()} == {EmailStatus.SENT}
+
+def test_failures_back_off_then_fail(pg, run, smtp, monkeypatch):
+    monkeypatch.setattr(settings, "EMAIL_MAX_ATTEMPTS", 2)
+    _queue(pg, "ok@example.com", "bad@example.com")
+    smtp.refuse = {"bad@example.com"}
+    dispatcher = EmailDispatcher(0, 10)
+
+    before = datetime.now(timezone.utc)
+    assert run(dispatcher.run_once()) == 2
+    rows = _outbox(pg)
+    assert rows["ok@example.com"].status == EmailStatus.SENT
+    bad = rows["bad@example.com"]
+    assert (bad.status, bad.attempts) == (EmailStatus.PENDING, 1)
+    assert "cannot deliver" in bad.last_error
+    assert bad.next_attempt_at >= before + timedelta(seconds=settings.EMAIL_RETRY_BASE_SECONDS)
+
+    # Not due again until the backoff has run out
+    assert run(dispatcher.run_once()) == 0
+    with Session(pg) as db:
+        db.execute(update(EmailOutbox).values(next_attempt_at=datetime.now(timezone.utc)))
+        db.commit()
+    assert run(dispatcher.run_once()) == 1
+    bad = _outbox(pg)["bad@example.com"]
+    assert (bad.status, bad.attempts) == (EmailStatus.FAILED, 2)
+    assert [to for _, to in smtp.delivered] == ["ok@example.com"]
+    assert dispatcher.stats()["failed"] == 1 and dispatcher.stats()["retried"] == 1
+
+def test_delivered_rows_are_recorded_when_a_batch_is_cut_short(pg, run, smtp):
+    _queue(pg, "a@example.com", "crash@example.com", "b@example.com", "c@example.com")
+    with pytest.raises(Crash):
+        run(EmailDispatcher(0, 10).run_once())
+    delivered = {to for _, to in smtp.delivered}
+    statuses = {to: row.status for to, row in _outbox(pg).items()}
+    assert {to for to, status in statuses.items() if status == EmailStatus.SENT} == delivered
+    assert statuses["crash@example.com"] == EmailStatus.PENDING
@@ -0,0 +1,97 @@
+import asyncio
+import pytest
+from fastapi import APIRouter, Depends, FastAPI, HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.api.deps import idempotent
+from app.api.v1 import auth
+from app.main import idempotent_replay
+from app.models.enums import UserRole
+from app.models.idempotency import IdempotencyKey
+from app.services.idempotency import IdempotencyMiddleware, IdempotentReplay
+from tests.support import api_client, login, make_user
+
+class Probe:
+    """A POST route whose calls the test can hold open or fail."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = asyncio.Event()
+        self.entered = asyncio.Event()
+        self.router = APIRouter()
+        self.router.add_api_route("/probe", self.handle, methods=["POST"], dependencies=[Depends(idempotent)])
+
+    async def handle(self, payload: dict):
+        self.calls.append(payload)
+        self.entered.set()
+        if payload.get("hold"):
+            await self.gate.wait()
+        if payload.get("fail"):
+            raise HTTPException(status_code=503, detail="Try again")
+        return {"call": len(self.calls)}
+
+@pytest.fixture
+def probe(pg):
+    with Session(pg) as db:
+        db.add(make_user("operator", UserRole.OPERATOR))
+        db.commit()
+    return Probe()
+
+def _app(probe):
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware)
+    app.add_exception_handler(IdempotentReplay, idempotent_replay)
+    app.include_router(auth.router, prefix="/api/auth")
+    app.include_router(probe.router)
+    return app
+
+def test_retry_replays_the_first_response(probe, run):
+    async def calls():
+        async with api_client(_app(probe)) as client:
+            headers = {**await login(client, "operator"), "Idempotency-Key": "k1"}
+            first = await client.post("/probe", json={"n": 1}, headers=headers)
+            retry = await client.post("/probe", json={"n": 1}, headers=headers)
+            other = await client.post("/probe", json={"n": 2}, headers=headers)
+            return first, retry, other
+
+    first, retry, other = run(calls())
+    assert first.status_code == retry.status_code == 200
+    assert retry.content == first.content
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    # Same key, different body
+    assert other.status_code == 422
+    assert len(probe.calls) == 1
+
+def test_retry_while_the_first_call_runs_is_a_conflict(probe, run):
+    async def calls():
+        async with api_client(_app(probe)) as client:
+            headers = {**await login(client, "operator"), "Idempotency-Key": "k2"}
+            first = asyncio.ensure_future(client.post("/probe", json={"hold": True}, headers=headers))
+            await probe.entered.wait()
+            during = await client.post("/probe", json={"hold": True}, headers=headers)
+            probe.gate.set()
+            first = await first
+            after = await client.post("/probe", json={"hold": True}, headers=headers)
+            return first, during, after
+
+    first, during, after = run(calls())
+    assert during.status_code == 409
+    assert first.status_code == after.status_code == 200
+    assert after.headers["Idempotent-Replayed"] == "true"
+    assert len(probe.calls) == 1
+
+def test_a_server_error_releases_the_key(probe, pg, run):
+    async def calls():
+        async with api_client(_app(probe)) as client:
+            headers = {**await login(client, "operator"), "Idempotency-Key": "k3"}
+            failed = await client.post("/probe", json={"fail": True}, headers=headers)
+            retried = await client.post("/probe", json={"fail": True}, headers=headers)
+            return failed, retried
+
+    failed, retried = run(calls())
+    # Neither answer was kept, so the retry ran the route again
+    assert failed.status_code == retried.status_code == 503
+    assert "Idempotent-Replayed" not in retried.headers
+    assert len(probe.calls) == 2
+    with Session(pg) as db:
+        assert db.scalar(select(func.count()).select_from(IdempotencyKey)) == 0
@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from app.db.session import open_async_session
+from app.models.inventory import InventorySnapshot, ToolInventory
+from app.services.inventory import restock, take_stock
+from app.services.ledger import InventoryLedgerJob, stock_at
+from tests.support import receive
+
+def _tools(engine, *names):
+    with Session(engine) as db:
+        tools = [ToolInventory(tool_code=f"T{n:05d}", name=name, quantity_total=0, quantity_available=0) for n, name in enumerate(names, 1)]
+        db.add_all(tools)
+        db.commit()
+        return [t.id for t in tools]
+
+async def _move(move, *args):
+    db = open_async_session()
+    try:
+        await move(db, *args)
+        await db.commit()
+    finally:
+        await db.close()
+
+async def _stock_at(tool_id, at):
+    db = open_async_session()
+    try:
+        return await stock_at(db, tool_id, at)
+    finally:
+        await db.close()
+
+def _snapshots(engine, tool_id):
+    with Session(engine) as db:
+        return db.execute(
+            select(InventorySnapshot.quantity_available).where(InventorySnapshot.tool_id == tool_id).order_by(InventorySnapshot.last_movement_id)
+        ).scalars().all()
+
+def test_snapshots_only_tools_that_moved_and_keep_history(pg, run):
+    caliper, gauge = _tools(pg, "Caliper", "Gauge")
+    run(receive([(caliper, 10, "R1"), (gauge, 5, "R2")]))
+    run(_move(take_stock, caliper, 3, "TR1"))
+    # Batches of one, so the job has to loop until the backlog is drained
+    job = InventoryLedgerJob(0, 1)
+
+    assert run(job.run_once()) == (2, [])
+    between = datetime.now(timezone.utc)
+    run(_move(restock, caliper, 2, "TR1"))
+    assert run(job.run_once()) == (1, [])
+    assert run(job.run_once()) == (0, [])
+
+    assert _snapshots(pg, caliper) == [7, 9]
+    assert _snapshots(pg, gauge) == [5]
+    assert run(_stock_at(caliper, between)) == 7
+    assert run(_stock_at(caliper, datetime.now(timezone.utc))) == 9
+
+def test_reconcile_reports_stock_that_bypassed_the_ledger(pg, run):
+    caliper, gauge = _tools(pg, "Caliper", "Gauge")
+    run(receive([(caliper, 4, "R1"), (gauge, 5, "R2")]))
+    job = InventoryLedgerJob(0, 100)
+    run(job.run_once())
+    with Session(pg) as db:
+        db.execute(update(ToolInventory).where(ToolInventory.id == gauge).values(quantity_available=ToolInventory.quantity_available + 1))
+        db.commit()
+
+    _, mismatches = run(job.run_once())
+    assert mismatches == [{"tool_id": gauge, "quantity_available": 6, "ledger": 5}]
+    assert job.stats()["mismatched_tools"] == 1
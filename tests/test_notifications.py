@@ -0,0 +1,48 @@
+import asyncio
+from sqlalchemy.orm import Session
+from app.db.session import open_async_session
+from app.models.enums import UserRole
+from app.services.notifications import notify_users
+from tests.support import api_client, build_app, login, make_user
+
+def test_unread_counter_follows_mark_read_and_mark_all_read(pg, run):
+    with Session(pg) as db:
+        reader, other = make_user("reader", UserRole.OPERATOR), make_user("other", UserRole.OPERATOR)
+        db.add_all([reader, other])
+        db.commit()
+        reader_id, other_id = reader.id, other.id
+
+    async def notify(user_ids, count):
+        db = open_async_session()
+        try:
+            for n in range(count):
+                await notify_users(db, user_ids, f"Notice {n}")
+        finally:
+            await db.close()
+
+    async def scenario():
+        await notify([reader_id, other_id], 4)
+        async with api_client(build_app()) as client:
+            headers, other_headers = await login(client, "reader"), await login(client, "other")
+
+            async def unread(h=headers):
+                return (await client.get("/api/notifications/unread-count", headers=h)).json()["unread"]
+
+            ids = [n["id"] for n in (await client.get("/api/notifications", headers=headers)).json()]
+            other_ids = [n["id"] for n in (await client.get("/api/notifications", headers=other_headers)).json()]
+            counts = {"start": await unread()}
+            await client.post(f"/api/notifications/{ids[0]}/mark-read", headers=headers)
+            counts["one read"] = await unread()
+            # Already read, repeated, and someone else's: none of them count again
+            marked = (await client.post("/api/notifications/mark-read", json={"ids": [ids[0], ids[1], ids[1], other_ids[0]]}, headers=headers)).json()["marked"]
+            counts["two read"] = await unread()
+            # Racing mark-all-reads subtract only what each one flipped
+            results = await asyncio.gather(*(client.post("/api/notifications/mark-all-read", headers=headers) for _ in range(2)))
+            counts["all read"] = await unread()
+            counts["other"] = await unread(other_headers)
+            return counts, marked, sorted(r.json()["marked"] for r in results)
+
+    counts, marked, all_marked = run(scenario())
+    assert counts == {"start": 4, "one read": 3, "two read": 2, "all read": 0, "other": 4}
+    assert marked == 1
+    assert all_marked == [0, 2]
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.routing import APIRoute
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.api.v1 import auth, notifications, officer, operator, supervisor, user
+from app.core import metrics
+from app.core.config import settings
+from app.core.sql_audit import QueryAuditError, query_budget
+from app.db.session import get_async_db
+from app.models.enums import RequestStatus, UserRole
+from app.models.inventory import ToolInventory
+from app.models.session import Session as SessionModel
+from app.models.tool_requests import ToolAdditionRequest, ToolUsageRequest
+from tests.support import api_client, build_app, login, make_user, receive
+
+# Above SQL_N_PLUS_ONE_THRESHOLD, so a per-row query in any list route trips it
+ROWS = 15
+
+# Every route declaring a query_budget, with the role that may call it and a concrete URL
+BUDGETED = {
+    ("officer", "/users"): (UserRole.OFFICER, "/api/officer/users"),
+    ("officer", "/tool-additions"): (UserRole.OFFICER, "/api/officer/tool-additions"),
+    ("officer", "/tools/{tool_id}/movements"): (UserRole.OFFICER, "/api/officer/tools/1/movements"),
+    ("officer", "/session-logs"): (UserRole.OFFICER, "/api/officer/session-logs"),
+    ("officer", "/active-sessions"): (UserRole.OFFICER, "/api/officer/active-sessions"),
+    ("supervisor", "/tool-requests"): (UserRole.SUPERVISOR, "/api/supervisor/tool-requests"),
+    ("supervisor", "/logs/approved-usage"): (UserRole.SUPERVISOR, "/api/supervisor/logs/approved-usage"),
+}
+
+def _budgeted_routes():
+    for prefix, module in (("auth", auth), ("officer", officer), ("supervisor", supervisor), ("operator", operator), ("notifications", notifications), ("user", user)):
+        for route in module.router.routes:
+            if isinstance(route, APIRoute) and any(d.dependency.__qualname__.startswith("query_budget.") for d in route.dependencies):
+                yield prefix, route.path
+
+@pytest.fixture
+def strict(monkeypatch):
+    monkeypatch.setattr(settings, "SQL_AUDIT_STRICT", True)
+
+def _seed(engine, run):
+    now = datetime.now(timezone.utc)
+    with Session(engine) as db:
+        officer_user, supervisor_user = make_user("officer", UserRole.OFFICER), make_user("supervisor", UserRole.SUPERVISOR)
+        operators = [make_user(f"operator{n}", UserRole.OPERATOR) for n in range(3)]
+        tools = [ToolInventory(tool_code=f"T{n:05d}", name=f"Gauge {n}", quantity_total=0, quantity_available=0) for n in range(1, ROWS + 1)]
+        db.add_all([officer_user, supervisor_user, *operators, *tools])
+        db.flush()
+        for n in range(ROWS):
+            operator_user, tool = operators[n % len(operators)], tools[n]
+            db.add(ToolUsageRequest(request_id=f"TR{n:05d}", operator_id=operator_user.id, tool_id=tool.id, requested_qty=1))
+            db.add(ToolUsageRequest(
+                request_id=f"TR{ROWS + n:05d}", operator_id=operator_user.id, tool_id=tool.id, requested_qty=1,
+                status=RequestStatus.APPROVED, approved_by=supervisor_user.id, supervisor_id=supervisor_user.id, reviewed_at=now,
+            ))
+            db.add(ToolAdditionRequest(request_id=f"TAR{n:05d}", tool_name=f"New gauge {n}", quantity=2, supervisor_id=supervisor_user.id))
+            db.add(SessionModel(
+                session_id=f"ended{n}", user_id=operator_user.id, role=UserRole.OPERATOR,
+                login_at=now - timedelta(minutes=n + 1), expires_at=now + timedelta(hours=1), logout_at=now,
+            ))
+        db.commit()
+        tool_ids = [t.id for t in tools]
+    # A movement history for /tools/1/movements
+    run(receive([(tool_ids[0], 1, f"R{n}") for n in range(ROWS)] + [(t, 10, None) for t in tool_ids[1:]]))
+
+def test_budgeted_routes_are_all_covered():
+    assert set(_budgeted_routes()) == set(BUDGETED)
+
+def test_routes_stay_within_their_query_budget(pg, run, strict):
+    _seed(pg, run)
+
+    async def call_all():
+        async with api_client(build_app()) as client:
+            headers = {
+                UserRole.OFFICER: await login(client, "officer"),
+                UserRole.SUPERVISOR: await login(client, "supervisor"),
+            }
+            for role, url in BUDGETED.values():
+                # A broken budget raises QueryAuditError out of the client
+                resp = await client.get(url, headers=headers[role])
+                assert resp.status_code == 200, (url, resp.text)
+
+    run(call_all())
+
+# Deliberately broken routes, to show strict mode catches what it should
+broken = APIRouter()
+
+@broken.get("/tool-names", dependencies=[Depends(query_budget(1000))])
+async def tool_names_one_by_one(db=Depends(get_async_db)):
+    ids = (await db.execute(select(ToolInventory.id))).scalars().all()
+    return [(await db.execute(select(ToolInventory.name).where(ToolInventory.id == tool_id))).scalar_one() for tool_id in ids]
+
+@broken.get("/two-queries", dependencies=[Depends(query_budget(1))])
+async def two_queries(db=Depends(get_async_db)):
+    await db.execute(select(ToolInventory.id))
+    await db.execute(select(ToolInventory.name))
+    return {}
+
+@pytest.fixture
+def get_broken(pg, run, strict):
+    _seed(pg, run)
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+    app.include_router(broken)
+
+    async def get(url):
+        async with api_client(app) as client:
+            return await client.get(url)
+    return lambda url: run(get(url))
+
+def test_n_plus_one_raises_in_strict_mode(get_broken):
+    with pytest.raises(QueryAuditError, match="N\\+1"):
+        get_broken("/tool-names")
+
+def test_over_budget_raises_in_strict_mode(get_broken):
+    with pytest.raises(QueryAuditError, match="query budget of"):
+        get_broken("/two-queries")
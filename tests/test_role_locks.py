@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import open_async_session
+from app.models.enums import UserRole
+from app.models.role_lock import RoleLock
+from app.models.session import Session as SessionModel
+from app.services import locks
+from app.services.locks import InMemoryLockManager, LeaseLockManager
+from app.services.reaper import SessionReaper
+from tests.support import make_user
+
+def _session(user, login_at, expires_at, **values):
+    return SessionModel(session_id=uuid.uuid4().hex, user_id=user.id, role=user.role, login_at=login_at, expires_at=expires_at, **values)
+
+def _locks(engine):
+    with Session(engine) as db:
+        return dict(db.execute(select(RoleLock.role, RoleLock.session_id)).all())
+
+def test_reaper_leaves_a_lease_taken_over_during_its_run(pg, run):
+    now = datetime.now(timezone.utc)
+    with Session(pg) as db:
+        before, after = make_user("before", UserRole.OFFICER), make_user("after", UserRole.OFFICER)
+        db.add_all([before, after])
+        db.flush()
+        lapsed = _session(before, now - timedelta(minutes=10), now - timedelta(minutes=1))
+        db.add(lapsed)
+        db.flush()
+        db.add(RoleLock(role=UserRole.OFFICER, session_id=str(lapsed.id), locked_at=lapsed.login_at, expires_at=lapsed.expires_at))
+        db.commit()
+        after_id = after.id
+
+    async def takeover_across_reaper_run():
+        db = open_async_session()
+        try:
+            # Login's transaction: the new session and its lock stay uncommitted while the reaper runs
+            sess = SessionModel(
+                session_id=uuid.uuid4().hex, user_id=after_id, role=UserRole.OFFICER,
+                login_at=datetime.now(timezone.utc), expires_at=datetime.now(timezone.utc) + timedelta(hours=1),
+            )
+            db.add(sess)
+            await db.flush()
+            acquired, _ = await LeaseLockManager().acquire(db, UserRole.OFFICER, sess)
+            assert acquired
+            reaping = asyncio.ensure_future(SessionReaper(0, 100).run_once())
+            await asyncio.sleep(0.5)
+            await db.commit()
+            await reaping
+            return str(sess.id)
+        finally:
+            await db.close()
+
+    owner = run(takeover_across_reaper_run())
+    assert _locks(pg) == {UserRole.OFFICER: owner}
+
+def test_reaper_frees_only_lapsed_or_logged_out_locks(pg, run):
+    now = datetime.now(timezone.utc)
+    with Session(pg) as db:
+        officer, supervisor = make_user("officer", UserRole.OFFICER), make_user("supervisor", UserRole.SUPERVISOR)
+        db.add_all([officer, supervisor])
+        db.flush()
+        live = _session(officer, now - timedelta(minutes=5), now + timedelta(hours=1))
+        ended = _session(supervisor, now - timedelta(minutes=5), now + timedelta(hours=1), logout_at=now)
+        db.add_all([live, ended])
+        db.flush()
+        db.add_all([
+            RoleLock(role=UserRole.OFFICER, session_id=str(live.id), expires_at=live.expires_at),
+            RoleLock(role=UserRole.SUPERVISOR, session_id=str(ended.id), expires_at=ended.expires_at),
+            # An owner this snapshot can't see keeps its unexpired lease
+            RoleLock(role=UserRole.OPERATOR, session_id="999999", expires_at=now + timedelta(hours=1)),
+        ])
+        db.commit()
+        live_id = str(live.id)
+
+    _, freed = run(SessionReaper(0, 100).run_once())
+    assert freed == 1
+    assert _locks(pg) == {UserRole.OFFICER: live_id, UserRole.OPERATOR: "999999"}
+
+class Clock:
+    """Stands in for both the wall clock and time.monotonic inside app.services.locks."""
+
+    def __init__(self):
+        self.now = datetime.now(timezone.utc)
+        self.ticks = 1000.0
+
+    def advance(self, seconds):
+        self.now += timedelta(seconds=seconds)
+        self.ticks += seconds
+
+    def monotonic(self):
+        return self.ticks
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(locks, "_now", lambda: clock.now)
+    monkeypatch.setattr(locks, "time", clock)
+    return clock
+
+def _owner(n, clock, hours=8):
+    return SimpleNamespace(id=n, expires_at=clock.now + timedelta(hours=hours))
+
+def test_lease_contract_without_heartbeats(clock, run, monkeypatch):
+    monkeypatch.setattr(settings, "ROLE_LOCK_LEASE_SECONDS", 0)
+    manager = InMemoryLockManager()
+    first, second = _owner(1, clock, hours=1), _owner(2, clock)
+
+    assert run(manager.acquire(None, UserRole.OFFICER, first)) == (True, None)
+    since = clock.now
+    clock.advance(60)
+    # Held until released or the owner's session expires; the holder may take it again
+    assert run(manager.acquire(None, UserRole.OFFICER, second)) == (False, since)
+    assert run(manager.acquire(None, UserRole.OFFICER, first))[0]
+    assert run(manager.acquire(None, UserRole.SUPERVISOR, second))[0]
+    assert run(manager.heartbeat(None, UserRole.OFFICER, first))
+
+    # Releasing someone else's lease does nothing
+    run(manager.release(None, UserRole.OFFICER, second))
+    assert not run(manager.acquire(None, UserRole.OFFICER, second))[0]
+    run(manager.release(None, UserRole.OFFICER, first))
+    assert run(manager.acquire(None, UserRole.OFFICER, second))[0]
+
+    run(manager.release(None, UserRole.SUPERVISOR, second))
+    run(manager.acquire(None, UserRole.SUPERVISOR, first))
+    clock.advance(3600)
+    assert run(manager.acquire(None, UserRole.SUPERVISOR, second))[0]
+
+def test_lease_contract_with_heartbeats(clock, run, monkeypatch):
+    monkeypatch.setattr(settings, "ROLE_LOCK_LEASE_SECONDS", 60)
+    manager = InMemoryLockManager()
+    first, second = _owner(1, clock), _owner(2, clock)
+    assert run(manager.acquire(None, UserRole.OFFICER, first))[0]
+
+    # Renewed once half the lease has run, which keeps it alive past the first 60s
+    clock.advance(40)
+    assert run(manager.heartbeat(None, UserRole.OFFICER, first))
+    clock.advance(40)
+    assert not run(manager.acquire(None, UserRole.OFFICER, second))[0]
+
+    # The holder went quiet: the lease lapses, another session takes it and the old holder learns it lost it
+    clock.advance(60)
+    assert run(manager.acquire(None, UserRole.OFFICER, second))[0]
+    assert not run(manager.heartbeat(None, UserRole.OFFICER, first))
+    assert run(manager.heartbeat(None, UserRole.OFFICER, second))
@@ -0,0 +1,58 @@
+import gzip
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.enums import UserRole
+from app.models.session import Session as SessionModel
+from app.services.session_partitions import SessionPartitionJob, add_months, ensure_partitions, partition_name
+from tests.support import api_client, build_app, login, make_user
+
+def _exists(engine, name) -> bool:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None
+
+def test_login_creates_a_missing_partition(pg, run, caplog):
+    current = partition_name(add_months(datetime.now(timezone.utc), 0))
+    with Session(pg) as db:
+        db.add(make_user("operator", UserRole.OPERATOR))
+        db.commit()
+    with pg.begin() as conn:
+        conn.execute(text(f"DROP TABLE {current}"))
+
+    async def sign_in():
+        async with api_client(build_app()) as client:
+            return await login(client, "operator")
+
+    with caplog.at_level(logging.ERROR, logger="app.services.session_partitions"):
+        run(sign_in())
+    assert _exists(pg, current)
+    assert f"created {current}" in caplog.text
+    with pg.connect() as conn:
+        assert conn.execute(text(f"SELECT count(*) FROM {current}")).scalar() == 1
+
+def test_job_creates_ahead_then_detaches_archives_and_drops(pg, run, tmp_path):
+    now = datetime.now(timezone.utc)
+    ahead = settings.SESSION_PARTITIONS_AHEAD + 1
+    newest = partition_name(add_months(now, ahead))
+    old_month = add_months(now, -5)
+    old = partition_name(old_month)
+    session_id = uuid.uuid4().hex
+    with pg.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {newest}"))
+        ensure_partitions(conn, old_month, 0)
+    with Session(pg) as db:
+        user = make_user("operator", UserRole.OPERATOR)
+        db.add(user)
+        db.flush()
+        login_at = old_month + timedelta(days=1)
+        db.add(SessionModel(session_id=session_id, user_id=user.id, role=user.role, login_at=login_at, expires_at=login_at + timedelta(hours=1)))
+        db.commit()
+
+    assert run(SessionPartitionJob(0, ahead, 3, str(tmp_path)).run_once()) == (1, 1, 1)
+    assert _exists(pg, newest)
+    assert not _exists(pg, old)
+    with gzip.open(tmp_path / f"{old}.csv.gz", "rt") as archive:
+        assert session_id in archive.read()
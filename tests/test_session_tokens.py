@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi import HTTPException
+from app.api.deps import session_from_token
+from app.core.config import settings
+from app.core.security import create_session_token, decode_session_token
+from app.services import revocation
+
+def _claims(**overrides):
+    claims = {
+        "id": 1, "sid": "s1", "uid": 7, "usr": "op", "name": "Op", "role": "OPERATOR",
+        "exp": int((datetime.now(timezone.utc) + timedelta(hours=1)).timestamp()),
+    }
+    claims.update(overrides)
+    return claims
+
+@pytest.fixture(autouse=True)
+def revocations(monkeypatch):
+    # No background reloads from the database, and a clean slate per test
+    monkeypatch.setattr(settings, "SESSION_REVOCATION_REFRESH_SECONDS", 0)
+    monkeypatch.setattr(revocation, "_revoked_sessions", {})
+    monkeypatch.setattr(revocation, "_revoked_users", set())
+    monkeypatch.setattr(revocation, "_local_users", {})
+
+def _rejected(token, detail):
+    with pytest.raises(HTTPException) as exc:
+        session_from_token(token)
+    assert exc.value.status_code == 401
+    assert exc.value.detail == detail
+
+def test_round_trip():
+    sess, user = session_from_token(create_session_token(_claims()))
+    assert (sess.session_id, user.id, user.username) == ("s1", 7, "op")
+
+@pytest.mark.parametrize("token", ["", "abc", "a.b.c", "abc.é", "é.abc", "%%%.%%%", "bm90IGpzb24.x"])
+def test_malformed_tokens_are_refused(token):
+    assert decode_session_token(token) is None
+    _rejected(token, "Invalid session")
+
+def test_tampered_tokens_are_refused():
+    token = create_session_token(_claims())
+    body, sig = token.split(".")
+    forged = create_session_token(_claims(role="OFFICER")).split(".")[0]
+    flipped = sig[:-1] + ("B" if sig.endswith("A") else "A")
+    for bad in (f"{forged}.{sig}", f"{body}.{flipped}", f"{body}."):
+        _rejected(bad, "Invalid session")
+
+def test_other_secret_is_refused(monkeypatch):
+    token = create_session_token(_claims())
+    monkeypatch.setattr(settings, "SECRET_KEY", "another-secret")
+    _rejected(token, "Invalid session")
+
+def test_expired_token_is_refused():
+    _rejected(create_session_token(_claims(exp=int(datetime.now(timezone.utc).timestamp()) - 1)), "Session expired")
+
+def test_revoked_session_is_refused():
+    token = create_session_token(_claims())
+    revocation.revoke_session("s1", datetime.now(timezone.utc) + timedelta(hours=1))
+    _rejected(token, "Session ended")
+    # Other sessions of the same user are unaffected
+    session_from_token(create_session_token(_claims(sid="s2")))
+
+def test_revoked_user_is_refused():
+    revocation.revoke_user(7)
+    _rejected(create_session_token(_claims(sid="s3")), "Session ended")
+    session_from_token(create_session_token(_claims(uid=8)))
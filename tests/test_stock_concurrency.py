@@ -0,0 +1,142 @@
+import asyncio
+from fastapi import HTTPException
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.api.deps import TokenUser
+from app.api.v1.officer import approve_tool_addition, bulk_approve_tool_additions
+from app.api.v1.supervisor import approve_tool_request, bulk_approve_tool_requests, reject_tool_request
+from app.db.session import open_async_session
+from app.models.enums import BulkResult, MovementKind, RequestStatus, UserRole
+from app.models.inventory import InventoryMovement, ToolInventory
+from app.models.tool_requests import ToolAdditionRequest, ToolUsageRequest
+from app.schemas.common import BulkActionIn
+from tests.support import make_user, receive
+
+STOCK = 10
+QTY = 3
+REQUESTS = 12
+
+def _seed(engine, run):
+    with Session(engine) as db:
+        supervisor, operator = make_user("supervisor", UserRole.SUPERVISOR), make_user("operator", UserRole.OPERATOR)
+        tool = ToolInventory(tool_code="T00001", name="Vernier caliper", quantity_total=0, quantity_available=0)
+        db.add_all([supervisor, operator, tool])
+        db.flush()
+        db.add_all([
+            ToolUsageRequest(request_id=f"TR{n:05d}", operator_id=operator.id, tool_id=tool.id, requested_qty=QTY)
+            for n in range(1, REQUESTS + 1)
+        ])
+        db.commit()
+        reviewer = TokenUser(id=supervisor.id, username=supervisor.username, full_name=supervisor.full_name, role=UserRole.SUPERVISOR)
+        tool_id = tool.id
+    # Stock comes in through the ledger like any other receipt
+    run(receive([(tool_id, STOCK, "OPENING")]))
+    return reviewer, tool_id, [f"TR{n:05d}" for n in range(1, REQUESTS + 1)]
+
+async def _call(route, *args, reviewer=None, **kwargs):
+    # Every call gets its own session, as concurrent requests would
+    db = open_async_session()
+    if reviewer is not None:
+        kwargs["data"] = (None, reviewer)
+    try:
+        return await route(*args, db=db, **kwargs)
+    except HTTPException as exc:
+        return exc
+    finally:
+        await db.close()
+
+def _assert_stock(engine, tool_id, approved):
+    with Session(engine) as db:
+        available = db.scalar(select(ToolInventory.quantity_available).where(ToolInventory.id == tool_id))
+        issued = db.scalar(
+            select(func.coalesce(func.sum(InventoryMovement.delta), 0))
+            .where(InventoryMovement.tool_id == tool_id, InventoryMovement.kind == MovementKind.ISSUE)
+        )
+        statuses = db.scalars(select(ToolUsageRequest.status)).all()
+    assert available >= 0
+    assert available == STOCK - approved * QTY
+    assert issued == -approved * QTY
+    assert statuses.count(RequestStatus.APPROVED) == approved
+
+def test_parallel_approvals_never_oversell(pg, run):
+    reviewer, tool_id, ids = _seed(pg, run)
+
+    async def approve_all():
+        return await asyncio.gather(*(_call(approve_tool_request, rid, reviewer=reviewer) for rid in ids))
+
+    results = run(approve_all())
+    approved = [r for r in results if not isinstance(r, HTTPException)]
+    refused = [r for r in results if isinstance(r, HTTPException)]
+    assert len(approved) == STOCK // QTY
+    assert all(r.status_code == 400 and r.detail == "Insufficient stock at approval time" for r in refused)
+    _assert_stock(pg, tool_id, len(approved))
+
+def test_parallel_bulk_approvals_never_oversell(pg, run):
+    reviewer, tool_id, ids = _seed(pg, run)
+    batches = [ids[i:i + 2] for i in range(0, len(ids), 2)]
+
+    async def approve_all():
+        return await asyncio.gather(*(
+            _call(bulk_approve_tool_requests, BulkActionIn(request_ids=batch), reviewer=reviewer) for batch in batches
+        ))
+
+    results = [item.result for out in run(approve_all()) for item in out.results]
+    assert len(results) == REQUESTS
+    assert results.count(BulkResult.APPROVED) == STOCK // QTY
+    assert results.count(BulkResult.INSUFFICIENT_STOCK) == REQUESTS - STOCK // QTY
+    _assert_stock(pg, tool_id, results.count(BulkResult.APPROVED))
+
+def test_reject_never_overwrites_a_parallel_approval(pg, run):
+    reviewer, tool_id, ids = _seed(pg, run)
+
+    async def race():
+        return await asyncio.gather(*(
+            call for rid in ids for call in (
+                _call(approve_tool_request, rid, reviewer=reviewer),
+                _call(reject_tool_request, rid, reason="Not approved"),
+            )
+        ))
+
+    results = run(race())
+    approved = {rid for rid, r in zip(ids, results[0::2]) if not isinstance(r, HTTPException)}
+    rejected = {rid for rid, r in zip(ids, results[1::2]) if not isinstance(r, HTTPException)}
+    assert not approved & rejected
+    with Session(pg) as db:
+        statuses = dict(db.execute(select(ToolUsageRequest.request_id, ToolUsageRequest.status)).all())
+    assert {rid for rid, st in statuses.items() if st == RequestStatus.APPROVED} == approved
+    assert {rid for rid, st in statuses.items() if st == RequestStatus.REJECTED} == rejected
+    _assert_stock(pg, tool_id, len(approved))
+
+def test_single_and_bulk_addition_approvals_receive_once(pg, run):
+    additions = 6
+    with Session(pg) as db:
+        officer, supervisor = make_user("officer", UserRole.OFFICER), make_user("supervisor", UserRole.SUPERVISOR)
+        db.add_all([officer, supervisor])
+        db.flush()
+        db.add_all([
+            ToolAdditionRequest(request_id=f"TAR{n:05d}", tool_name="Bore gauge", make="Mitutoyo", quantity=4, supervisor_id=supervisor.id)
+            for n in range(1, additions + 1)
+        ])
+        db.commit()
+        reviewer = TokenUser(id=officer.id, username=officer.username, full_name=officer.full_name, role=UserRole.OFFICER)
+    ids = [f"TAR{n:05d}" for n in range(1, additions + 1)]
+
+    async def race():
+        return await asyncio.gather(
+            _call(bulk_approve_tool_additions, BulkActionIn(request_ids=ids), reviewer=reviewer),
+            *(_call(approve_tool_addition, rid, reviewer=reviewer) for rid in ids),
+            return_exceptions=True,
+        )
+
+    bulk, *singles = run(race())
+    # Losing a race is a 400; anything else is a bug
+    assert not [r for r in (bulk, *singles) if isinstance(r, Exception) and not isinstance(r, HTTPException)]
+    single_wins = {rid for rid, r in zip(ids, singles) if not isinstance(r, HTTPException)}
+    bulk_wins = {item.request_id for item in bulk.results if item.result == BulkResult.APPROVED}
+    assert single_wins | bulk_wins == set(ids)
+    assert not single_wins & bulk_wins
+    with Session(pg) as db:
+        totals = db.execute(select(func.sum(ToolInventory.quantity_total), func.sum(ToolInventory.quantity_available))).one()
+        receipts = db.scalar(select(func.count()).select_from(InventoryMovement).where(InventoryMovement.kind == MovementKind.RECEIPT))
+    assert tuple(totals) == (additions * 4, additions * 4)
+    assert receipts == additions
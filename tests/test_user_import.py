@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.security import verify_password
+from app.models.enums import UserRole
+from app.models.user import User
+from app.services.password_hasher import HasherBusy, PasswordHasher
+from app.services.user_import import parse_user_file
+from tests.support import api_client, build_app, login, make_user
+
+@pytest.fixture
+def pool_hasher():
+    hasher = PasswordHasher(workers=2, max_pending=4)
+    yield hasher
+    hasher.shutdown()
+
+def test_hash_many_hashes_each_distinct_password_once(pool_hasher):
+    hashed = asyncio.run(pool_hasher.hash_many(["shared", "own", "shared", "shared"]))
+    assert hashed[0] == hashed[2] == hashed[3] != hashed[1]
+    assert verify_password("shared", hashed[0]) and verify_password("own", hashed[1])
+    stats = pool_hasher.stats()
+    assert stats["pending"] == 0 and stats["completed"] == 2
+
+def test_hash_many_reserves_every_chunk_or_none(pool_hasher):
+    # One slot is taken, and ten distinct passwords need all four
+    pool_hasher._pending = 1
+    with pytest.raises(HasherBusy):
+        asyncio.run(pool_hasher.hash_many([f"p{n}" for n in range(10)]))
+    assert pool_hasher.stats()["pending"] == 1
+
+def test_malformed_csv_is_a_value_error():
+    with pytest.raises(ValueError):
+        parse_user_file(b"username\n" + b"x" * 200_000, "users.csv")
+
+def test_import_route(pg, run):
+    with Session(pg) as db:
+        db.add(make_user("officer", UserRole.OFFICER))
+        db.commit()
+    rows = (
+        "username,full_name,email,contact_number,role,password\n"
+        "amy,Amy,amy@example.com,1,OPERATOR,\n"
+        "bob,Bob,bob@example.com,2,OPERATOR,\n"
+        "cal,Cal,cal@example.com,3,SUPERVISOR,own-secret\n"
+        "officer,Dup,dup@example.com,4,OPERATOR,\n"
+    )
+
+    async def upload():
+        async with api_client(build_app()) as client:
+            headers = await login(client, "officer")
+            malformed = await client.post(
+                "/api/officer/users/import", headers=headers,
+                files={"file": ("users.csv", b"username\n" + b"x" * 200_000)},
+            )
+            imported = await client.post(
+                "/api/officer/users/import", headers=headers,
+                files={"file": ("users.csv", rows.encode())},
+            )
+            return malformed, imported
+
+    malformed, imported = run(upload())
+    assert malformed.status_code == 400
+    assert imported.status_code == 200, imported.text
+    report = imported.json()
+    assert (report["created"], report["failed"]) == (3, 1)
+    assert report["rows"][3]["detail"] == "Username already exists"
+    with Session(pg) as db:
+        hashes = dict(db.execute(select(User.username, User.hashed_password).where(User.username.in_(["amy", "bob", "cal"]))).all())
+    # Rows left on the default password share its one hash
+    assert hashes["amy"] == hashes["bob"] != hashes["cal"]
+    assert verify_password("own-secret", hashes["cal"])